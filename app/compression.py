@@ -0,0 +1,247 @@
+"""Compressed request bodies, compressed JSON responses and fast JSON parsing."""
+
+import asyncio
+import gzip
+import io
+import logging
+import zlib
+from typing import Callable, Optional
+
+import orjson
+from fastapi import HTTPException, Request, Response
+from fastapi.routing import APIRoute
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .config import settings
+from .tracing import tracer
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+
+logger = logging.getLogger(__name__)
+
+
+def _too_large(limit: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail={
+            "status": 413,
+            "code": "payload_too_large",
+            "message": "Request body too large",
+            "details": f"Decompressed request bodies are limited to {limit} bytes",
+        },
+    )
+
+
+def _invalid_encoding(encoding: str) -> HTTPException:
+    return HTTPException(
+        status_code=400,
+        detail={
+            "status": 400,
+            "code": "invalid_content_encoding",
+            "message": "Request body could not be decompressed",
+            "details": f"The body is not valid '{encoding}' data",
+        },
+    )
+
+
+def _zlib_decompress(data: bytes, limit: int, wbits: int) -> bytes:
+    decompressor = zlib.decompressobj(wbits=wbits)
+    output = decompressor.decompress(data, limit + 1)
+    if len(output) > limit:
+        raise _too_large(limit)
+    if not decompressor.eof:
+        raise zlib.error("truncated stream")
+    return output
+
+
+def _brotli_decompress(data: bytes, limit: int) -> bytes:
+    decompressor = brotli.Decompressor()
+    output = decompressor.process(data, output_buffer_limit=limit + 1)
+    if len(output) > limit:
+        raise _too_large(limit)
+    if not decompressor.is_finished():
+        raise brotli.error("truncated stream")
+    return output
+
+
+def _zstd_decompress(data: bytes, limit: int) -> bytes:
+    reader = zstandard.ZstdDecompressor().stream_reader(io.BytesIO(data))
+    chunks, size = [], 0
+    while chunk := reader.read(limit + 1 - size):
+        chunks.append(chunk)
+        size += len(chunk)
+        if size > limit:
+            raise _too_large(limit)
+    return b"".join(chunks)
+
+
+_DECODERS: dict[str, Callable[[bytes, int], bytes]] = {
+    "gzip": lambda data, limit: _zlib_decompress(data, limit, 16 + zlib.MAX_WBITS),
+    "deflate": lambda data, limit: _zlib_decompress(data, limit, zlib.MAX_WBITS),
+}
+if brotli is not None:
+    _DECODERS["br"] = _brotli_decompress
+if zstandard is not None:
+    _DECODERS["zstd"] = _zstd_decompress
+
+
+def decompress_body(data: bytes, encoding: str, limit: int) -> bytes:
+    """
+    Decompress a request body, refusing output larger than ``limit`` bytes.
+
+    Args:
+        data (bytes): The raw request body.
+        encoding (str): Value of the Content-Encoding header.
+        limit (int): Maximum decompressed size in bytes.
+
+    Returns:
+        bytes: The decompressed body.
+
+    Raises:
+        HTTPException: If the encoding is unsupported, the data is corrupt
+            or the decompressed size exceeds the limit.
+    """
+    decoder = _DECODERS.get(encoding)
+    if decoder is None:
+        raise HTTPException(
+            status_code=415,
+            detail={
+                "status": 415,
+                "code": "unsupported_content_encoding",
+                "message": "Unsupported Content-Encoding",
+                "details": (
+                    f"Supported encodings: {', '.join(sorted(_DECODERS))}"
+                ),
+            },
+        )
+    try:
+        return decoder(data, limit)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.warning("Invalid %s request body: %s", encoding, e)
+        raise _invalid_encoding(encoding) from e
+
+
+class DecompressingRequest(Request):
+    """Request that transparently decodes Content-Encoding and parses JSON with orjson."""
+
+    async def body(self) -> bytes:
+        if not hasattr(self, "_decoded_body"):
+            body = await super().body()
+            encoding = self.headers.get("content-encoding", "").strip().lower()
+            if encoding not in ("", "identity"):
+                with tracer.start_span(
+                    "request.decode",
+                    attributes={"http.request.content_encoding": encoding},
+                ) as span:
+                    body = await asyncio.to_thread(
+                        decompress_body,
+                        body,
+                        encoding,
+                        settings.MAX_DECOMPRESSED_BODY_BYTES,
+                    )
+                    span.set_attribute("http.request.body.size", len(body))
+            self._decoded_body = body
+        return self._decoded_body
+
+    async def json(self):
+        if not hasattr(self, "_json"):
+            # orjson.JSONDecodeError subclasses json.JSONDecodeError, so
+            # FastAPI still reports malformed bodies as validation errors
+            self._json = orjson.loads(await self.body())
+        return self._json
+
+
+class DecompressingRoute(APIRoute):
+    """APIRoute that hands endpoints a DecompressingRequest."""
+
+    def get_route_handler(self) -> Callable:
+        original_route_handler = super().get_route_handler()
+
+        async def custom_route_handler(request: Request) -> Response:
+            request = DecompressingRequest(request.scope, request.receive)
+            return await original_route_handler(request)
+
+        return custom_route_handler
+
+
+def _negotiate(accept_encoding: str) -> Optional[str]:
+    offered = {
+        token.split(";")[0].strip().lower() for token in accept_encoding.split(",")
+    }
+    if brotli is not None and "br" in offered:
+        return "br"
+    if "gzip" in offered:
+        return "gzip"
+    return None
+
+
+class JSONCompressionMiddleware:
+    """
+    Compress single-body JSON responses with brotli or gzip.
+
+    Unlike a blanket compression middleware, PDF downloads and streaming
+    responses are passed through untouched.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = _negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        pending_start: Optional[Message] = None
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal pending_start
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                if (
+                    headers.get("content-type", "").startswith("application/json")
+                    and "content-encoding" not in headers
+                ):
+                    pending_start = message
+                    return
+                await send(message)
+                return
+            if message["type"] != "http.response.body" or pending_start is None:
+                await send(message)
+                return
+
+            start, pending_start = pending_start, None
+            body = message.get("body", b"")
+            if message.get("more_body", False) or len(body) < self.minimum_size:
+                await send(start)
+                await send(message)
+                return
+            body = (
+                brotli.compress(body, quality=4)
+                if encoding == "br"
+                else gzip.compress(body, compresslevel=6)
+            )
+            headers = MutableHeaders(raw=start["headers"])
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            headers.add_vary_header("Accept-Encoding")
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
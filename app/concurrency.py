@@ -0,0 +1,222 @@
+"""Adaptive concurrency limit for WeasyPrint renders."""
+
+import asyncio
+import math
+import statistics
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, Callable, Optional
+
+from .config import settings
+from .metrics import metrics
+
+
+metrics.describe(
+    "render_concurrency_limit", "gauge", "Renders allowed to run at once in this worker"
+)
+metrics.describe("render_concurrency_inflight", "gauge", "Renders running in this worker")
+metrics.describe(
+    "render_concurrency_decisions_total",
+    "counter",
+    "Adaptive limit adjustments by decision and reason",
+)
+metrics.describe(
+    "render_latency_baseline_seconds",
+    "gauge",
+    "Uncongested render seconds per page the limiter compares against",
+)
+
+
+def available_memory_fraction() -> Optional[float]:
+    """Return the fraction of memory still available, preferring cgroup limits."""
+    try:
+        limit = Path("/sys/fs/cgroup/memory.max").read_text().strip()
+        if limit != "max":
+            current = int(Path("/sys/fs/cgroup/memory.current").read_text())
+            return max(0.0, 1 - current / int(limit))
+    except (OSError, ValueError):
+        pass
+    try:
+        fields = {}
+        for line in Path("/proc/meminfo").read_text().splitlines():
+            name, value = line.split(":", 1)
+            fields[name] = int(value.split()[0])
+        return fields["MemAvailable"] / fields["MemTotal"]
+    except (OSError, ValueError, KeyError, ZeroDivisionError):
+        return None
+
+
+class RenderSample:
+    """Timing of one render, filled in by the caller holding the slot."""
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.pages = 0
+
+    def seconds_per_page(self) -> float:
+        return (time.perf_counter() - self.started) / max(1, self.pages)
+
+
+class AdaptiveLimiter:
+    """
+    Additive-increase, multiplicative-decrease limit on concurrent renders.
+
+    Render latency is normalized to seconds per page so the document mix
+    does not read as congestion. After each window of ``max(3, limit)``
+    renders the window's median is compared with a baseline, the lowest
+    median seen, which drifts up 5% per window to follow lasting changes
+    in the mix. The limit is cut by ``backoff`` when the median exceeds the
+    baseline by ``tolerance`` or free memory drops below
+    ``min_free_memory``, raised by one when renders had to wait for a slot,
+    and otherwise held, always staying between ``minimum`` and ``maximum``.
+
+    Waiters may belong to different event loops, as in the bulk renderer's
+    worker processes, so slots are handed over with thread-safe callbacks.
+    """
+
+    def __init__(
+        self,
+        minimum: int,
+        maximum: int,
+        initial: Optional[int] = None,
+        tolerance: float = 2.0,
+        min_free_memory: float = 0.1,
+        backoff: float = 0.75,
+        memory_probe: Callable[[], Optional[float]] = available_memory_fraction,
+    ) -> None:
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = min(self.maximum, max(self.minimum, initial or self.minimum))
+        self.tolerance = tolerance
+        self.min_free_memory = min_free_memory
+        self.backoff = backoff
+        self.memory_probe = memory_probe
+        self.inflight = 0
+        self.baseline: Optional[float] = None
+        self._samples: list[float] = []
+        self._saturated = False
+        self._waiters: deque[tuple[asyncio.AbstractEventLoop, asyncio.Future]] = deque()
+        self._lock = threading.Lock()
+        self._publish()
+
+    def _publish(self) -> None:
+        metrics.set("render_concurrency_limit", self.limit)
+        metrics.set("render_concurrency_inflight", self.inflight)
+
+    def _grant(self, future: asyncio.Future) -> None:
+        if future.cancelled():
+            # The waiter gave up after its slot was assigned
+            self._release(None)
+        else:
+            future.set_result(None)
+
+    def _wake(self) -> None:
+        while self._waiters and self.inflight < self.limit:
+            loop, future = self._waiters.popleft()
+            self.inflight += 1
+            loop.call_soon_threadsafe(self._grant, future)
+
+    async def acquire(self) -> None:
+        with self._lock:
+            if self.inflight < self.limit and not self._waiters:
+                self.inflight += 1
+                self._publish()
+                return
+            self._saturated = True
+            loop = asyncio.get_running_loop()
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+        try:
+            await waiter[1]
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                    raise
+            if waiter[1].done() and not waiter[1].cancelled():
+                self._release(None)
+            raise
+        self._publish()
+
+    def _decide(self, median: float) -> tuple[str, str]:
+        free = self.memory_probe()
+        if free is not None and free < self.min_free_memory:
+            return "decrease", "memory"
+        if self.baseline is not None and median > self.baseline * self.tolerance:
+            return "decrease", "latency"
+        if self._saturated:
+            return "increase", "queueing"
+        return "hold", "steady"
+
+    def _adjust(self) -> None:
+        median = statistics.median(self._samples)
+        decision, reason = self._decide(median)
+        if decision == "decrease":
+            self.limit = max(self.minimum, math.floor(self.limit * self.backoff))
+        elif decision == "increase":
+            self.limit = min(self.maximum, self.limit + 1)
+        self.baseline = median if self.baseline is None else min(median, self.baseline * 1.05)
+        self._samples.clear()
+        self._saturated = bool(self._waiters)
+        metrics.inc("render_concurrency_decisions_total", decision=decision, reason=reason)
+        metrics.set("render_latency_baseline_seconds", self.baseline)
+
+    def _release(self, seconds_per_page: Optional[float]) -> None:
+        with self._lock:
+            self.inflight -= 1
+            if seconds_per_page is not None:
+                self._samples.append(seconds_per_page)
+                if len(self._samples) >= max(3, self.limit):
+                    self._adjust()
+            self._wake()
+            self._publish()
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[RenderSample]:
+        """Hold a render slot; failed renders free it without a latency sample."""
+        await self.acquire()
+        sample = RenderSample()
+        try:
+            yield sample
+        except BaseException:
+            self._release(None)
+            raise
+        self._release(sample.seconds_per_page())
+
+
+_limiter: Optional[AdaptiveLimiter] = None
+
+
+def get_render_limiter() -> Optional[AdaptiveLimiter]:
+    """Return this worker's limiter, or None when ``RENDER_CONCURRENCY_MAX`` is 0."""
+    global _limiter
+    if not settings.RENDER_CONCURRENCY_MAX:
+        return None
+    if _limiter is None:
+        _limiter = AdaptiveLimiter(
+            minimum=settings.RENDER_CONCURRENCY_MIN,
+            maximum=settings.RENDER_CONCURRENCY_MAX,
+            initial=settings.RENDER_CONCURRENCY,
+            tolerance=settings.RENDER_LATENCY_TOLERANCE,
+            min_free_memory=settings.RENDER_MIN_FREE_MEMORY,
+        )
+    return _limiter
+
+
+def render_slots() -> int:
+    """
+    Return how many renders the queue may hand to this worker at once.
+
+    With the adaptive limit enabled the queue admits up to its ceiling and
+    the limiter decides how many of those run, so the limit can grow past
+    ``RENDER_CONCURRENCY``; jobs it holds back wait in dispatch order.
+    """
+    return max(settings.RENDER_CONCURRENCY, settings.RENDER_CONCURRENCY_MAX)
+
+
+def reset_render_limiter() -> None:
+    global _limiter
+    _limiter = None
@@ -1,10 +1,88 @@
+from typing import Literal
+
+from pydantic import BaseModel, Field
 from pydantic_settings import BaseSettings
 
 
+class TenantSettings(BaseModel):
+    """An API key with its own identity, limits and fair-share weight."""
+
+    name: str = Field(..., pattern=r"^[A-Za-z0-9_.-]{1,64}$")
+    key: str = Field(..., min_length=1)
+    # Token bucket on requests; 0 disables the limit
+    requests_per_second: float = Field(0.0, ge=0)
+    request_burst: float = Field(10.0, gt=0)
+    # Token bucket on estimated render cost units; 0 disables the limit
+    cost_per_second: float = Field(0.0, ge=0)
+    cost_burst: float = Field(100.0, gt=0)
+    # Concurrent renders; 0 means no per-tenant cap
+    max_concurrency: int = Field(0, ge=0)
+    weight: float = Field(1.0, gt=0)
+
+
 class Settings(BaseSettings):
     BASE_URL: str = ""
     ROOT_PATH: str = ""
     API_KEY: str | None = None
+    API_KEYS: list[TenantSettings] = []
+    # Key allowed to read /admin/stats and every tenant's documents; any
+    # valid key may read /admin/stats when unset
+    ADMIN_API_KEY: str | None = None
+    RENDER_COST_UNIT_BYTES: int = 50000
+    TABLE_CHUNK_ROWS: int = 0
+    # Pages a render may lay out before it is aborted; 0 disables the limit
+    MAX_PAGES: int = 0
+    PREVIEW_TTL_SECONDS: int = 3600
+    DOWNLOADS_DIR: str = "/app/downloads"
+    TEMPLATES_DIR: str = "/app/downloads/.templates"
+    STAMPS_DIR: str = "/app/downloads/.stamps"
+    STAMP_CACHE_SIZE: int = 256
+    SECTIONS_DIR: str = "/app/downloads/.sections"
+    SECTION_CACHE_SIZE: int = 2048
+    IMAGE_MAX_DPI: int = 300
+    IMAGES_DIR: str = "/app/downloads/.images"
+    IMAGE_CACHE_SIZE: int = 1024
+    MAX_DECOMPRESSED_BODY_BYTES: int = 20 * 1024 * 1024
+    JSON_COMPRESSION_MIN_SIZE: int = 1024
+    INDEX_PATH: str = "/app/downloads/.index/documents.sqlite3"
+    IDEMPOTENCY_PATH: str = "/app/downloads/.index/idempotency.sqlite3"
+    IDEMPOTENCY_TTL_SECONDS: int = 86400
+    MAINTENANCE_INTERVAL_SECONDS: int = 3600
+    LEADER_RETRY_SECONDS: int = 30
+    DOWNLOADS_QUOTA_BYTES: int = 0
+    # Let the reverse proxy send downloads instead of streaming them in Python
+    DOWNLOADS_OFFLOAD: Literal["none", "x-accel-redirect", "x-sendfile"] = "none"
+    DOWNLOADS_ACCEL_PREFIX: str = "/_downloads"
+    QUEUE_BACKEND: Literal["memory", "redis"] = "memory"
+    REDIS_URL: str = "redis://localhost:6379/0"
+    REDIS_PREFIX: str = "pdf:"
+    RENDER_WORKER: bool = True
+    RENDER_CONCURRENCY: int = 4
+    # Adaptive render limit per worker process; a ceiling of 0 disables it,
+    # otherwise the queue admits up to the ceiling and the limit starts at
+    # RENDER_CONCURRENCY
+    RENDER_CONCURRENCY_MIN: int = 1
+    RENDER_CONCURRENCY_MAX: int = 0
+    RENDER_LATENCY_TOLERANCE: float = 2.0
+    RENDER_MIN_FREE_MEMORY: float = 0.1
+    JOB_VISIBILITY_TIMEOUT_SECONDS: int = 300
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RESULT_TTL_SECONDS: int = 86400
+    JOB_WAIT_TIMEOUT_SECONDS: int = 600
+    PROGRESS_POLL_SECONDS: float = 1.0
+    TRACE_EXPORTER: Literal["none", "file", "otlp"] = "none"
+    TRACE_SAMPLE_RATIO: float = 0.05
+    TRACE_FILE_PATH: str = "/app/downloads/.traces/spans.jsonl"
+    TRACE_OTLP_ENDPOINT: str = "http://localhost:4318/v1/traces"
+    TRACE_SERVICE_NAME: str = "pdf-generation-api"
+    WEBHOOK_SECRET: str | None = None
+    # When set, callback_url may only use these hosts, which may be private
+    WEBHOOK_ALLOWED_HOSTS: list[str] = []
+    WEBHOOK_QUEUE_SIZE: int = 1000
+    WEBHOOK_WORKERS: int = 2
+    WEBHOOK_MAX_ATTEMPTS: int = 5
+    WEBHOOK_BACKOFF_SECONDS: float = 1.0
+    WEBHOOK_TIMEOUT_SECONDS: float = 10.0
 
 
 settings = Settings()
@@ -2,32 +2,207 @@
 
 # Importing required libraries and modules
 import asyncio
+import functools
+import hashlib
+import hmac
+import importlib
 import logging
 import re
+import sqlite3
 
 from pathlib import Path
 from datetime import datetime, timedelta, timezone
-from typing import Optional
-
-from weasyprint import HTML
-try:  # pragma: no cover - fallback for older WeasyPrint versions
-    from weasyprint.exceptions import WeasyPrintError
-except Exception:  # pragma: no cover
-    class WeasyPrintError(Exception):
-        """Fallback WeasyPrint exception."""
+from typing import TYPE_CHECKING, Any, Callable, Optional
 
 from fastapi import Security, HTTPException
 from fastapi.security import APIKeyHeader
+from .concurrency import get_render_limiter
 from .config import settings
-
-from pygments import highlight
-from pygments.formatters import HtmlFormatter
-from pygments.lexers import get_lexer_by_name, guess_lexer
-from pygments.util import ClassNotFound
+from .index import delete_documents
+from .progress import (
+    PageLimitExceeded,
+    ProgressCallback,
+    limit_pages,
+    track_layout_pages,
+)
+from .sections import (
+    assemble,
+    cached_section,
+    partial_section_path,
+    section_key,
+    section_pages,
+    split_sections,
+    store_section,
+)
+from .stats import record_cache
+from .tenants import find_tenant
+from .tracing import tracer
+from .transforms import normalize_images, split_large_tables
+
+if TYPE_CHECKING:  # pragma: no cover
+    from pygments.formatters import HtmlFormatter
+    from weasyprint import HTML
+
+    from .templates import CompiledTemplate
 
 
 logger = logging.getLogger(__name__)
 
+# WeasyPrint and Pygments are imported on first use, so the API front end,
+# models and CLI tools do not pay for them when they import this module
+_LAZY_IMPORTS: dict[str, tuple[str, str]] = {
+    "HTML": ("weasyprint", "HTML"),
+    "WeasyPrintError": ("weasyprint.exceptions", "WeasyPrintError"),
+    "highlight": ("pygments", "highlight"),
+    "HtmlFormatter": ("pygments.formatters", "HtmlFormatter"),
+    "get_lexer_by_name": ("pygments.lexers", "get_lexer_by_name"),
+    "guess_lexer": ("pygments.lexers", "guess_lexer"),
+    "ClassNotFound": ("pygments.util", "ClassNotFound"),
+}
+
+
+class _FallbackWeasyPrintError(Exception):
+    """Fallback WeasyPrint exception for versions without ``weasyprint.exceptions``."""
+
+
+def __getattr__(name: str) -> Any:
+    """Import a rendering library attribute the first time it is accessed."""
+    try:
+        module, attribute = _LAZY_IMPORTS[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    try:
+        value = getattr(importlib.import_module(module), attribute)
+    except Exception:
+        if name != "WeasyPrintError":
+            raise
+        value = _FallbackWeasyPrintError
+    globals()[name] = value
+    return value
+
+
+def _lazy(name: str) -> Any:
+    """Return a lazily imported attribute, preferring one already set on the module."""
+    return globals()[name] if name in globals() else __getattr__(name)
+
+
+def preload_renderer() -> None:
+    """Import WeasyPrint and Pygments ahead of the first render."""
+    for name in _LAZY_IMPORTS:
+        _lazy(name)
+
+
+# Default CSS shared by every document (minified version)
+DEFAULT_CSS: str = """
+        @page{size:Letter;margin:0.5in;}
+        body{font-family:'Arial',sans-serif;font-size:12px;line-height:1.5;color:#333;}
+        h1{color:#66cc33;margin-bottom:40px;border-bottom:2px solid #66cc33;padding-bottom:10px;}
+        h2,h3,h4,h5,h6{color:#4b5161;margin-top:20px;}
+        p{margin:1em 0;}
+        a{color:#0366d6;text-decoration:none;}
+        a:hover{text-decoration:underline;}
+        table{width:100%;border-collapse:collapse;margin-bottom:20px;}
+        th,td{border:1px solid #ddd;padding:8px;text-align:left;}
+        th{background-color:#f4f4f4;font-weight:bold;}
+        pre,code{padding:20px;border:1px solid #ccc;background-color:#f4f4f4;}
+        """
+
+
+# WeasyPrint write_pdf options for each output optimization profile
+OPTIMIZATION_PROFILES: dict[str, dict] = {
+    # Least CPU: embed fonts whole and keep images untouched
+    "fast": {"optimize_images": False, "full_fonts": True, "hinting": False},
+    # Smallest file: recompress images, cap resolution and subset fonts
+    "small": {
+        "optimize_images": True,
+        "jpeg_quality": 60,
+        "dpi": 150,
+        "full_fonts": False,
+        "hinting": False,
+    },
+    # Print quality: high-quality (q90) JPEG recompression at print resolution
+    "print": {
+        "optimize_images": True,
+        "jpeg_quality": 90,
+        "dpi": 300,
+        "full_fonts": False,
+        "hinting": False,
+    },
+}
+
+
+# Previews skip image work like "fast" but subset fonts. Subsetting costs
+# some CPU, but a whole font can outweigh the rest of a few-page preview
+# that is downloaded as soon as it is written
+PREVIEW_OPTIONS: dict = {**OPTIMIZATION_PROFILES["fast"], "full_fonts": False}
+
+
+def _title_css(pdf_title: str) -> str:
+    """Return the page footer rules that embed the document title."""
+    return (
+        f"""@page{{@bottom-left{{content:"{pdf_title}";font-size:10px;color:#555;}}"""
+        """@bottom-right{content:"Page " counter(page) " of " """
+        """counter(pages);font-size:10px;color:#555;}}"""
+    )
+
+
+# Makes the footer overlay transparent apart from the page margin boxes
+FOOTER_OVERLAY_CSS: str = (
+    "html,body{background:none!important;border:none!important;}"
+    "@page{background:none!important;border:none!important;}"
+    ".pdf-footer-page{visibility:hidden;}"
+    ".pdf-footer-page+.pdf-footer-page{break-before:page;}"
+)
+
+
+def _document_html(pdf_title: str, head: str, body: str) -> str:
+    """Return a complete HTML document for WeasyPrint."""
+    return f"""
+        <html>
+            <head>
+                <title>{pdf_title}</title>
+                {head}
+            </head>
+            <body>
+                {body}
+            </body>
+        </html>
+        """
+
+
+def _footer_html(pdf_title: str, head: str, pages: int) -> str:
+    """Return a document of ``pages`` empty pages carrying only the footer."""
+    return _document_html(pdf_title, head, '<div class="pdf-footer-page"></div>' * pages)
+
+
+# <pre><code class="language-x"> blocks, matched case-insensitively
+CODE_BLOCK_PATTERN = re.compile(
+    r'<pre\s*>\s*<code\s+class="language-(\w+)"\s*>'
+    r'(.+?)</code\s*>\s*</pre\s*>',
+    re.DOTALL | re.IGNORECASE,
+)
+
+
+@functools.lru_cache(maxsize=1)
+def _formatter() -> "HtmlFormatter":
+    return _lazy("HtmlFormatter")(style="default")
+
+
+@functools.lru_cache(maxsize=1)
+def _pygments_css() -> str:
+    return _formatter().get_style_defs(".highlight")
+
+
+@functools.lru_cache(maxsize=512)
+def _highlight_block(language: str, code: str) -> str:
+    """Highlight one code block; snippets repeated across documents are cached."""
+    try:
+        lexer = _lazy("get_lexer_by_name")(language)
+    except _lazy("ClassNotFound"):
+        # Fallback if the language is not recognized
+        lexer = _lazy("guess_lexer")(code)
+    return _lazy("highlight")(code, lexer, _formatter())
+
 
 async def generate_pdf(
     pdf_title: str,
@@ -35,7 +210,13 @@ async def generate_pdf(
     css_content: Optional[str],
     output_path: Path,
     contains_code: bool,
-) -> None:
+    template: Optional["CompiledTemplate"] = None,
+    optimization_profile: Optional[str] = None,
+    on_progress: Optional[ProgressCallback] = None,
+    max_pages: Optional[int] = None,
+    preview_pages: Optional[int] = None,
+    incremental: bool = False,
+) -> int:
     """
     Generate a PDF file from HTML and CSS content.
 
@@ -46,82 +227,161 @@ async def generate_pdf(
         output_path (Path): Path to save the generated PDF file.
         contains_code (bool): Whether the body_content contains code
             blocks to highlight.
+        template (Optional[CompiledTemplate]): Precompiled stored template
+            whose stylesheets, fonts and wrapper HTML are applied.
+        optimization_profile (Optional[str]): Name of an entry in
+            OPTIMIZATION_PROFILES; WeasyPrint defaults are used when None.
+        on_progress (Optional[ProgressCallback]): Called with each render
+            stage (``highlighting``, ``layout``, ``serializing``) and the
+            number of pages laid out so far.
+        max_pages (Optional[int]): Page limit for this document, lowered to
+            ``MAX_PAGES`` when that is set. Layout is aborted as soon as it
+            is exceeded.
+        preview_pages (Optional[int]): Write only this many leading pages,
+            skipping image downsampling and using ``PREVIEW_OPTIONS``. The
+            document is tagged with the ``preview`` keyword.
+        incremental (bool): Lay out each section of the body separately and
+            reuse sections cached from earlier renders. Ignored for previews.
+
+    Returns:
+        int: Number of pages in the generated PDF.
 
     Raises:
-        HTTPException: If PDF generation fails.
+        HTTPException: 422 if the page limit is exceeded, or 500 if PDF
+            generation fails.
     """
     try:
-        # Define default CSS as a string using an f-string for formatting
-        # (minified version)
-        default_css: str = f"""
-        @page{{size:Letter;margin:0.5in;""" \
-            f"""@bottom-left{{content:"{pdf_title}";font-size:10px;color:#555;}}""" \
-            f"""@bottom-right{{content:"Page " counter(page) " of " """ \
-            f"""counter(pages);font-size:10px;color:#555;}}}}
-        body{{font-family:'Arial',sans-serif;font-size:12px;line-height:1.5;color:#333;}}
-        h1{{color:#66cc33;margin-bottom:40px;border-bottom:2px solid """ \
-            f"""#66cc33;padding-bottom:10px;}}
-        h2,h3,h4,h5,h6{{color:#4b5161;margin-top:20px;}}
-        p{{margin:1em 0;}}
-        a{{color:#0366d6;text-decoration:none;}}
-        a:hover{{text-decoration:underline;}}
-        table{{width:100%;border-collapse:collapse;margin-bottom:20px;}}
-        th,td{{border:1px solid #ddd;padding:8px;text-align:left;}}
-        th{{background-color:#f4f4f4;font-weight:bold;}}
-        pre,code{{padding:20px;border:1px solid #ccc;background-color:#f4f4f4;}}
-        """
-
-        # Initialize combined_css with the default CSS in its own <style> tag
-        combined_css: str = f"<style>{default_css}</style>"
+        # Templates supply the default stylesheet precompiled, so only the
+        # title-dependent rules are inlined for them
+        default_css: str = f"<style>{DEFAULT_CSS}</style>" if template is None else ""
+        title_css: str = f"<style>{_title_css(pdf_title)}</style>"
+        extra_css: str = ""
 
         # Append provided CSS content if any, within its own <style> tag
         if css_content:
-            combined_css += f"<style>{css_content}</style>"
+            extra_css += f"<style>{css_content}</style>"
 
         # Process body_content with Pygments if contains_code is True
         if contains_code:
-            # Use regex to find all <pre><code> blocks, case-insensitively
-            pattern = re.compile(
-                r'<pre\s*>\s*<code\s+class="language-(\w+)"\s*>'
-                r'(.+?)</code\s*>\s*</pre\s*>',
-                re.DOTALL | re.IGNORECASE,
+            if on_progress is not None:
+                on_progress("highlighting")
+            with tracer.start_span("pdf.highlight"):
+                extra_css += f"<style>{_pygments_css()}</style>"
+
+                def repl(match: re.Match) -> str:
+                    hits = _highlight_block.cache_info().hits
+                    html = _highlight_block(match.group(1), match.group(2))
+                    record_cache("highlighting", _highlight_block.cache_info().hits > hits)
+                    return html
+
+                body_content = CODE_BLOCK_PATTERN.sub(repl, body_content)
+
+        combined_css: str = default_css + title_css + extra_css
+
+        if settings.TABLE_CHUNK_ROWS:
+            with tracer.start_span("pdf.tables"):
+                body_content = split_large_tables(
+                    body_content, settings.TABLE_CHUNK_ROWS
+                )
+
+        image_dpi = settings.IMAGE_MAX_DPI
+        profile_dpi = OPTIMIZATION_PROFILES.get(optimization_profile or "", {}).get("dpi")
+        if image_dpi and profile_dpi:
+            image_dpi = min(image_dpi, profile_dpi)
+        # Previews keep images as sent rather than resampling them
+        if image_dpi and not preview_pages and "data:image" in body_content:
+            with tracer.start_span("pdf.images"):
+                body_content = await asyncio.to_thread(
+                    normalize_images, body_content, image_dpi
+                )
+
+        write_options: dict = {}
+        font_config = None
+        if template is not None:
+            write_options["stylesheets"] = list(template.stylesheets)
+            font_config = template.font_config
+        if preview_pages:
+            write_options.update(PREVIEW_OPTIONS)
+        elif optimization_profile is not None:
+            write_options.update(OPTIMIZATION_PROFILES[optimization_profile])
+
+        if on_progress is not None:
+            on_progress("layout", pages=0)
+
+        page_limit = min(
+            (limit for limit in (max_pages, settings.MAX_PAGES) if limit), default=None
+        )
+        if incremental and not preview_pages:
+            # Sections are laid out without the title footer, which is overlaid
+            # once the page count of the whole document is known
+            documents = [
+                _document_html(
+                    pdf_title,
+                    default_css + extra_css,
+                    (f"<h1>{pdf_title}</h1>" if index == 0 else "")
+                    + (template.wrap(section) if template is not None else section),
+                )
+                for index, section in enumerate(split_sections(body_content))
+            ]
+            layout_context = repr((
+                template.template_id if template is not None else None,
+                template.version if template is not None else None,
+                sorted((k, v) for k, v in write_options.items() if k != "stylesheets"),
+            ))
+            render = functools.partial(
+                _render_sections,
+                documents,
+                functools.partial(
+                    _footer_html, pdf_title, combined_css + f"<style>{FOOTER_OVERLAY_CSS}</style>"
+                ),
+                layout_context,
+                output_path,
+                font_config,
+                write_options,
+                on_progress,
+                page_limit,
             )
+        else:
+            if template is not None:
+                body_content = template.wrap(body_content)
 
-            formatter: HtmlFormatter = HtmlFormatter(style="default")
-            pygments_css: str = formatter.get_style_defs(".highlight")
-            combined_css += f"<style>{pygments_css}</style>"
+            # Previews are tagged so viewers and tools can tell them apart
+            preview_meta = '<meta name="keywords" content="preview">' if preview_pages else ""
 
-            def repl(match: re.Match) -> str:
-                language = match.group(1)
-                code = match.group(2)
-                try:
-                    lexer = get_lexer_by_name(language)
-                except ClassNotFound:
-                    # Fallback if the language is not recognized
-                    lexer = guess_lexer(code)
-                return highlight(code, lexer, formatter)
-
-            body_content = pattern.sub(repl, body_content)
-
-        # Initialize the HTML template with combined_css
-        html_template: str = f"""
-        <html>
-            <head>
-                <title>{pdf_title}</title>
-                {combined_css}
-            </head>
-            <body>
-                <h1>{pdf_title}</h1>
-                {body_content}
-            </body>
-        </html>
-        """
-
-        # Asynchronously generate the PDF from the HTML string
-        await asyncio.to_thread(
-            HTML(string=html_template).write_pdf, target=output_path
-        )
-    except WeasyPrintError as e:
+            # Initialize the HTML template with combined_css
+            html_template: str = _document_html(
+                pdf_title, preview_meta + combined_css, f"<h1>{pdf_title}</h1>{body_content}"
+            )
+            render = functools.partial(
+                _render_to_file,
+                _lazy("HTML")(string=html_template),
+                output_path,
+                font_config,
+                write_options,
+                on_progress,
+                page_limit,
+                preview_pages,
+            )
+        limiter = get_render_limiter()
+        if limiter is None:
+            # Asynchronously generate the PDF from the HTML string
+            return await asyncio.to_thread(render)
+        # Wait for a slot under the adaptive limit, then report the render time
+        async with limiter.slot() as sample:
+            sample.pages = await asyncio.to_thread(render)
+        return sample.pages
+    except PageLimitExceeded as e:
+        logger.warning("Aborted render of %s: %s", output_path.name, e)
+        raise HTTPException(
+            status_code=422,
+            detail={
+                "status": 422,
+                "code": "page_limit_exceeded",
+                "message": "Document exceeds the page limit",
+                "details": str(e),
+            },
+        ) from e
+    except _lazy("WeasyPrintError") as e:
         logger.error("Error generating PDF: %s", e)
         raise HTTPException(
             status_code=500,
@@ -156,17 +416,132 @@ async def generate_pdf(
         ) from e
 
 
+def _render_to_file(
+    html: "HTML",
+    output_path: Path,
+    font_config,
+    options: dict,
+    on_progress: Optional[ProgressCallback] = None,
+    max_pages: Optional[int] = None,
+    keep_pages: Optional[int] = None,
+) -> int:
+    """Lay out the document, write it to disk and return its page count."""
+    callback = limit_pages(on_progress, max_pages) if max_pages else on_progress
+    with tracer.start_span("pdf.layout") as span, track_layout_pages(callback):
+        if font_config is not None:
+            document = html.render(font_config=font_config, **options)
+        else:
+            document = html.render(**options)
+        span.set_attribute("pdf.page_count", len(document.pages))
+    # Layout logging may be disabled, so check the result before writing it
+    if max_pages and len(document.pages) > max_pages:
+        raise PageLimitExceeded(max_pages)
+    # WeasyPrint lays out every page before returning any, so previews save
+    # the drawing, font and image work of the pages that are not written
+    if keep_pages and len(document.pages) > keep_pages:
+        document = document.copy(document.pages[:keep_pages])
+    if on_progress is not None:
+        on_progress("serializing", pages=len(document.pages))
+    with tracer.start_span("pdf.write"):
+        document.write_pdf(target=output_path, **options)
+    return len(document.pages)
+
+
+def _offset_layout(
+    callback: Optional[ProgressCallback], offset: int
+) -> Optional[ProgressCallback]:
+    """Report a section's layout progress as pages of the whole document."""
+    if callback is None:
+        return None
+
+    def report(stage: str, **data) -> None:
+        if stage == "layout":
+            callback(stage, pages=offset + data.get("pages", 0))
+
+    return report
+
+
+def _cached_layout(
+    document: str,
+    layout_context: str,
+    font_config,
+    options: dict,
+    on_progress: Optional[ProgressCallback],
+) -> tuple[Path, int]:
+    """Return the cached PDF of a section document, laying it out if missing."""
+    key = section_key(document, layout_context)
+    path = cached_section(key)
+    if path is not None:
+        return path, section_pages(path)
+    partial = partial_section_path(key)
+    try:
+        pages = _render_to_file(
+            _lazy("HTML")(string=document), partial, font_config, options, on_progress
+        )
+        return store_section(key, partial), pages
+    finally:
+        partial.unlink(missing_ok=True)
+
+
+def _render_sections(
+    documents: list[str],
+    footer: Callable[[int], str],
+    layout_context: str,
+    output_path: Path,
+    font_config,
+    options: dict,
+    on_progress: Optional[ProgressCallback] = None,
+    max_pages: Optional[int] = None,
+) -> int:
+    """
+    Render a document section by section, reusing cached section layouts.
+
+    Each section starts a new page and is cached in ``SECTIONS_DIR`` under
+    a hash of its HTML (including stylesheets) and ``layout_context``, so
+    only sections changed since an earlier render are laid out. The title
+    footer with page numbers is laid out for the final page count and
+    overlaid after the sections are assembled.
+    """
+    callback = limit_pages(on_progress, max_pages) if max_pages else on_progress
+    paths: list[Path] = []
+    pages = 0
+    for index, document in enumerate(documents):
+        with tracer.start_span("pdf.section", attributes={"pdf.section": index}):
+            path, section_page_count = _cached_layout(
+                document, layout_context, font_config, options, _offset_layout(callback, pages)
+            )
+        paths.append(path)
+        pages += section_page_count
+        if callback is not None:
+            # Raises PageLimitExceeded once cached sections pass the limit
+            callback("layout", pages=pages)
+    with tracer.start_span("pdf.footer"):
+        footer_path, _ = _cached_layout(footer(pages), layout_context, font_config, options, None)
+    if on_progress is not None:
+        on_progress("serializing", pages=pages)
+    with tracer.start_span("pdf.write"):
+        return assemble(paths, footer_path, output_path)
+
+
 def _cleanup_folder(folder_path: str) -> None:
     """Remove files older than 7 days from the downloads folder."""
     now: datetime = datetime.now(tz=timezone.utc)
     age_limit: datetime = now - timedelta(days=7)
+    removed: list[str] = []
     for file in Path(folder_path).iterdir():
-        if file.is_file():
+        # Hidden files are internal state such as lock files
+        if file.is_file() and not file.name.startswith("."):
             file_mod_time: datetime = datetime.fromtimestamp(
                 file.stat().st_mtime, tz=timezone.utc
             )
             if file_mod_time < age_limit:
                 file.unlink()
+                removed.append(file.name)
+    if removed:
+        try:
+            delete_documents(removed)
+        except sqlite3.Error as e:
+            logger.error("Failed to remove expired documents from index: %s", e)
 
 
 async def cleanup_downloads_folder(folder_path: str) -> None:
@@ -212,6 +587,9 @@ def get_api_key(api_key: str = Security(api_key_header)) -> str:
     """
     Validate the provided API key from the ``X-API-Key`` header.
 
+    The key must match ``API_KEY`` or one of the tenants in ``API_KEYS``;
+    authentication is disabled when neither is configured.
+
     Args:
         api_key (str): The API key extracted from the request header.
 
@@ -221,7 +599,13 @@ def get_api_key(api_key: str = Security(api_key_header)) -> str:
     Raises:
         HTTPException: If the API key is missing or invalid.
     """
-    if settings.API_KEY and api_key != settings.API_KEY:
+    with tracer.start_span("auth.api_key") as span:
+        keys_configured = bool(settings.API_KEY or settings.API_KEYS)
+        valid = (
+            settings.API_KEY is not None and api_key == settings.API_KEY
+        ) or find_tenant(api_key) is not None
+        span.set_attribute("auth.valid", valid)
+    if keys_configured and not valid:
         raise HTTPException(
             status_code=403,
             detail={
@@ -232,3 +616,51 @@ def get_api_key(api_key: str = Security(api_key_header)) -> str:
             },
         )
     return api_key
+
+
+def is_admin_key(api_key: Optional[str]) -> bool:
+    """Return whether ``api_key`` is the configured ``ADMIN_API_KEY``."""
+    admin_key = settings.ADMIN_API_KEY
+    return bool(admin_key) and hmac.compare_digest(
+        admin_key.encode(), (api_key or "").encode()
+    )
+
+
+def get_admin_api_key(api_key: str = Security(get_api_key)) -> str:
+    """Require ``ADMIN_API_KEY`` for admin endpoints when it is configured."""
+    if settings.ADMIN_API_KEY and not is_admin_key(api_key):
+        raise HTTPException(
+            status_code=403,
+            detail={
+                "status": 403,
+                "code": "admin_key_required",
+                "message": "Admin API key required",
+                "details": "Provide ADMIN_API_KEY in the X-API-Key header",
+            },
+        )
+    return api_key
+
+
+def api_key_identity(api_key: Optional[str]) -> str:
+    """Return a stable, non-secret identifier for an API key.
+
+    Tenant keys from ``API_KEYS`` are identified by their tenant name.
+    """
+    if not api_key:
+        return "anonymous"
+    tenant = find_tenant(api_key)
+    if tenant is not None:
+        return tenant.name
+    return hashlib.sha256(api_key.encode()).hexdigest()[:16]
+
+
+def tenant_scope(api_key: Optional[str]) -> Optional[str]:
+    """Return the identity whose documents a caller is limited to.
+
+    With tenants (``API_KEYS``) configured each key only sees the documents
+    it created. None means unrestricted: the ``ADMIN_API_KEY`` sees every
+    tenant, and single-key deployments have only one.
+    """
+    if not settings.API_KEYS or is_admin_key(api_key):
+        return None
+    return api_key_identity(api_key)
@@ -0,0 +1,185 @@
+"""Idempotency keys for render requests, stored in SQLite shared by workers."""
+
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+from .config import settings
+from .stats import record_cache
+
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    api_key_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    response TEXT,
+    started_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (api_key_id, key)
+);
+CREATE INDEX IF NOT EXISTS idempotency_keys_expires_at ON idempotency_keys (expires_at);
+"""
+
+_local = threading.local()
+
+
+def _connect() -> sqlite3.Connection:
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    path = settings.IDEMPOTENCY_PATH
+    connection = connections.get(path)
+    if connection is None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        # Autocommit mode so claims can take the write lock explicitly
+        connection = sqlite3.connect(path, timeout=5.0, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(_SCHEMA)
+        connections[path] = connection
+    return connection
+
+
+def fingerprint(request: BaseModel) -> str:
+    """Hash the validated request, so formatting differences do not matter."""
+    return hashlib.sha256(request.model_dump_json().encode()).hexdigest()
+
+
+@dataclass
+class Claim:
+    """Outcome of claiming a key: a stored response, or the right to render."""
+
+    api_key_id: str
+    key: str
+    response: Optional[str] = None
+
+
+def _conflict(status: int, code: str, message: str, details: str) -> HTTPException:
+    return HTTPException(
+        status_code=status,
+        detail={"status": status, "code": code, "message": message, "details": details},
+    )
+
+
+def _claim(api_key_id: str, key: str, request_fingerprint: str) -> Claim:
+    now = time.time()
+    connection = _connect()
+    # BEGIN IMMEDIATE serializes claims for the same key across workers
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        connection.execute("DELETE FROM idempotency_keys WHERE expires_at < ?", (now,))
+        row = connection.execute(
+            "SELECT fingerprint, response, started_at FROM idempotency_keys "
+            "WHERE api_key_id = ? AND key = ?",
+            (api_key_id, key),
+        ).fetchone()
+        if row is not None:
+            stored_fingerprint, response, started_at = row
+            if stored_fingerprint != request_fingerprint:
+                raise _conflict(
+                    422,
+                    "idempotency_key_mismatch",
+                    "Idempotency key reused with a different request",
+                    "Send a new Idempotency-Key for a different request body",
+                )
+            if response is not None:
+                connection.execute("COMMIT")
+                return Claim(api_key_id, key, response)
+            # A render abandoned by a crashed worker may be taken over
+            if started_at > now - settings.JOB_WAIT_TIMEOUT_SECONDS:
+                raise _conflict(
+                    409,
+                    "idempotency_key_in_use",
+                    "A request with this idempotency key is in progress",
+                    "Retry once the original request has finished",
+                )
+        connection.execute(
+            "INSERT OR REPLACE INTO idempotency_keys "
+            "(api_key_id, key, fingerprint, response, started_at, expires_at) "
+            "VALUES (?, ?, ?, NULL, ?, ?)",
+            (
+                api_key_id,
+                key,
+                request_fingerprint,
+                now,
+                now + settings.IDEMPOTENCY_TTL_SECONDS,
+            ),
+        )
+        connection.execute("COMMIT")
+    except BaseException:
+        connection.execute("ROLLBACK")
+        raise
+    return Claim(api_key_id, key)
+
+
+def _complete(claim: Claim, response: str) -> None:
+    _connect().execute(
+        "UPDATE idempotency_keys SET response = ? WHERE api_key_id = ? AND key = ?",
+        (response, claim.api_key_id, claim.key),
+    )
+
+
+def _release(claim: Claim) -> None:
+    _connect().execute(
+        "DELETE FROM idempotency_keys WHERE api_key_id = ? AND key = ? "
+        "AND response IS NULL",
+        (claim.api_key_id, claim.key),
+    )
+
+
+async def claim_key(api_key_id: str, key: str, request: BaseModel) -> Optional[Claim]:
+    """
+    Reserve an idempotency key for a request, or find its earlier response.
+
+    Keys are scoped to the API key identity and expire after
+    ``IDEMPOTENCY_TTL_SECONDS``. The store is best effort: if it cannot be
+    used, the request proceeds without idempotency.
+
+    Args:
+        api_key_id (str): Identity of the caller's API key.
+        key (str): Value of the ``Idempotency-Key`` header.
+        request (BaseModel): The validated request body.
+
+    Returns:
+        Optional[Claim]: The claim, whose ``response`` is set when the key
+        already completed, or None if the store is unavailable.
+
+    Raises:
+        HTTPException: 422 when the key was used for a different request, or
+            409 while the original request is still rendering.
+    """
+    try:
+        claim = await asyncio.to_thread(_claim, api_key_id, key, fingerprint(request))
+    except sqlite3.Error as e:
+        logger.error("Idempotency store unavailable: %s", e)
+        return None
+    record_cache("idempotency", claim.response is not None)
+    return claim
+
+
+async def complete_key(claim: Claim, response: BaseModel) -> None:
+    """Store the response returned for a claimed key."""
+    try:
+        await asyncio.to_thread(_complete, claim, response.model_dump_json())
+    except sqlite3.Error as e:
+        logger.error("Failed to store idempotent response: %s", e)
+
+
+async def release_key(claim: Claim) -> None:
+    """Forget a claimed key whose request failed, so it can be retried."""
+    try:
+        await asyncio.to_thread(_release, claim)
+    except sqlite3.Error as e:
+        logger.error("Failed to release idempotency key: %s", e)
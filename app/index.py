@@ -0,0 +1,241 @@
+"""Embedded SQLite index of generated documents."""
+
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import stat
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, Optional
+
+from .config import settings
+from .models import DocumentRecord
+
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    filename TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    page_count INTEGER,
+    render_ms REAL,
+    api_key_id TEXT,
+    created_at REAL NOT NULL,
+    mtime REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS documents_created_at ON documents (created_at);
+CREATE INDEX IF NOT EXISTS documents_api_key ON documents (api_key_id, created_at);
+CREATE INDEX IF NOT EXISTS documents_size ON documents (size);
+CREATE TABLE IF NOT EXISTS totals (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    files INTEGER NOT NULL,
+    bytes INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO totals (id, files, bytes)
+    SELECT 1, COUNT(*), COALESCE(SUM(size), 0) FROM documents;
+CREATE TRIGGER IF NOT EXISTS documents_totals_insert AFTER INSERT ON documents BEGIN
+    UPDATE totals SET files = files + 1, bytes = bytes + NEW.size WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS documents_totals_delete AFTER DELETE ON documents BEGIN
+    UPDATE totals SET files = files - 1, bytes = bytes - OLD.size WHERE id = 1;
+END;
+CREATE TRIGGER IF NOT EXISTS documents_totals_update AFTER UPDATE OF size ON documents BEGIN
+    UPDATE totals SET bytes = bytes - OLD.size + NEW.size WHERE id = 1;
+END;
+"""
+
+_COLUMNS = "filename, sha256, size, page_count, render_ms, api_key_id, created_at, mtime"
+
+ORDERINGS = {
+    "created_at": "created_at DESC",
+    "size": "size DESC",
+}
+
+# One connection per thread and database path; asyncio.to_thread reuses threads
+_local = threading.local()
+
+
+def _connect() -> sqlite3.Connection:
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    path = settings.INDEX_PATH
+    connection = connections.get(path)
+    if connection is None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(path, timeout=5.0)
+        connection.row_factory = sqlite3.Row
+        # WAL lets every uvicorn worker read while one of them writes
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        # INSERT OR REPLACE fires the delete trigger only with recursive triggers
+        connection.execute("PRAGMA recursive_triggers=ON")
+        connection.executescript(_SCHEMA)
+        connections[path] = connection
+    return connection
+
+
+def _to_record(row: sqlite3.Row) -> DocumentRecord:
+    return DocumentRecord(**dict(row))
+
+
+def _hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _index_file(
+    path: Path,
+    filename: str,
+    page_count: Optional[int],
+    render_ms: Optional[float],
+    api_key_id: Optional[str],
+) -> DocumentRecord:
+    stat_result = path.stat()
+    record = DocumentRecord(
+        filename=filename,
+        sha256=_hash_file(path),
+        size=stat_result.st_size,
+        page_count=page_count,
+        render_ms=render_ms,
+        api_key_id=api_key_id,
+        created_at=time.time(),
+        mtime=stat_result.st_mtime,
+    )
+    connection = _connect()
+    with connection:
+        connection.execute(
+            f"INSERT OR REPLACE INTO documents ({_COLUMNS}) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                record.filename,
+                record.sha256,
+                record.size,
+                record.page_count,
+                record.render_ms,
+                record.api_key_id,
+                record.created_at.timestamp(),
+                record.mtime,
+            ),
+        )
+    return record
+
+
+def get_document(filename: str) -> Optional[DocumentRecord]:
+    """Return the indexed record for a download filename, if any."""
+    row = _connect().execute(
+        f"SELECT {_COLUMNS} FROM documents WHERE filename = ?", (filename,)
+    ).fetchone()
+    return _to_record(row) if row is not None else None
+
+
+def indexed_stat_result(record: DocumentRecord) -> os.stat_result:
+    """Build the stat result FileResponse needs from an indexed record."""
+    return os.stat_result((
+        stat.S_IFREG | 0o644, 0, 0, 1, 0, 0,
+        record.size, record.mtime, record.mtime, record.mtime,
+    ))
+
+
+def delete_documents(filenames: Iterable[str]) -> None:
+    """Remove records for files deleted from the downloads folder."""
+    connection = _connect()
+    with connection:
+        connection.executemany(
+            "DELETE FROM documents WHERE filename = ?",
+            [(filename,) for filename in filenames],
+        )
+
+
+def _usage() -> tuple[int, int]:
+    row = _connect().execute("SELECT files, bytes FROM totals WHERE id = 1").fetchone()
+    return (row[0], row[1]) if row is not None else (0, 0)
+
+
+async def downloads_usage() -> tuple[int, int]:
+    """Return the number and total size of indexed documents.
+
+    The totals are kept up to date by triggers as documents are indexed and
+    removed, so reading them costs a single-row lookup.
+    """
+    return await asyncio.to_thread(_usage)
+
+
+def compact_index(downloads_path: Path) -> int:
+    """Drop records whose files are gone and checkpoint the WAL file."""
+    connection = _connect()
+    filenames = [row[0] for row in connection.execute("SELECT filename FROM documents")]
+    missing = [name for name in filenames if not (downloads_path / name).is_file()]
+    if missing:
+        delete_documents(missing)
+    connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    connection.execute("PRAGMA optimize")
+    return len(missing)
+
+
+def _list_documents(
+    limit: int, offset: int, api_key_id: Optional[str], order_by: str
+) -> tuple[list[DocumentRecord], int, int]:
+    where, params = ("WHERE api_key_id = ?", [api_key_id]) if api_key_id else ("", [])
+    connection = _connect()
+    if api_key_id:
+        total, total_bytes = connection.execute(
+            f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM documents {where}", params
+        ).fetchone()
+    else:
+        total, total_bytes = _usage()
+    rows = connection.execute(
+        f"SELECT {_COLUMNS} FROM documents {where} "
+        f"ORDER BY {ORDERINGS[order_by]}, filename LIMIT ? OFFSET ?",
+        [*params, limit, offset],
+    ).fetchall()
+    return [_to_record(row) for row in rows], total, total_bytes
+
+
+async def index_document(
+    path: Path,
+    filename: str,
+    page_count: Optional[int],
+    render_ms: Optional[float],
+    api_key_id: Optional[str],
+) -> Optional[DocumentRecord]:
+    """
+    Hash a generated PDF and record its metadata in the index.
+
+    Indexing is best effort: failures are logged and downloads fall back to
+    filesystem lookups for documents missing from the index.
+
+    Args:
+        path (Path): Location of the generated PDF.
+        filename (str): Name of the file relative to the downloads folder.
+        page_count (Optional[int]): Number of pages in the document.
+        render_ms (Optional[float]): Render duration in milliseconds.
+        api_key_id (Optional[str]): Identity of the API key that requested it.
+
+    Returns:
+        Optional[DocumentRecord]: The stored record, or None if indexing failed.
+    """
+    try:
+        return await asyncio.to_thread(
+            _index_file, path, filename, page_count, render_ms, api_key_id
+        )
+    except (OSError, sqlite3.Error) as e:
+        logger.error("Failed to index %s: %s", filename, e)
+        return None
+
+
+async def list_documents(
+    limit: int, offset: int, api_key_id: Optional[str], order_by: str
+) -> tuple[list[DocumentRecord], int, int]:
+    """Return a page of records with the matching count and total bytes."""
+    return await asyncio.to_thread(
+        _list_documents, limit, offset, api_key_id, order_by
+    )
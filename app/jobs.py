@@ -0,0 +1,206 @@
+"""Render jobs executed by every queue backend."""
+
+import logging
+import random
+import string
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+from fastapi import HTTPException
+from pydantic import BaseModel, ConfigDict, Field
+
+from .config import settings
+from .dependencies import generate_pdf
+from .index import index_document
+from .models import CreatePDFRequest, ErrorResponse, JobStatusResponse
+from .progress import progress
+from .stats import render_stats
+from .templates import load_template, template_namespace
+from .tracing import parse_traceparent, tracer
+
+
+logger = logging.getLogger(__name__)
+
+
+class RenderJob(BaseModel):
+    """A validated render request together with its reserved output filename."""
+
+    job_id: str = Field(default_factory=lambda: uuid.uuid4().hex)
+    filename: str
+    request: CreatePDFRequest
+    api_key_id: Optional[str] = None
+    traceparent: Optional[str] = None
+    created_at: datetime = Field(
+        default_factory=lambda: datetime.now(tz=timezone.utc)
+    )
+
+    model_config = ConfigDict(extra="forbid")
+
+
+def output_filename(requested: Optional[str]) -> str:
+    """Return a unique, timestamped downloads filename for a new document."""
+    filename_suffix = datetime.now(tz=timezone.utc).strftime("-%Y%m%d%H%M%S")
+    random_chars = "".join(random.choices(string.ascii_letters + string.digits, k=6))
+    return (
+        f"{random_chars}{filename_suffix}.pdf"
+        if requested is None
+        else f"{requested[:-4]}{filename_suffix}.pdf"
+    )
+
+
+# Downloads subfolder for previews, which are expired separately and not indexed
+PREVIEWS_FOLDER = "previews"
+
+
+def new_job(request: CreatePDFRequest, api_key_id: Optional[str]) -> RenderJob:
+    """Create a job with a unique, timestamped output filename."""
+    filename = output_filename(request.output_filename)
+    if request.preview_pages is not None:
+        filename = f"{PREVIEWS_FOLDER}/{filename}"
+    return RenderJob(
+        filename=filename,
+        request=request,
+        api_key_id=api_key_id,
+        traceparent=tracer.current_traceparent(),
+    )
+
+
+COMPLETED_MESSAGE = (
+    "PDF generation is complete. You can download it from the following URL:"
+)
+
+
+def download_url(filename: str) -> str:
+    return f"{settings.BASE_URL}{settings.ROOT_PATH}/downloads/{filename}"
+
+
+def job_status(job: RenderJob, status: str, **fields) -> JobStatusResponse:
+    return JobStatusResponse(
+        job_id=job.job_id,
+        status=status,
+        created_at=job.created_at,
+        updated_at=datetime.now(tz=timezone.utc),
+        **fields,
+    )
+
+
+def _internal_error(e: Exception) -> ErrorResponse:
+    return ErrorResponse(
+        status=500,
+        code="internal_server_error",
+        message="Internal Server Error",
+        details=str(e),
+    )
+
+
+async def execute_job(job: RenderJob) -> JobStatusResponse:
+    """
+    Render a job into the shared downloads folder and index the result.
+
+    Failures are returned as a ``failed`` status rather than raised, so queue
+    consumers on any node can record them for the submitting client. The
+    work is traced as a child of the span that submitted the job, which may
+    belong to another node.
+
+    Args:
+        job (RenderJob): The job to render.
+
+    Returns:
+        JobStatusResponse: The ``completed`` or ``failed`` job status.
+    """
+    with tracer.start_span(
+        "job.execute",
+        attributes={"job.id": job.job_id},
+        parent=parse_traceparent(job.traceparent),
+    ) as span:
+        render_stats.start(job.job_id, job.api_key_id, job.request)
+        result = None
+        try:
+            result = await _execute_job(job)
+        finally:
+            render_stats.finish(
+                job.job_id,
+                result.status if result is not None else "cancelled",
+                result.page_count if result is not None else None,
+            )
+        span.set_attribute("job.status", result.status)
+        if result.error is not None and result.error.status >= 500:
+            span.error = result.error.code
+        return result
+
+
+async def _execute_job(job: RenderJob) -> JobStatusResponse:
+    request = job.request
+    output_path = Path(settings.DOWNLOADS_DIR) / job.filename
+    started_at = datetime.now(tz=timezone.utc)
+    started = time.perf_counter()
+
+    def finish(status: str, **fields) -> JobStatusResponse:
+        return job_status(
+            job,
+            status,
+            started_at=started_at,
+            render_ms=(time.perf_counter() - started) * 1000,
+            **fields,
+        )
+
+    report = progress.reporter(job.job_id)
+
+    def on_progress(stage: str, **data) -> None:
+        render_stats.progress(job.job_id, stage, data.get("pages"))
+        report(stage, **data)
+
+    try:
+        template = (
+            await load_template(request.template_id, template_namespace(job.api_key_id))
+            if request.template_id is not None
+            else None
+        )
+
+        # Generate the PDF using the provided parameters, including contains_code
+        if request.preview_pages is not None:
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+        page_count = await generate_pdf(
+            pdf_title=request.pdf_title,
+            body_content=request.body_content,
+            css_content=request.css_content,
+            output_path=output_path,
+            contains_code=request.contains_code,  # Passing contains_code directly
+            template=template,
+            optimization_profile=request.optimization_profile,
+            max_pages=request.max_pages,
+            preview_pages=request.preview_pages,
+            incremental=request.incremental,
+            on_progress=on_progress,
+        )
+        # Previews are kept out of the document index
+        if request.preview_pages is None:
+            with tracer.start_span("pdf.store"):
+                await index_document(
+                    output_path,
+                    job.filename,
+                    page_count=page_count,
+                    render_ms=(time.perf_counter() - started) * 1000,
+                    api_key_id=job.api_key_id,
+                )
+        progress.publish(job.job_id, "stored", pages=page_count)
+    except HTTPException as e:
+        error = (
+            ErrorResponse(**e.detail)
+            if isinstance(e.detail, dict)
+            else ErrorResponse(status=e.status_code, code="error", message=str(e.detail))
+        )
+        return finish("failed", error=error)
+    except OSError as e:
+        logger.error("File error creating PDF: %s", e)
+        return finish("failed", error=_internal_error(e))
+    except Exception as e:
+        logger.exception("Unexpected error creating PDF")
+        return finish("failed", error=_internal_error(e))
+
+    return finish(
+        "completed", url=download_url(job.filename), page_count=page_count
+    )
@@ -1,32 +1,76 @@
 """Application entry point configuring routes and startup behavior."""
 
+import asyncio
+import logging
+import sqlite3
 from contextlib import asynccontextmanager
 from pathlib import Path as FilePath
-from typing import AsyncGenerator
+from typing import Any, AsyncGenerator, Optional
+from urllib.parse import quote
 
-from fastapi import FastAPI, HTTPException, Path, Request
+import anyio
+from fastapi import FastAPI, HTTPException, Path, Request, Response, Security
 from fastapi.openapi.utils import get_openapi
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, ORJSONResponse
+from starlette.types import Receive, Scope, Send
 
+from .compression import JSONCompressionMiddleware
 from .config import settings
-from .dependencies import cleanup_downloads_folder
+from .dependencies import api_key_header, get_api_key, preload_renderer, tenant_scope
+from .index import delete_documents, get_document, indexed_stat_result
+from .maintenance import MaintenanceScheduler
 from .models import ErrorResponse
+from .queue import get_render_queue
+from .routes.admin import admin_router
 from .routes.create import pdf_router
+from .routes.documents import document_router
+from .routes.jobs import job_router
+from .routes.pdfops import pdfops_router
+from .routes.metrics import metrics_router
+from .routes.templates import template_router
+from .tracing import TracingMiddleware, tracer
+from .webhooks import webhooks
+
+logger = logging.getLogger(__name__)
 
 tags_metadata = [
-    {"name": "PDF", "description": "Operations for creating PDF documents."}
+    {"name": "PDF", "description": "Operations for creating PDF documents."},
+    {
+        "name": "Templates",
+        "description": "Manage reusable server-side document templates.",
+    },
 ]
 
 
+class TracedORJSONResponse(ORJSONResponse):
+    """ORJSONResponse recording serialization time in the current trace."""
+
+    def render(self, content: Any) -> bytes:
+        with tracer.start_span("response.serialize"):
+            return super().render(content)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
-    downloads_path = FilePath("/app/downloads")
+    downloads_path = FilePath(settings.DOWNLOADS_DIR)
     downloads_path.mkdir(parents=True, exist_ok=True)
-    await cleanup_downloads_folder(str(downloads_path))
+    tracer.configure()
+    if settings.QUEUE_BACKEND == "memory" or settings.RENDER_WORKER:
+        # Import WeasyPrint here rather than during the first render
+        await asyncio.to_thread(preload_renderer)
+    # Only the worker holding the leader lock runs maintenance jobs
+    scheduler = MaintenanceScheduler(downloads_path)
+    await scheduler.start()
+    await webhooks.start()
+    render_queue = get_render_queue()
+    await render_queue.start()
     try:
         yield
     finally:
-        await cleanup_downloads_folder(str(downloads_path))
+        await render_queue.stop()
+        await webhooks.stop()
+        await scheduler.stop()
+        tracer.shutdown()
 
 # FastAPI application instance
 app = FastAPI(
@@ -44,10 +88,103 @@ app = FastAPI(
         }
     ],
     lifespan=lifespan,
+    default_response_class=TracedORJSONResponse,
+)
+
+app.add_middleware(
+    JSONCompressionMiddleware, minimum_size=settings.JSON_COMPRESSION_MIN_SIZE
 )
+# Added last so the request span also covers response compression
+app.add_middleware(TracingMiddleware)
 
 # Include routers
 app.include_router(pdf_router)
+app.include_router(job_router)
+app.include_router(pdfops_router)
+app.include_router(document_router)
+app.include_router(metrics_router)
+app.include_router(admin_router)
+app.include_router(template_router)
+
+
+def _forget_document(relative_path: FilePath) -> None:
+    """Drop the index record of a download whose file no longer exists."""
+    try:
+        delete_documents([relative_path.as_posix()])
+    except sqlite3.Error as e:
+        logger.error("Failed to drop stale index record %s: %s", relative_path, e)
+
+
+def _offloaded_response(
+    file_path: FilePath, relative_path: FilePath, headers: dict[str, str]
+) -> Response:
+    """Return an empty response telling the reverse proxy to send the file."""
+    if settings.DOWNLOADS_OFFLOAD == "x-accel-redirect":
+        # nginx resolves this URI against an internal location, not the app
+        headers["X-Accel-Redirect"] = (
+            f"{settings.ROOT_PATH}{settings.DOWNLOADS_ACCEL_PREFIX}/"
+            f"{quote(relative_path.as_posix())}"
+        )
+    else:
+        headers["X-Sendfile"] = str(file_path)
+    return Response(media_type="application/pdf", headers=headers)
+
+
+def _file_not_found() -> HTTPException:
+    return HTTPException(
+        status_code=404,
+        detail={
+            "status": 404,
+            "code": "file_not_found",
+            "message": "File not found",
+            "details": "Ensure the filename is correct",
+        },
+    )
+
+
+class _IndexedFileResponse(FileResponse):
+    """
+    Serve an indexed download using the stat data stored in the index.
+
+    Nothing touches the filesystem before the file is opened. The file is
+    opened before the response starts, so a record that outlived its file
+    still becomes a 404 and is dropped from the index.
+    """
+
+    def __init__(self, path: FilePath, relative_path: FilePath, **kwargs: Any) -> None:
+        super().__init__(path, **kwargs)
+        self.relative_path = relative_path
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            file = await anyio.open_file(self.path, mode="rb")
+        except FileNotFoundError:
+            await asyncio.to_thread(_forget_document, self.relative_path)
+            response = ORJSONResponse(status_code=404, content=_file_not_found().detail)
+            await response(scope, receive, send)
+            return
+        async with file:
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": self.status_code,
+                    "headers": self.raw_headers,
+                }
+            )
+            if scope["method"].upper() == "HEAD":
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+            elif "http.response.pathsend" in scope.get("extensions", {}):
+                await send({"type": "http.response.pathsend", "path": str(self.path)})
+            else:
+                more_body = True
+                while more_body:
+                    chunk = await file.read(self.chunk_size)
+                    more_body = len(chunk) == self.chunk_size
+                    await send(
+                        {"type": "http.response.body", "body": chunk, "more_body": more_body}
+                    )
+        if self.background is not None:
+            await self.background()
 
 
 @app.get(
@@ -55,8 +192,13 @@ app.include_router(pdf_router)
     response_class=FileResponse,
     tags=["PDF"],
     summary="Download PDF",
-    description="Retrieve a previously generated PDF file by its filename.",
+    description=(
+        "Retrieve a previously generated PDF file by its filename. When "
+        "tenants are configured an API key is required, and documents are "
+        "only served to the tenant that created them or the admin key."
+    ),
     responses={
+        403: {"description": "Invalid or missing API key", "model": ErrorResponse},
         404: {"description": "File not found", "model": ErrorResponse},
     },
     openapi_extra={
@@ -81,22 +223,56 @@ def download_pdf(
         ...,
         description="Name of the PDF file to download",
         example="example.pdf"
-    )
+    ),
+    api_key: Optional[str] = Security(api_key_header),
 ) -> FileResponse:
-    downloads_dir = FilePath("/app/downloads").resolve()
-    file_path = FilePath("/app/downloads", filename).resolve()
+    # Single-key deployments keep download URLs shareable without the key
+    scope = tenant_scope(get_api_key(api_key)) if settings.API_KEYS else None
+    downloads_dir = FilePath(settings.DOWNLOADS_DIR).resolve()
+    file_path = FilePath(settings.DOWNLOADS_DIR, filename).resolve()
     if not str(file_path).startswith(str(downloads_dir)):
         raise HTTPException(status_code=400)
-    if not file_path.is_file():
-        raise HTTPException(
-            status_code=404,
-            detail={
-                "status": 404,
-                "code": "file_not_found",
-                "message": "File not found",
-                "details": "Ensure the filename is correct",
-            },
-        )
+    relative_path = file_path.relative_to(downloads_dir)
+    # Hidden entries hold internal state such as stored templates
+    hidden = any(part.startswith(".") for part in relative_path.parts)
+    if not hidden:
+        try:
+            record = get_document(relative_path.as_posix())
+        except sqlite3.Error as e:
+            logger.error("Index lookup failed for %s: %s", filename, e)
+            if scope is not None:
+                # Without the index the document's tenant cannot be checked
+                raise HTTPException(
+                    status_code=500,
+                    detail={
+                        "status": 500,
+                        "code": "internal_server_error",
+                        "message": "Internal Server Error",
+                        "details": str(e),
+                    },
+                ) from e
+            record = None
+        if record is not None and scope is not None and record.api_key_id != scope:
+            # Other tenants' documents are reported as missing, not forbidden
+            raise _file_not_found()
+        if record is not None:
+            headers = {"ETag": f'"{record.sha256}"'}
+            # Indexed metadata replaces the stat calls; a record that outlived
+            # its file gets a 404 from the proxy or when the file is opened,
+            # and index compaction drops it
+            if settings.DOWNLOADS_OFFLOAD != "none":
+                return _offloaded_response(file_path, relative_path, headers)
+            return _IndexedFileResponse(
+                file_path,
+                relative_path,
+                stat_result=indexed_stat_result(record),
+                headers=headers,
+            )
+    # Documents created before the index existed fall back to the filesystem
+    if hidden or not file_path.is_file():
+        raise _file_not_found()
+    if settings.DOWNLOADS_OFFLOAD != "none":
+        return _offloaded_response(file_path, relative_path, {})
     return FileResponse(file_path)
 
 
@@ -130,8 +306,12 @@ app.openapi = custom_openapi
 
 
 @app.exception_handler(HTTPException)
-def http_exception_handler(request: Request, exc: HTTPException) -> JSONResponse:
+def http_exception_handler(request: Request, exc: HTTPException) -> ORJSONResponse:
     """Return JSON errors for HTTPException instances."""
     if isinstance(exc.detail, dict):
-        return JSONResponse(status_code=exc.status_code, content=exc.detail)
-    return JSONResponse(status_code=exc.status_code, content={"detail": exc.detail})
+        return ORJSONResponse(
+            status_code=exc.status_code, content=exc.detail, headers=exc.headers
+        )
+    return ORJSONResponse(
+        status_code=exc.status_code, content={"detail": exc.detail}, headers=exc.headers
+    )
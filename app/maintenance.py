@@ -0,0 +1,221 @@
+"""Background maintenance run by a single leader among uvicorn workers."""
+
+import asyncio
+import fcntl
+import logging
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+from .config import settings
+from .dependencies import cleanup_downloads_folder
+from .index import compact_index, delete_documents
+from .jobs import PREVIEWS_FOLDER
+from .metrics import metrics
+
+
+logger = logging.getLogger(__name__)
+
+metrics.describe(
+    "maintenance_job_seconds", "summary", "Runtime of maintenance jobs in seconds"
+)
+metrics.describe(
+    "maintenance_job_failures_total", "counter", "Maintenance jobs that raised"
+)
+metrics.describe(
+    "maintenance_leader", "gauge", "1 if this worker holds the maintenance lock"
+)
+
+
+class LeaderLock:
+    """
+    Non-blocking exclusive ``flock`` on a file in the downloads volume.
+
+    The kernel releases the lock when the holding process exits, so another
+    worker acquires it on its next attempt.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._fd: Optional[int] = None
+
+    @property
+    def held(self) -> bool:
+        return self._fd is not None
+
+    def try_acquire(self) -> bool:
+        if self._fd is not None:
+            return True
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._fd = fd
+        return True
+
+    def release(self) -> None:
+        if self._fd is None:
+            return
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+        self._fd = None
+
+
+def _enforce_quota(folder_path: Path, quota_bytes: int) -> int:
+    """Delete the oldest PDFs until the folder fits within ``quota_bytes``."""
+    files = [
+        (entry.stat(), entry)
+        for entry in folder_path.iterdir()
+        if entry.is_file() and not entry.name.startswith(".")
+    ]
+    total = sum(stat_result.st_size for stat_result, _ in files)
+    removed: list[str] = []
+    for stat_result, entry in sorted(files, key=lambda item: item[0].st_mtime):
+        if total <= quota_bytes:
+            break
+        entry.unlink(missing_ok=True)
+        total -= stat_result.st_size
+        removed.append(entry.name)
+    if removed:
+        delete_documents(removed)
+        logger.info("Quota enforcement removed %d files", len(removed))
+    return len(removed)
+
+
+async def expire_downloads(downloads_path: Path) -> None:
+    await cleanup_downloads_folder(str(downloads_path))
+
+
+def _expire_previews(folder_path: Path, ttl_seconds: int) -> int:
+    """Delete previews older than ``ttl_seconds``."""
+    if not folder_path.is_dir():
+        return 0
+    cutoff = time.time() - ttl_seconds
+    removed = 0
+    for entry in folder_path.iterdir():
+        if entry.is_file() and entry.stat().st_mtime < cutoff:
+            entry.unlink(missing_ok=True)
+            removed += 1
+    return removed
+
+
+async def expire_previews(downloads_path: Path) -> None:
+    removed = await asyncio.to_thread(
+        _expire_previews, downloads_path / PREVIEWS_FOLDER, settings.PREVIEW_TTL_SECONDS
+    )
+    if removed:
+        logger.info("Preview expiry removed %d files", removed)
+
+
+async def enforce_quota(downloads_path: Path) -> None:
+    if settings.DOWNLOADS_QUOTA_BYTES > 0:
+        await asyncio.to_thread(
+            _enforce_quota, downloads_path, settings.DOWNLOADS_QUOTA_BYTES
+        )
+
+
+async def compact_caches(downloads_path: Path) -> None:
+    removed = await asyncio.to_thread(compact_index, downloads_path)
+    if removed:
+        logger.info("Index compaction dropped %d stale records", removed)
+
+
+Job = Callable[[Path], Awaitable[None]]
+
+DEFAULT_JOBS: dict[str, Job] = {
+    "expiry": expire_downloads,
+    "previews": expire_previews,
+    "quota": enforce_quota,
+    "compaction": compact_caches,
+}
+
+
+class MaintenanceScheduler:
+    """
+    Run periodic maintenance jobs in exactly one process.
+
+    Every worker starts a scheduler; the one holding the leader lock runs the
+    jobs every ``MAINTENANCE_INTERVAL_SECONDS`` while the others retry the
+    lock every ``LEADER_RETRY_SECONDS`` so leadership fails over when the
+    leader exits.
+    """
+
+    def __init__(
+        self, downloads_path: Path, jobs: Optional[dict[str, Job]] = None
+    ) -> None:
+        self.downloads_path = downloads_path
+        self.jobs = jobs if jobs is not None else DEFAULT_JOBS
+        self.lock = LeaderLock(downloads_path / ".maintenance" / "leader.lock")
+        self._task: Optional[asyncio.Task] = None
+        self._last_run: Optional[float] = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self.lock.held
+
+    async def start(self) -> None:
+        """Attempt leadership, run a first pass if elected and start the loop."""
+        await self._tick()
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        """Stop the loop; the leader runs a final pass and releases the lock."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.is_leader:
+            await self.run_jobs()
+            self.lock.release()
+        metrics.set("maintenance_leader", 0)
+
+    async def run_jobs(self) -> None:
+        """Run every job once, recording runtimes and failures."""
+        for name, job in self.jobs.items():
+            started = time.perf_counter()
+            try:
+                await job(self.downloads_path)
+            except Exception:
+                metrics.inc("maintenance_job_failures_total", job=name)
+                logger.exception("Maintenance job %s failed", name)
+            finally:
+                metrics.observe(
+                    "maintenance_job_seconds", time.perf_counter() - started, job=name
+                )
+        self._last_run = time.monotonic()
+
+    async def _tick(self) -> None:
+        if not self.is_leader:
+            try:
+                acquired = await asyncio.to_thread(self.lock.try_acquire)
+            except OSError as e:
+                logger.error("Maintenance lock unavailable: %s", e)
+                acquired = False
+            if acquired:
+                logger.info("Worker %d elected maintenance leader", os.getpid())
+                self._last_run = None
+        metrics.set("maintenance_leader", 1 if self.is_leader else 0)
+        due = (
+            self._last_run is None
+            or time.monotonic() - self._last_run >= settings.MAINTENANCE_INTERVAL_SECONDS
+        )
+        if self.is_leader and due:
+            await self.run_jobs()
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(settings.LEADER_RETRY_SECONDS)
+            try:
+                await self._tick()
+            except (OSError, sqlite3.Error):
+                logger.exception("Maintenance tick failed")
@@ -0,0 +1,97 @@
+"""In-process metrics registry rendered in the Prometheus text format."""
+
+import math
+import threading
+from typing import Optional
+
+
+LabelKey = tuple[tuple[str, str], ...]
+
+
+class Metrics:
+    """Thread-safe counters, gauges and summaries for a single worker process."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._help: dict[str, tuple[str, str]] = {}
+        self._counters: dict[str, dict[LabelKey, float]] = {}
+        self._gauges: dict[str, dict[LabelKey, float]] = {}
+        self._summaries: dict[str, dict[LabelKey, list[float]]] = {}
+
+    def describe(self, name: str, kind: str, help_text: str) -> None:
+        """Register the metric type and help text shown in the exposition."""
+        self._help[name] = (kind, help_text)
+
+    def inc(self, name: str, value: float = 1.0, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def set(self, name: str, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._gauges.setdefault(name, {})[key] = value
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        """Record a sample in a summary tracking count, sum and maximum."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._summaries.setdefault(name, {})
+            count, total, maximum = series.get(key, (0, 0.0, -math.inf))
+            series[key] = (count + 1, total + value, max(maximum, value))
+
+    def get(self, name: str, **labels: str) -> Optional[float]:
+        """Return the current value of a counter or gauge series."""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            for store in (self._counters, self._gauges):
+                if key in store.get(name, {}):
+                    return store[name][key]
+        return None
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._summaries.clear()
+
+    def render(self) -> str:
+        """Return all series in the Prometheus text exposition format."""
+        lines: list[str] = []
+        with self._lock:
+            for kind, store in (("counter", self._counters), ("gauge", self._gauges)):
+                for name, series in sorted(store.items()):
+                    lines.extend(self._header(name, kind))
+                    for key, value in sorted(series.items()):
+                        lines.append(f"{name}{_labels(key)} {value}")
+            for name, series in sorted(self._summaries.items()):
+                lines.extend(self._header(name, "summary"))
+                for key, (count, total, maximum) in sorted(series.items()):
+                    lines.append(f"{name}_count{_labels(key)} {count}")
+                    lines.append(f"{name}_sum{_labels(key)} {total}")
+                    lines.append(f"{name}_max{_labels(key)} {maximum}")
+        return "\n".join(lines) + "\n"
+
+    def _header(self, name: str, default_kind: str) -> list[str]:
+        kind, help_text = self._help.get(name, (default_kind, ""))
+        header = [f"# TYPE {name} {kind}"]
+        if help_text:
+            header.insert(0, f"# HELP {name} {help_text}")
+        return header
+
+
+def _labels(key: LabelKey) -> str:
+    if not key:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(
+            name,
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"),
+        )
+        for name, value in key
+    )
+    return "{" + pairs + "}"
+
+
+metrics = Metrics()
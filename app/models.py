@@ -1,9 +1,71 @@
 """Common data models and request/response schemas."""
 
+import base64
+import binascii
 import re
-from typing import Optional
+from datetime import datetime
+from typing import Literal, Optional
 
-from pydantic import BaseModel, Field, field_validator, ConfigDict
+from pydantic import BaseModel, Field, field_validator, model_validator, ConfigDict
+
+from .outbound import UnsafeURLError, check_url
+from .tracing import tracer
+
+
+TEMPLATE_ID_PATTERN = r"[a-z0-9_-]{1,64}"
+TEMPLATE_BODY_PLACEHOLDER = "{{ body }}"
+
+_PROHIBITED_TAGS = [r"<\s*h1\b", r"<\s*script\b", r"<\s*form\b"]
+_DISALLOWED_CSS = ["@import", "url(", "<script"]
+
+
+def _contains_prohibited_tags(value: str) -> bool:
+    """Return True if an HTML fragment contains tags the renderer rejects."""
+    return any(re.search(pattern, value, re.IGNORECASE) for pattern in _PROHIBITED_TAGS)
+
+
+def _contains_disallowed_css(value: str) -> bool:
+    """Return True if CSS contains constructs that could fetch resources."""
+    lowered = value.lower()
+    return any(term in lowered for term in _DISALLOWED_CSS)
+
+
+def _sanitize_output_filename(value: Optional[str]) -> Optional[str]:
+    if value is None:
+        return value
+    value = value.strip().lower()
+    if "/" in value or "\\" in value:
+        raise ValueError("output_filename cannot contain path separators")
+    if value.endswith(".pdf"):
+        value = value[:-4]
+    if not value:
+        raise ValueError("output_filename cannot be empty")
+    if len(value) > 100:
+        raise ValueError("output_filename is too long")
+    if not re.fullmatch(r"[a-z0-9_-]+", value):
+        raise ValueError("output_filename contains invalid characters")
+    return f"{value}.pdf"
+
+
+def _validate_download_filename(value: str) -> str:
+    """Check that a name refers to a PDF directly inside the downloads folder."""
+    value = value.strip()
+    if "/" in value or "\\" in value or value.startswith("."):
+        raise ValueError("filename must name a file in the downloads folder")
+    if not value.lower().endswith(".pdf") or len(value) > 255:
+        raise ValueError("filename must be a PDF download filename")
+    return value
+
+
+def _normalize_template_id(value: Optional[str]) -> Optional[str]:
+    if value is None:
+        return value
+    value = value.strip().lower()
+    if not re.fullmatch(TEMPLATE_ID_PATTERN, value):
+        raise ValueError(
+            "template_id must be 1-64 lowercase letters, numbers, hyphens, or underscores"
+        )
+    return value
 
 
 class ErrorResponse(BaseModel):
@@ -69,6 +131,68 @@ class CreatePDFRequest(BaseModel):
             "and the '.pdf' extension is appended automatically."
         ),
     )
+    template_id: Optional[str] = Field(
+        None,
+        description=(
+            "Optional identifier of a stored template. The template's CSS, "
+            "fonts, header, footer, and wrapper HTML are applied server-side, "
+            "so only the variable 'body_content' needs to be sent."
+        ),
+    )
+    optimization_profile: Optional[Literal["fast", "small", "print"]] = Field(
+        None,
+        description=(
+            "Optional output optimization profile. 'fast' minimizes render "
+            "time, 'small' recompresses images at 150 DPI for the smallest "
+            "file, and 'print' recompresses images as high-quality (q90) JPEG "
+            "at up to 300 DPI. WeasyPrint defaults are used when omitted."
+        ),
+    )
+    max_pages: Optional[int] = Field(
+        None,
+        description=(
+            "Optional page limit. Rendering stops with a 'page_limit_exceeded' "
+            "error as soon as the document lays out more pages. Values above "
+            "the server's own limit are lowered to it."
+        ),
+        ge=1,
+    )
+    preview_pages: Optional[int] = Field(
+        None,
+        description=(
+            "Render a quick preview containing only the first N pages. "
+            "Previews skip image optimization, are tagged as previews and are "
+            "stored apart from final documents for a short time."
+        ),
+        ge=1,
+        le=10,
+    )
+    incremental: bool = Field(
+        False,
+        description=(
+            "Render section by section, splitting the body at top-level "
+            "'<!-- section -->' markers or, without markers, before each "
+            "top-level <h1> and <h2>. Each section starts a new page, and "
+            "sections unchanged since an earlier render are reused instead of "
+            "being laid out again. Page numbers and the title footer cover the "
+            "whole document."
+        ),
+    )
+    callback_url: Optional[str] = Field(
+        None,
+        description=(
+            "Optional HTTP(S) URL that receives a signed POST with the result, "
+            "page count and timings when the render completes or fails."
+        ),
+        max_length=2048,
+        json_schema_extra={"format": "uri"},
+    )
+
+    @model_validator(mode="wrap")
+    @classmethod
+    def trace_validation(cls, data, handler):
+        with tracer.start_span("request.validate"):
+            return handler(data)
 
     @field_validator("pdf_title", mode="before")
     def strip_title(cls, value: str) -> str:
@@ -80,37 +204,35 @@ class CreatePDFRequest(BaseModel):
     def validate_body(cls, value: str) -> str:
         if not value or not value.strip():
             raise ValueError("body_content cannot be empty")
-        prohibited = [r"<\s*h1\b", r"<\s*script\b", r"<\s*form\b"]
-        for pattern in prohibited:
-            if re.search(pattern, value, re.IGNORECASE):
-                raise ValueError("body_content contains prohibited tags")
+        if _contains_prohibited_tags(value):
+            raise ValueError("body_content contains prohibited tags")
         return value
 
     @field_validator("css_content")
     def validate_css(cls, value: Optional[str]) -> Optional[str]:
         if value is None:
             return value
-        lowered = value.lower()
-        if any(term in lowered for term in ["@import", "url(", "<script"]):
+        if _contains_disallowed_css(value):
             raise ValueError("css_content contains disallowed constructs")
         return value
 
-    @field_validator("output_filename", mode="before")
-    def sanitize_filename(cls, value: Optional[str]) -> Optional[str]:
+    @field_validator("template_id", mode="before")
+    def validate_template_id(cls, value: Optional[str]) -> Optional[str]:
+        return _normalize_template_id(value)
+
+    @field_validator("callback_url")
+    def validate_callback_url(cls, value: Optional[str]) -> Optional[str]:
         if value is None:
             return value
-        value = value.strip().lower()
-        if "/" in value or "\\" in value:
-            raise ValueError("output_filename cannot contain path separators")
-        if value.endswith(".pdf"):
-            value = value[:-4]
-        if not value:
-            raise ValueError("output_filename cannot be empty")
-        if len(value) > 100:
-            raise ValueError("output_filename is too long")
-        if not re.fullmatch(r"[a-z0-9_-]+", value):
-            raise ValueError("output_filename contains invalid characters")
-        return f"{value}.pdf"
+        try:
+            check_url(value)
+        except UnsafeURLError as e:
+            raise ValueError(f"callback_url {e}") from e
+        return value
+
+    @field_validator("output_filename", mode="before")
+    def sanitize_filename(cls, value: Optional[str]) -> Optional[str]:
+        return _sanitize_output_filename(value)
 
     model_config = ConfigDict(extra="forbid")
 
@@ -124,6 +246,12 @@ class CreatePDFResponse(BaseModel):
         ..., description="URL where the generated PDF can be downloaded",
         json_schema_extra={"format": "uri"},
     )
+    page_count: Optional[int] = Field(
+        None, description="Number of pages in the generated PDF"
+    )
+    preview: bool = Field(
+        False, description="Whether the PDF is a short-lived preview of the first pages"
+    )
 
     @field_validator("url")
     def validate_url(cls, value: str) -> str:
@@ -140,6 +268,480 @@ class CreatePDFResponse(BaseModel):
                 "results": ("PDF generation is complete. "
                             "You can download it from the following URL:"),
                 "url": "https://example.com/downloads/example-pdf.pdf",
+                "page_count": 3,
             }
         }
     )
+
+
+class MergePDFRequest(BaseModel):
+    filenames: list[str] = Field(
+        ...,
+        description=(
+            "Download filenames of previously generated PDFs, in the order "
+            "their pages should appear."
+        ),
+        min_length=1,
+        max_length=100,
+    )
+    output_filename: Optional[str] = Field(
+        None,
+        description=(
+            "Optional filename for the merged PDF, with the same rules as "
+            "'output_filename' when creating a PDF."
+        ),
+    )
+
+    @field_validator("filenames")
+    def validate_filenames(cls, value: list[str]) -> list[str]:
+        return [_validate_download_filename(filename) for filename in value]
+
+    @field_validator("output_filename", mode="before")
+    def sanitize_filename(cls, value: Optional[str]) -> Optional[str]:
+        return _sanitize_output_filename(value)
+
+    model_config = ConfigDict(
+        extra="forbid",
+        json_schema_extra={
+            "example": {
+                "filenames": [
+                    "cover-letter-20240101120000.pdf",
+                    "report-20240101120500.pdf",
+                ],
+                "output_filename": "report-pack",
+            }
+        },
+    )
+
+
+class Stamp(BaseModel):
+    text: Optional[str] = Field(
+        None,
+        description="Plain text to stamp, such as 'DRAFT' or a recipient name.",
+        min_length=1,
+        max_length=500,
+    )
+    html: Optional[str] = Field(
+        None,
+        description=(
+            "Small HTML fragment to stamp instead of 'text'. The same tags "
+            "as in 'body_content' are disallowed."
+        ),
+        min_length=1,
+        max_length=20000,
+    )
+    css_content: Optional[str] = Field(
+        None, description="Optional CSS for the 'html' fragment.", max_length=20000
+    )
+    position: Literal["watermark", "header", "footer"] = Field(
+        "watermark",
+        description=(
+            "'watermark' is large diagonal text across the page center, "
+            "'header' and 'footer' place small text in the top-right corner "
+            "or bottom center."
+        ),
+    )
+    opacity: float = Field(
+        0.3, ge=0.05, le=1.0, description="Opacity of the stamp from 0.05 to 1."
+    )
+
+    @field_validator("html")
+    def validate_html(cls, value: Optional[str]) -> Optional[str]:
+        if value is not None and _contains_prohibited_tags(value):
+            raise ValueError("html contains prohibited tags")
+        return value
+
+    @field_validator("css_content")
+    def validate_css(cls, value: Optional[str]) -> Optional[str]:
+        if value is not None and _contains_disallowed_css(value):
+            raise ValueError("css_content contains disallowed constructs")
+        return value
+
+    @model_validator(mode="after")
+    def require_one_source(self) -> "Stamp":
+        if (self.text is None) == (self.html is None):
+            raise ValueError("exactly one of text or html is required")
+        return self
+
+    model_config = ConfigDict(extra="forbid")
+
+
+class StampPDFRequest(BaseModel):
+    filename: str = Field(
+        ..., description="Download filename of the previously generated PDF to stamp."
+    )
+    stamps: list[Stamp] = Field(
+        ...,
+        description="Stamps composited onto every page, in order.",
+        min_length=1,
+        max_length=10,
+    )
+    output_filename: Optional[str] = Field(
+        None,
+        description=(
+            "Optional filename for the stamped PDF, with the same rules as "
+            "'output_filename' when creating a PDF."
+        ),
+    )
+
+    @field_validator("filename")
+    def validate_filename(cls, value: str) -> str:
+        return _validate_download_filename(value)
+
+    @field_validator("output_filename", mode="before")
+    def sanitize_filename(cls, value: Optional[str]) -> Optional[str]:
+        return _sanitize_output_filename(value)
+
+    model_config = ConfigDict(
+        extra="forbid",
+        json_schema_extra={
+            "example": {
+                "filename": "report-20240101120500.pdf",
+                "stamps": [
+                    {"text": "DRAFT"},
+                    {"text": "Prepared for Jane Doe", "position": "header",
+                     "opacity": 1.0},
+                ],
+                "output_filename": "report-jane-doe",
+            }
+        },
+    )
+
+
+class PDFOperationResponse(BaseModel):
+    results: str = Field(..., description="Outcome message for the operation")
+    url: str = Field(
+        ..., description="URL where the resulting PDF can be downloaded",
+        json_schema_extra={"format": "uri"},
+    )
+    page_count: int = Field(..., description="Number of pages in the resulting PDF")
+
+    model_config = ConfigDict(extra="forbid")
+
+
+class TemplateFont(BaseModel):
+    family: str = Field(
+        ...,
+        description="Font family name referenced from the template CSS",
+        min_length=1,
+        max_length=100,
+    )
+    data: str = Field(
+        ...,
+        description="Base64-encoded font file",
+        max_length=4_000_000,
+    )
+    format: Literal["woff2", "woff", "truetype", "opentype"] = Field(
+        "woff2", description="Font file format"
+    )
+
+    @field_validator("family")
+    def validate_family(cls, value: str) -> str:
+        if not re.fullmatch(r"[A-Za-z0-9 _-]+", value):
+            raise ValueError("family contains invalid characters")
+        return value
+
+    @field_validator("data")
+    def validate_data(cls, value: str) -> str:
+        try:
+            base64.b64decode(value, validate=True)
+        except (binascii.Error, ValueError) as e:
+            raise ValueError("data must be valid base64") from e
+        return value
+
+    model_config = ConfigDict(extra="forbid")
+
+
+# Request model for storing a reusable template
+class TemplateRequest(BaseModel):
+    css_content: Optional[str] = Field(
+        None,
+        description=(
+            "CSS applied to every document using the template. Request-level "
+            "'css_content' still takes precedence. Disallows '@import', "
+            "'url()' functions, and '<script>' tags."
+        ),
+    )
+    header_html: Optional[str] = Field(
+        None, description="HTML repeated in the top margin of every page"
+    )
+    footer_html: Optional[str] = Field(
+        None, description="HTML repeated in the bottom center margin of every page"
+    )
+    wrapper_html: Optional[str] = Field(
+        None,
+        description=(
+            "HTML wrapped around the request body. Must contain the "
+            f"'{TEMPLATE_BODY_PLACEHOLDER}' placeholder exactly once."
+        ),
+    )
+    fonts: list[TemplateFont] = Field(
+        default_factory=list,
+        description="Fonts embedded with @font-face rules",
+        max_length=10,
+    )
+
+    @field_validator("css_content")
+    def validate_css(cls, value: Optional[str]) -> Optional[str]:
+        if value is not None and _contains_disallowed_css(value):
+            raise ValueError("css_content contains disallowed constructs")
+        return value
+
+    @field_validator("header_html", "footer_html", "wrapper_html")
+    def validate_html(cls, value: Optional[str]) -> Optional[str]:
+        if value is not None and _contains_prohibited_tags(value):
+            raise ValueError("template HTML contains prohibited tags")
+        return value
+
+    @field_validator("wrapper_html")
+    def validate_wrapper(cls, value: Optional[str]) -> Optional[str]:
+        if value is not None and value.count(TEMPLATE_BODY_PLACEHOLDER) != 1:
+            raise ValueError(
+                f"wrapper_html must contain '{TEMPLATE_BODY_PLACEHOLDER}' exactly once"
+            )
+        return value
+
+    model_config = ConfigDict(
+        extra="forbid",
+        json_schema_extra={
+            "example": {
+                "css_content": "h2 { color: #1f4e79; }",
+                "footer_html": "<span>Confidential</span>",
+                "wrapper_html": "<main class=\"report\">{{ body }}</main>",
+            }
+        },
+    )
+
+
+# Response model describing a stored template
+class TemplateResponse(BaseModel):
+    template_id: str = Field(..., description="Identifier of the template")
+    version: int = Field(
+        ..., description="Version number, incremented on every upload"
+    )
+    created_at: datetime = Field(..., description="When the template was first stored")
+    updated_at: datetime = Field(..., description="When the template was last replaced")
+
+    model_config = ConfigDict(extra="forbid")
+
+
+# Metadata of a generated document stored in the index
+class DocumentRecord(BaseModel):
+    filename: str = Field(..., description="Download filename of the document")
+    sha256: str = Field(..., description="SHA-256 hash of the PDF bytes")
+    size: int = Field(..., description="File size in bytes")
+    page_count: Optional[int] = Field(None, description="Number of pages")
+    render_ms: Optional[float] = Field(
+        None, description="Render duration in milliseconds"
+    )
+    api_key_id: Optional[str] = Field(
+        None, description="Identity of the API key that requested the document"
+    )
+    created_at: datetime = Field(..., description="When the document was generated")
+    mtime: float = Field(
+        ..., description="File modification time in seconds since the epoch"
+    )
+
+    model_config = ConfigDict(extra="forbid")
+
+
+# Paginated listing of indexed documents
+class DocumentListResponse(BaseModel):
+    items: list[DocumentRecord] = Field(..., description="Documents on this page")
+    total: int = Field(..., description="Number of documents matching the filter")
+    total_bytes: int = Field(
+        ..., description="Combined size in bytes of all matching documents"
+    )
+    limit: int = Field(..., description="Maximum number of items per page")
+    offset: int = Field(..., description="Number of items skipped")
+
+    model_config = ConfigDict(extra="forbid")
+
+
+# Status of an asynchronous render job
+class JobStatusResponse(BaseModel):
+    job_id: str = Field(..., description="Identifier of the render job")
+    status: Literal["queued", "running", "completed", "failed"] = Field(
+        ..., description="Current state of the job"
+    )
+    url: Optional[str] = Field(
+        None,
+        description="URL where the generated PDF can be downloaded once completed",
+        json_schema_extra={"format": "uri"},
+    )
+    page_count: Optional[int] = Field(
+        None, description="Number of pages in the generated PDF"
+    )
+    render_ms: Optional[float] = Field(
+        None, description="Time spent rendering in milliseconds"
+    )
+    error: Optional[ErrorResponse] = Field(
+        None, description="Error details when the job failed"
+    )
+    created_at: datetime = Field(..., description="When the job was submitted")
+    started_at: Optional[datetime] = Field(
+        None, description="When a worker started rendering the job"
+    )
+    updated_at: datetime = Field(..., description="When the job status last changed")
+
+    model_config = ConfigDict(extra="forbid")
+
+
+class RenderTimings(BaseModel):
+    queued_ms: Optional[float] = Field(
+        None, description="Time between submission and the start of rendering"
+    )
+    render_ms: Optional[float] = Field(None, description="Time spent rendering")
+    total_ms: float = Field(..., description="Time between submission and completion")
+
+    model_config = ConfigDict(extra="forbid")
+
+
+# Body of the signed completion webhook sent to callback_url
+class WebhookPayload(BaseModel):
+    event: Literal["pdf.completed", "pdf.failed"] = Field(
+        ..., description="Whether the render completed or failed"
+    )
+    job_id: str = Field(..., description="Identifier of the render job")
+    results: Optional[str] = Field(
+        None, description="Outcome message, as returned by create_pdf"
+    )
+    url: Optional[str] = Field(
+        None,
+        description="URL where the generated PDF can be downloaded",
+        json_schema_extra={"format": "uri"},
+    )
+    page_count: Optional[int] = Field(
+        None, description="Number of pages in the generated PDF"
+    )
+    error: Optional[ErrorResponse] = Field(
+        None, description="Error details when the render failed"
+    )
+    timings: RenderTimings
+
+    model_config = ConfigDict(extra="forbid")
+
+
+# Server-Sent Event describing a render stage transition
+class ProgressEvent(BaseModel):
+    job_id: str = Field(..., description="Identifier of the render job")
+    seq: int = Field(..., description="Sequence number, sent as the SSE event id")
+    stage: Literal[
+        "validated",
+        "queued",
+        "running",
+        "highlighting",
+        "layout",
+        "serializing",
+        "stored",
+        "completed",
+        "failed",
+    ] = Field(..., description="Render stage the job entered")
+    time: float = Field(..., description="Unix timestamp of the transition")
+    queue_position: Optional[int] = Field(
+        None, description="Jobs ahead in the queue, including this one"
+    )
+    pages: Optional[int] = Field(None, description="Pages laid out so far")
+    url: Optional[str] = Field(
+        None,
+        description="Download URL once completed",
+        json_schema_extra={"format": "uri"},
+    )
+    error: Optional[ErrorResponse] = Field(
+        None, description="Error details when the render failed"
+    )
+
+    model_config = ConfigDict(extra="forbid")
+
+
+class DocumentFeatures(BaseModel):
+    """Cheap-to-measure properties of a render request that drive its cost."""
+
+    body_bytes: int = Field(..., description="Size of body_content in bytes")
+    css_bytes: int = Field(0, description="Size of css_content in bytes")
+    code_blocks: int = Field(0, description="Number of <pre> blocks")
+    tables: int = Field(0, description="Number of <table> elements")
+    images: int = Field(0, description="Number of <img> elements")
+    contains_code: bool = Field(False, description="Whether highlighting was requested")
+    template_id: Optional[str] = Field(None, description="Stored template used")
+    optimization_profile: Optional[str] = Field(None, description="Output profile used")
+    preview: bool = Field(False, description="Whether only leading pages were written")
+    incremental: bool = Field(False, description="Whether cached sections could be reused")
+
+    model_config = ConfigDict(extra="forbid")
+
+
+class RenderActivity(BaseModel):
+    job_id: str = Field(..., description="Identifier of the render job")
+    tenant: Optional[str] = Field(None, description="API key identity of the submitter")
+    stage: Optional[str] = Field(None, description="Latest progress stage")
+    status: Optional[str] = Field(None, description="Final status of finished renders")
+    started_at: datetime = Field(..., description="When rendering started")
+    seconds: float = Field(
+        ..., description="Age of an in-flight render, or duration of a finished one"
+    )
+    page_count: Optional[int] = Field(None, description="Pages laid out so far or in total")
+    features: DocumentFeatures
+
+    model_config = ConfigDict(extra="forbid")
+
+
+class CacheStats(BaseModel):
+    hits: int = Field(..., description="Lookups served from the cache")
+    misses: int = Field(..., description="Lookups that had to compute the value")
+    hit_ratio: Optional[float] = Field(None, description="hits / (hits + misses)")
+
+    model_config = ConfigDict(extra="forbid")
+
+
+class QueueStats(BaseModel):
+    backend: str = Field(..., description="Render queue backend")
+    depth: Optional[int] = Field(
+        ..., description="Jobs waiting for a render slot; None if the backend is unreachable"
+    )
+    running: Optional[int] = Field(..., description="Jobs being rendered")
+    capacity: int = Field(..., description="Render slots or consumers on this worker")
+    consumers_alive: Optional[int] = Field(
+        None, description="Queue consumers still running (redis backend)"
+    )
+
+    model_config = ConfigDict(extra="forbid")
+
+
+class WorkerStats(BaseModel):
+    pid: int = Field(..., description="Process id of the worker that answered")
+    uptime_seconds: float = Field(..., description="Seconds since the worker started")
+    render_limit: Optional[int] = Field(
+        None, description="Current adaptive render concurrency limit, if enabled"
+    )
+    renders_running: int = Field(..., description="Renders in progress in this worker")
+    maintenance_leader: bool = Field(..., description="Whether this worker runs maintenance")
+    webhook_backlog: int = Field(..., description="Webhook deliveries waiting to be sent")
+
+    model_config = ConfigDict(extra="forbid")
+
+
+class DownloadsUsage(BaseModel):
+    files: Optional[int] = Field(
+        ..., description="Indexed documents in the downloads volume; None if the index failed"
+    )
+    bytes: Optional[int] = Field(..., description="Combined size of indexed documents")
+    quota_bytes: int = Field(..., description="Configured quota; 0 means unlimited")
+    quota_used: Optional[float] = Field(None, description="Fraction of the quota in use")
+
+    model_config = ConfigDict(extra="forbid")
+
+
+class StatsResponse(BaseModel):
+    queue: QueueStats
+    workers: WorkerStats
+    inflight: list[RenderActivity] = Field(
+        ..., description="Renders in progress in this worker, oldest first"
+    )
+    caches: dict[str, CacheStats] = Field(..., description="Hit ratios by cache")
+    downloads: DownloadsUsage
+    slowest: list[RenderActivity] = Field(
+        ..., description="Slowest renders finished recently in this worker"
+    )
+
+    model_config = ConfigDict(extra="forbid")
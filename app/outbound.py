@@ -0,0 +1,76 @@
+"""Guards for HTTP requests sent to URLs chosen by API callers."""
+
+import ipaddress
+import socket
+from urllib.parse import urlsplit
+
+from .config import settings
+
+
+class UnsafeURLError(ValueError):
+    """The URL must not be requested by the service."""
+
+
+def _is_public(address: ipaddress.IPv4Address | ipaddress.IPv6Address) -> bool:
+    if isinstance(address, ipaddress.IPv6Address) and address.ipv4_mapped is not None:
+        address = address.ipv4_mapped
+    return address.is_global
+
+
+def _allowed_host(host: str) -> bool:
+    return host.lower() in {allowed.lower() for allowed in settings.WEBHOOK_ALLOWED_HOSTS}
+
+
+def check_url(url: str) -> None:
+    """
+    Reject URLs that are unsafe without resolving their host.
+
+    Hosts listed in ``WEBHOOK_ALLOWED_HOSTS`` are trusted, and when that
+    list is set no other host is accepted. Otherwise ``localhost`` names and
+    literal addresses outside the public internet (loopback, private,
+    link-local such as cloud metadata endpoints, reserved) are rejected.
+
+    Raises:
+        UnsafeURLError: If the URL must not be requested.
+    """
+    parts = urlsplit(url)
+    host = parts.hostname
+    if parts.scheme not in ("http", "https") or not host:
+        raise UnsafeURLError("must be an absolute http or https URL")
+    if _allowed_host(host):
+        return
+    if settings.WEBHOOK_ALLOWED_HOSTS:
+        raise UnsafeURLError(f"host {host} is not in WEBHOOK_ALLOWED_HOSTS")
+    if host.lower() == "localhost" or host.lower().endswith(".localhost"):
+        raise UnsafeURLError(f"host {host} is not a public address")
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return
+    if not _is_public(address):
+        raise UnsafeURLError(f"host {host} is not a public address")
+
+
+def resolve_url(url: str) -> None:
+    """
+    Reject URLs whose host does not resolve only to public addresses.
+
+    Blocking; run it in a thread from async code.
+
+    Raises:
+        UnsafeURLError: If the URL must not be requested.
+    """
+    check_url(url)
+    parts = urlsplit(url)
+    host = parts.hostname
+    if _allowed_host(host):
+        return
+    try:
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except (OSError, UnicodeError, ValueError) as e:
+        raise UnsafeURLError(f"host {host} cannot be resolved") from e
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split("%", 1)[0])
+        if not _is_public(address):
+            raise UnsafeURLError(f"host {host} resolves to non-public address {address}")
@@ -0,0 +1,253 @@
+"""Page-level operations on PDFs already in the downloads folder."""
+
+import asyncio
+import hashlib
+import html
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional
+
+from fastapi import HTTPException
+
+from .config import settings
+from .index import get_document, index_document
+from .models import Stamp
+from .stats import record_cache
+from .tracing import tracer
+from .transforms import prune_cache
+
+if TYPE_CHECKING:  # pragma: no cover
+    from pypdf import PageObject, PdfWriter
+
+# Placement of the stamp box on its page for each Stamp.position
+STAMP_POSITIONS: dict[str, str] = {
+    "watermark": (
+        "top:50%;left:50%;transform:translate(-50%,-50%) rotate(-45deg);"
+        "font-size:72pt;font-weight:bold;color:#888;white-space:nowrap;"
+    ),
+    "header": "top:0.25in;right:0.5in;font-size:10pt;color:#555;",
+    "footer": "bottom:0.25in;left:0;right:0;text-align:center;font-size:10pt;color:#555;",
+}
+
+
+def source_path(filename: str, scope: Optional[str] = None) -> Path:
+    """
+    Return the path of a stored PDF.
+
+    Args:
+        filename (str): Download filename of the PDF.
+        scope (Optional[str]): Identity the caller is limited to, if any;
+            indexed documents of other identities are treated as missing.
+
+    Raises:
+        HTTPException: 404 if the file does not exist or is out of scope.
+    """
+    path = Path(settings.DOWNLOADS_DIR) / filename
+    record = get_document(filename) if scope is not None else None
+    if not path.is_file() or (record is not None and record.api_key_id != scope):
+        raise HTTPException(
+            status_code=404,
+            detail={
+                "status": 404,
+                "code": "file_not_found",
+                "message": "File not found",
+                "details": f"No generated PDF named {filename}",
+            },
+        )
+    return path
+
+
+def _invalid_pdf(filename: str, e: Exception) -> HTTPException:
+    return HTTPException(
+        status_code=422,
+        detail={
+            "status": 422,
+            "code": "invalid_pdf",
+            "message": "Stored file is not a readable PDF",
+            "details": f"{filename}: {e}",
+        },
+    )
+
+
+def write_atomically(writer: "PdfWriter", output_path: Path) -> None:
+    """Write a PDF next to its destination and rename it into place."""
+    # Hidden, so downloads and maintenance never see a partial file
+    partial = output_path.with_name(f".{output_path.name}.part")
+    try:
+        with partial.open("wb") as file:
+            writer.write(file)
+        os.replace(partial, output_path)
+    finally:
+        partial.unlink(missing_ok=True)
+
+
+def _merge(sources: list[tuple[str, Path]], output_path: Path) -> int:
+    from pypdf import PdfReader, PdfWriter
+    from pypdf.errors import PdfReadError
+
+    writer = PdfWriter()
+    for index, (filename, path) in enumerate(sources):
+        try:
+            reader = PdfReader(path)
+            if index == 0 and reader.metadata:
+                writer.add_metadata(reader.metadata)
+            # Page objects are copied as they are; nothing is laid out again
+            writer.append(reader)
+        except PdfReadError as e:
+            raise _invalid_pdf(filename, e) from e
+    write_atomically(writer, output_path)
+    return len(writer.pages)
+
+
+async def merge_pdfs(
+    filenames: list[str],
+    output_filename: str,
+    api_key_id: Optional[str],
+    scope: Optional[str] = None,
+) -> int:
+    """
+    Concatenate stored PDFs into a new indexed document.
+
+    The work is proportional to the size of the source files rather than
+    their layout complexity, since pages are copied at the object level.
+
+    Args:
+        filenames (list[str]): Download filenames in page order.
+        output_filename (str): Name of the merged file in the downloads folder.
+        api_key_id (Optional[str]): Identity of the API key that requested it.
+        scope (Optional[str]): Identity whose documents may be merged, if limited.
+
+    Returns:
+        int: Number of pages in the merged PDF.
+
+    Raises:
+        HTTPException: 404 if a source is missing or 422 if it is not a PDF.
+    """
+    sources = [(filename, source_path(filename, scope)) for filename in filenames]
+    output_path = Path(settings.DOWNLOADS_DIR) / output_filename
+    started = time.perf_counter()
+    with tracer.start_span("pdf.merge", attributes={"pdf.sources": len(sources)}):
+        page_count = await asyncio.to_thread(_merge, sources, output_path)
+    await index_document(
+        output_path,
+        output_filename,
+        page_count=page_count,
+        render_ms=(time.perf_counter() - started) * 1000,
+        api_key_id=api_key_id,
+    )
+    return page_count
+
+
+def stamp_html(stamp: Stamp, width: float, height: float) -> str:
+    """Return a transparent one-page document holding the stamp."""
+    content = html.escape(stamp.text) if stamp.text is not None else stamp.html
+    return (
+        "<html><head><style>"
+        f"@page{{size:{width:.2f}pt {height:.2f}pt;margin:0;}}"
+        "html,body{margin:0;height:100%;font-family:'Arial',sans-serif;}"
+        f".stamp{{position:absolute;opacity:{stamp.opacity};"
+        f"{STAMP_POSITIONS[stamp.position]}}}"
+        f"{stamp.css_content or ''}"
+        f"</style></head><body><div class=\"stamp\">{content}</div></body></html>"
+    )
+
+
+def _render_stamp(document: str, output_path: Path) -> None:
+    from weasyprint import HTML
+
+    HTML(string=document).write_pdf(target=output_path)
+
+
+def stamp_page(stamp: Stamp, width: float, height: float) -> "PageObject":
+    """
+    Return the rendered stamp for a page size, laying it out only once.
+
+    Rendered stamps are kept in ``STAMPS_DIR`` and shared by every worker,
+    so stamping many documents with the same watermark costs one layout.
+    """
+    from pypdf import PdfReader
+
+    document = stamp_html(stamp, width, height)
+    key = hashlib.sha256(document.encode()).hexdigest()
+    stamps_dir = Path(settings.STAMPS_DIR)
+    path = stamps_dir / f"{key}.pdf"
+    record_cache("stamps", path.is_file())
+    if path.is_file():
+        os.utime(path)
+    else:
+        stamps_dir.mkdir(parents=True, exist_ok=True)
+        # Concurrent requests may render the same stamp, so each gets its own file
+        partial = stamps_dir / f".{key}.{uuid.uuid4().hex}.part"
+        try:
+            with tracer.start_span("stamp.render"):
+                _render_stamp(document, partial)
+            os.replace(partial, path)
+        finally:
+            partial.unlink(missing_ok=True)
+        prune_cache(stamps_dir, settings.STAMP_CACHE_SIZE)
+    return PdfReader(path).pages[0]
+
+
+def _stamp(source: Path, filename: str, stamps: list[Stamp], output_path: Path) -> int:
+    from pypdf import PageObject, PdfReader, PdfWriter, Transformation
+    from pypdf.errors import PdfReadError
+
+    try:
+        writer = PdfWriter(clone_from=PdfReader(source))
+    except PdfReadError as e:
+        raise _invalid_pdf(filename, e) from e
+    overlays: dict[tuple[int, float, float], PageObject] = {}
+    for page in writer.pages:
+        box = page.mediabox
+        width, height = round(float(box.width), 2), round(float(box.height), 2)
+        for index, stamp in enumerate(stamps):
+            key = (index, width, height)
+            if key not in overlays:
+                overlays[key] = stamp_page(stamp, width, height)
+            page.merge_transformed_page(
+                overlays[key], Transformation().translate(box.left, box.bottom)
+            )
+    write_atomically(writer, output_path)
+    return len(writer.pages)
+
+
+async def stamp_pdf(
+    filename: str,
+    stamps: list[Stamp],
+    output_filename: str,
+    api_key_id: Optional[str],
+    scope: Optional[str] = None,
+) -> int:
+    """
+    Composite stamps onto every page of a stored PDF as a new indexed document.
+
+    Args:
+        filename (str): Download filename of the PDF to stamp.
+        stamps (list[Stamp]): Stamps drawn over each page, in order.
+        output_filename (str): Name of the stamped file in the downloads folder.
+        api_key_id (Optional[str]): Identity of the API key that requested it.
+        scope (Optional[str]): Identity whose documents may be stamped, if limited.
+
+    Returns:
+        int: Number of pages in the stamped PDF.
+
+    Raises:
+        HTTPException: 404 if the source is missing or 422 if it is not a PDF.
+    """
+    source = source_path(filename, scope)
+    output_path = Path(settings.DOWNLOADS_DIR) / output_filename
+    started = time.perf_counter()
+    with tracer.start_span("pdf.stamp", attributes={"pdf.stamps": len(stamps)}):
+        page_count = await asyncio.to_thread(
+            _stamp, source, filename, stamps, output_path
+        )
+    await index_document(
+        output_path,
+        output_filename,
+        page_count=page_count,
+        render_ms=(time.perf_counter() - started) * 1000,
+        api_key_id=api_key_id,
+    )
+    return page_count
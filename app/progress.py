@@ -0,0 +1,171 @@
+"""Render progress events published by generate_pdf and the job queues."""
+
+import asyncio
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+from .models import ProgressEvent
+
+
+ProgressCallback = Callable[..., None]
+
+TERMINAL_STAGES = ("completed", "failed")
+
+# WeasyPrint logs "Step 5 - Creating layout - Page %d" for each page it lays out
+_LAYOUT_PAGE = re.compile(r"Creating layout - Page %d$")
+
+_current = threading.local()
+
+
+class _LayoutPageHandler(logging.Handler):
+    """Forward WeasyPrint page layout records to the rendering thread's callback."""
+
+    def emit(self, record: logging.LogRecord) -> None:
+        callback = getattr(_current, "callback", None)
+        if (
+            callback is not None
+            and isinstance(record.msg, str)
+            and _LAYOUT_PAGE.search(record.msg)
+            and record.args
+        ):
+            callback("layout", pages=int(record.args[0]))
+
+
+_handler_lock = threading.Lock()
+_handler: Optional[_LayoutPageHandler] = None
+
+
+class PageLimitExceeded(Exception):
+    """Raised from the layout progress hook once a document passes its page limit."""
+
+    def __init__(self, max_pages: int) -> None:
+        super().__init__(f"Document exceeds the limit of {max_pages} pages")
+        self.max_pages = max_pages
+
+
+def limit_pages(
+    callback: Optional[ProgressCallback], max_pages: int
+) -> ProgressCallback:
+    """
+    Wrap a progress callback so layout stops after ``max_pages`` pages.
+
+    WeasyPrint reports each page before laying it out, so raising from the
+    report for page ``max_pages + 1`` aborts the render without laying out
+    the rest of the document.
+    """
+
+    def report(stage: str, **data) -> None:
+        if stage == "layout" and data.get("pages", 0) > max_pages:
+            raise PageLimitExceeded(max_pages)
+        if callback is not None:
+            callback(stage, **data)
+
+    return report
+
+
+@contextmanager
+def track_layout_pages(callback: Optional[ProgressCallback]) -> Iterator[None]:
+    """Report pages laid out by WeasyPrint in this thread to ``callback``."""
+    global _handler
+    if callback is None:
+        yield
+        return
+    with _handler_lock:
+        if _handler is None:
+            progress_logger = logging.getLogger("weasyprint.progress")
+            _handler = _LayoutPageHandler()
+            progress_logger.addHandler(_handler)
+            if progress_logger.getEffectiveLevel() > logging.INFO:
+                # INFO is enabled only for the hook, so keep it out of the
+                # application's handlers
+                progress_logger.setLevel(logging.INFO)
+                progress_logger.propagate = False
+    _current.callback = callback
+    try:
+        yield
+    finally:
+        _current.callback = None
+
+
+class ProgressBroker:
+    """
+    Fan progress events out to Server-Sent Events subscribers.
+
+    Events may be published from render threads; they are handed to each
+    subscriber's event loop with ``call_soon_threadsafe``. A short history per
+    job lets late subscribers catch up and resume from ``Last-Event-ID``.
+    """
+
+    def __init__(self, history: int = 100, max_jobs: int = 1000) -> None:
+        self._lock = threading.Lock()
+        self._history: OrderedDict[str, list[ProgressEvent]] = OrderedDict()
+        self._subscribers: dict[
+            str, set[tuple[asyncio.AbstractEventLoop, asyncio.Queue]]
+        ] = {}
+        self._history_size = history
+        self._max_jobs = max_jobs
+
+    def publish(self, job_id: str, stage: str, **data) -> ProgressEvent:
+        with self._lock:
+            events = self._history.setdefault(job_id, [])
+            self._history.move_to_end(job_id)
+            event = ProgressEvent(
+                job_id=job_id,
+                seq=events[-1].seq + 1 if events else 1,
+                stage=stage,
+                time=time.time(),
+                **data,
+            )
+            # Page updates replace each other so the history keeps its stages
+            if events and stage == "layout" and events[-1].stage == "layout":
+                events[-1] = event
+            else:
+                events.append(event)
+            del events[:-self._history_size]
+            while len(self._history) > self._max_jobs:
+                self._history.popitem(last=False)
+            subscribers = list(self._subscribers.get(job_id, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:
+                pass  # The subscriber's loop has closed
+        return event
+
+    def history(self, job_id: str) -> list[ProgressEvent]:
+        with self._lock:
+            return list(self._history.get(job_id, ()))
+
+    def subscribe(self, job_id: str) -> tuple[list[ProgressEvent], asyncio.Queue]:
+        """Return the job's history and a queue receiving its future events."""
+        queue: asyncio.Queue = asyncio.Queue()
+        with self._lock:
+            self._subscribers.setdefault(job_id, set()).add(
+                (asyncio.get_running_loop(), queue)
+            )
+            return list(self._history.get(job_id, ())), queue
+
+    def unsubscribe(self, job_id: str, queue: asyncio.Queue) -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(job_id, set())
+            subscribers.difference_update(
+                {entry for entry in subscribers if entry[1] is queue}
+            )
+            if not subscribers:
+                self._subscribers.pop(job_id, None)
+
+    def reporter(self, job_id: str) -> ProgressCallback:
+        """Return a callback publishing a job's stage transitions."""
+
+        def report(stage: str, **data) -> None:
+            self.publish(job_id, stage, **data)
+
+        return report
+
+
+progress = ProgressBroker()
@@ -0,0 +1,617 @@
+"""Pluggable render queue: in-process by default, Redis for multi-node setups."""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+from urllib.parse import unquote, urlsplit
+
+from fastapi import HTTPException
+
+from .concurrency import render_slots
+from .config import settings
+from .jobs import RenderJob, execute_job, job_status
+from .metrics import metrics
+from .models import ErrorResponse, JobStatusResponse, QueueStats
+from .progress import progress
+from .tenants import FairScheduler, estimate_cost, tenant_by_name
+from .tracing import tracer
+from .webhooks import webhooks
+
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ("completed", "failed")
+CONSUMER_TASK = "render-queue-consumer"
+# Queued jobs a Redis consumer considers per poll when tenants are at their caps
+DISPATCH_WINDOW = 100
+
+metrics.describe("render_jobs_total", "counter", "Render jobs finished by status")
+metrics.describe(
+    "render_jobs_requeued_total", "counter", "Jobs requeued after a visibility timeout"
+)
+
+
+def publish_result(result: JobStatusResponse) -> None:
+    """Publish the terminal progress event for a finished job."""
+    progress.publish(
+        result.job_id,
+        result.status,
+        url=result.url,
+        pages=result.page_count,
+        error=result.error,
+    )
+
+
+class JobQueue:
+    """Interface shared by render queue backends."""
+
+    async def start(self) -> None:
+        """Start consuming jobs if this node renders."""
+
+    async def stop(self) -> None:
+        """Stop consuming jobs and release connections."""
+
+    async def enqueue(self, job: RenderJob) -> JobStatusResponse:
+        """Queue a job and return its ``queued`` status without waiting."""
+        raise NotImplementedError
+
+    async def status(self, job_id: str) -> Optional[JobStatusResponse]:
+        """Return the latest status of a job, or None if it is unknown."""
+        raise NotImplementedError
+
+    async def submit(
+        self, job: RenderJob, timeout: Optional[float] = None
+    ) -> JobStatusResponse:
+        """Queue a job and wait for it to complete or fail."""
+        raise NotImplementedError
+
+    async def stats(self) -> QueueStats:
+        """Return queue depth and render slot usage."""
+        raise NotImplementedError
+
+
+class InProcessQueue(JobQueue):
+    """
+    Render jobs in the worker that received them.
+
+    Synchronous submissions run in the caller's task so no hand-off is added
+    to the request path. ``render_slots()`` render slots are shared
+    between tenants by weighted fair queuing.
+    """
+
+    def __init__(self, concurrency: int, max_statuses: int = 10000) -> None:
+        self._scheduler = FairScheduler(concurrency, on_change=self._publish_positions)
+        self._statuses: OrderedDict[str, JobStatusResponse] = OrderedDict()
+        self._max_statuses = max_statuses
+        self._tasks: set[asyncio.Task] = set()
+
+    @staticmethod
+    def _publish_positions(waiting: list[str]) -> None:
+        for position, job_id in enumerate(waiting, 1):
+            progress.publish(job_id, "queued", queue_position=position)
+
+    def _record(self, status: JobStatusResponse) -> JobStatusResponse:
+        self._statuses[status.job_id] = status
+        self._statuses.move_to_end(status.job_id)
+        while len(self._statuses) > self._max_statuses:
+            self._statuses.popitem(last=False)
+        return status
+
+    async def _run(self, job: RenderJob) -> JobStatusResponse:
+        tenant = tenant_by_name(job.api_key_id)
+        progress.publish(
+            job.job_id, "queued", queue_position=self._scheduler.pending + 1
+        )
+        with tracer.start_span("job.queue"):
+            await self._scheduler.acquire(
+                job.job_id,
+                job.api_key_id or "anonymous",
+                cost=estimate_cost(job.request),
+                weight=tenant.weight if tenant is not None else 1.0,
+                max_concurrency=tenant.max_concurrency if tenant is not None else 0,
+            )
+        try:
+            self._record(job_status(job, "running"))
+            progress.publish(job.job_id, "running")
+            result = await execute_job(job)
+        finally:
+            self._scheduler.release(job.api_key_id or "anonymous")
+        metrics.inc("render_jobs_total", status=result.status)
+        publish_result(result)
+        webhooks.notify(job, result)
+        return self._record(result)
+
+    async def enqueue(self, job: RenderJob) -> JobStatusResponse:
+        progress.publish(job.job_id, "validated")
+        status = self._record(job_status(job, "queued"))
+        task = asyncio.create_task(self._run(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return status
+
+    async def status(self, job_id: str) -> Optional[JobStatusResponse]:
+        return self._statuses.get(job_id)
+
+    async def submit(
+        self, job: RenderJob, timeout: Optional[float] = None
+    ) -> JobStatusResponse:
+        progress.publish(job.job_id, "validated")
+        self._record(job_status(job, "queued"))
+        return await self._run(job)
+
+    async def stats(self) -> QueueStats:
+        return QueueStats(
+            backend="memory",
+            depth=self._scheduler.pending,
+            running=self._scheduler.active,
+            capacity=self._scheduler.capacity,
+        )
+
+    async def stop(self) -> None:
+        """Let background jobs finish so their results are not lost."""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+class RedisError(Exception):
+    """Error reply returned by the Redis server."""
+
+
+def _encode_command(args: tuple[Any, ...]) -> bytes:
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        data = arg if isinstance(arg, bytes) else str(arg).encode()
+        parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(parts)
+
+
+async def _read_reply(reader: asyncio.StreamReader) -> Any:
+    line = await reader.readuntil(b"\r\n")
+    kind, payload = line[:1], line[1:-2]
+    if kind == b"+":
+        return payload.decode()
+    if kind == b"-":
+        raise RedisError(payload.decode())
+    if kind == b":":
+        return int(payload)
+    if kind == b"$":
+        length = int(payload)
+        if length < 0:
+            return None
+        data = await reader.readexactly(length + 2)
+        return data[:-2].decode()
+    if kind == b"*":
+        count = int(payload)
+        if count < 0:
+            return None
+        return [await _read_reply(reader) for _ in range(count)]
+    raise RedisError(f"Unexpected reply type {kind!r}")
+
+
+class RedisClient:
+    """
+    Minimal asyncio client for the Redis protocol (RESP2).
+
+    Only the handful of list, sorted-set and string commands the queue uses
+    are needed, so a dedicated dependency is not worth it. Commands are
+    serialized over a single connection that reconnects once on failure.
+    """
+
+    def __init__(self, url: str) -> None:
+        parts = urlsplit(url)
+        if parts.scheme != "redis":
+            raise ValueError(f"Unsupported Redis URL scheme: {parts.scheme}")
+        self.host = parts.hostname or "localhost"
+        self.port = parts.port or 6379
+        self.password = unquote(parts.password) if parts.password else None
+        self.db = int(parts.path.lstrip("/") or 0)
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._lock = asyncio.Lock()
+
+    async def _connect(self) -> None:
+        self._reader, self._writer = await asyncio.open_connection(
+            self.host, self.port
+        )
+        if self.password:
+            await self._call("AUTH", self.password)
+        if self.db:
+            await self._call("SELECT", self.db)
+
+    async def _call(self, *args: Any) -> Any:
+        try:
+            self._writer.write(_encode_command(args))
+            await self._writer.drain()
+            return await _read_reply(self._reader)
+        except RedisError:
+            raise
+        except BaseException:
+            # A reply left unread, e.g. after cancellation, would be returned
+            # to the next command, so the connection cannot be reused
+            self._drop()
+            raise
+
+    async def execute(self, *args: Any) -> Any:
+        async with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._writer is None:
+                        await self._connect()
+                    return await self._call(*args)
+                except (OSError, asyncio.IncompleteReadError):
+                    await self._close()
+                    if attempt:
+                        raise
+
+    def _drop(self) -> Optional[asyncio.StreamWriter]:
+        writer, self._reader, self._writer = self._writer, None, None
+        if writer is not None:
+            writer.close()
+        return writer
+
+    async def _close(self) -> None:
+        writer = self._drop()
+        if writer is not None:
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+    async def close(self) -> None:
+        async with self._lock:
+            await self._close()
+
+
+class RedisQueue(JobQueue):
+    """
+    Reliable queue shared by every node through a Redis server.
+
+    Jobs are shared between tenants by the same weighted fair queuing as
+    ``FairScheduler``: API nodes add job ids to the ``pending`` sorted set
+    scored by a virtual finish tag ``max(V, F_tenant) + cost / weight``.
+    Render nodes take the job with the smallest tag whose tenant is below its
+    ``max_concurrency``, counted cluster-wide in a ``running:<tenant>`` sorted
+    set, claim it with ``ZREM`` (which succeeds on exactly one node), move it
+    to ``processing`` and record a visibility deadline in the ``inflight``
+    sorted set, extended by a heartbeat while rendering. A reaper on every
+    node returns jobs whose deadline passed to the head of ``pending``, so a
+    job whose consumer died is delivered again (at least once). Results are
+    PDFs in the shared downloads volume plus a status key that API nodes poll.
+
+    Tags are assigned without a transaction, so concurrent submissions by
+    one tenant on different API nodes may share a tag; this only affects
+    the order of those jobs.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        prefix: str = "pdf:",
+        concurrency: int = 4,
+        visibility_timeout: float = 300,
+        max_attempts: int = 3,
+        result_ttl: int = 86400,
+        poll_interval: float = 0.2,
+        worker: bool = True,
+    ) -> None:
+        self.url = url
+        self.prefix = prefix
+        self.concurrency = concurrency
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.result_ttl = result_ttl
+        self.poll_interval = poll_interval
+        self.worker = worker
+        self.client = RedisClient(url)
+        self._consumers: list[RedisClient] = []
+        self._tasks: list[asyncio.Task] = []
+
+    def _key(self, *parts: str) -> str:
+        return self.prefix + ":".join(parts)
+
+    @staticmethod
+    def _max_concurrency(tenant_name: Optional[str]) -> int:
+        tenant = tenant_by_name(tenant_name)
+        return tenant.max_concurrency if tenant is not None else 0
+
+    async def _running(self, client: RedisClient, tenant_name: str) -> int:
+        """Count the tenant's jobs whose visibility deadline has not passed."""
+        key = self._key("running", tenant_name)
+        await client.execute("ZREMRANGEBYSCORE", key, "-inf", time.time())
+        return await client.execute("ZCARD", key)
+
+    async def _store_status(
+        self, client: RedisClient, status: JobStatusResponse
+    ) -> None:
+        await client.execute(
+            "SET",
+            self._key("status", status.job_id),
+            status.model_dump_json(),
+            "EX",
+            self.result_ttl,
+        )
+
+    async def enqueue(self, job: RenderJob) -> JobStatusResponse:
+        progress.publish(job.job_id, "validated")
+        status = job_status(job, "queued")
+        tenant_name = job.api_key_id or "anonymous"
+        tenant = tenant_by_name(job.api_key_id)
+        virtual_time, last_finish = await self.client.execute(
+            "MGET", self._key("vtime"), self._key("finish", tenant_name)
+        )
+        finish = max(float(virtual_time or 0), float(last_finish or 0)) + (
+            estimate_cost(job.request) / (tenant.weight if tenant is not None else 1.0)
+        )
+        await self.client.execute(
+            "SET", self._key("finish", tenant_name), finish, "EX", self.result_ttl
+        )
+        await self.client.execute(
+            "SET", self._key("job", job.job_id), job.model_dump_json(),
+            "EX", self.result_ttl,
+        )
+        await self.client.execute(
+            "SET", self._key("owner", job.job_id), tenant_name, "EX", self.result_ttl
+        )
+        await self._store_status(self.client, status)
+        await self.client.execute("ZADD", self._key("pending"), finish, job.job_id)
+        position = await self.client.execute("ZRANK", self._key("pending"), job.job_id)
+        progress.publish(job.job_id, "queued", queue_position=(position or 0) + 1)
+        return status
+
+    async def status(self, job_id: str) -> Optional[JobStatusResponse]:
+        raw = await self.client.execute("GET", self._key("status", job_id))
+        return JobStatusResponse.model_validate_json(raw) if raw else None
+
+    async def submit(
+        self, job: RenderJob, timeout: Optional[float] = None
+    ) -> JobStatusResponse:
+        await self.enqueue(job)
+        deadline = time.monotonic() + (
+            timeout if timeout is not None else settings.JOB_WAIT_TIMEOUT_SECONDS
+        )
+        while time.monotonic() < deadline:
+            status = await self.status(job.job_id)
+            if status is not None and status.status in TERMINAL_STATUSES:
+                return status
+            await asyncio.sleep(self.poll_interval)
+        raise HTTPException(
+            status_code=504,
+            detail={
+                "status": 504,
+                "code": "render_timeout",
+                "message": "PDF generation did not finish in time",
+                "details": f"Poll /jobs/{job.job_id} for the result",
+            },
+        )
+
+    async def start(self) -> None:
+        if not self.worker:
+            return
+        for _ in range(self.concurrency):
+            consumer = RedisClient(self.url)
+            self._consumers.append(consumer)
+            self._tasks.append(
+                asyncio.create_task(self._consume(consumer), name=CONSUMER_TASK)
+            )
+        self._tasks.append(asyncio.create_task(self._reap_loop()))
+
+    async def stats(self) -> QueueStats:
+        """Report cluster-wide queue lengths and this node's consumers."""
+        try:
+            depth = await self.client.execute("ZCARD", self._key("pending"))
+            running = await self.client.execute("LLEN", self._key("processing"))
+        except (OSError, asyncio.IncompleteReadError, RedisError) as e:
+            logger.error("Render queue stats unavailable: %s", e)
+            depth = running = None
+        return QueueStats(
+            backend="redis",
+            depth=depth,
+            running=running,
+            capacity=self.concurrency if self.worker else 0,
+            consumers_alive=sum(
+                1 for task in self._tasks
+                if task.get_name() == CONSUMER_TASK and not task.done()
+            ),
+        )
+
+    async def stop(self) -> None:
+        """
+        Cancel consumers; jobs they were rendering stay in ``processing`` and
+        are redelivered by the reaper once their visibility timeout passes.
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        for client in (*self._consumers, self.client):
+            await client.close()
+        self._consumers.clear()
+
+    async def _claim(self, client: RedisClient) -> Optional[str]:
+        """
+        Take the pending job with the smallest finish tag whose tenant is
+        below its concurrency cap, or return None if there is none.
+        """
+        entries = await client.execute(
+            "ZRANGE", self._key("pending"), 0, DISPATCH_WINDOW - 1, "WITHSCORES"
+        )
+        if not entries:
+            return None
+        candidates = list(zip(entries[::2], entries[1::2]))
+        owners: list[Optional[str]] = [None] * len(candidates)
+        if any(tenant.max_concurrency for tenant in settings.API_KEYS):
+            owners = await client.execute(
+                "MGET", *(self._key("owner", job_id) for job_id, _ in candidates)
+            )
+        full: set[str] = set()
+        for (job_id, finish), owner in zip(candidates, owners):
+            cap = self._max_concurrency(owner)
+            if owner in full or (cap and await self._running(client, owner) >= cap):
+                full.add(owner)
+                continue
+            if not await client.execute("ZREM", self._key("pending"), job_id):
+                # Another consumer claimed it first
+                continue
+            deadline = time.time() + self.visibility_timeout
+            await client.execute("ZADD", self._key("inflight"), deadline, job_id)
+            await client.execute("LPUSH", self._key("processing"), job_id)
+            if cap:
+                running_key = self._key("running", owner)
+                await client.execute("ZADD", running_key, deadline, job_id)
+                if await self._running(client, owner) > cap:
+                    # Another node took the tenant's last slot at the same time
+                    await client.execute("ZREM", running_key, job_id)
+                    await client.execute("ZREM", self._key("inflight"), job_id)
+                    await client.execute("LREM", self._key("processing"), 1, job_id)
+                    await client.execute("ZADD", self._key("pending"), finish, job_id)
+                    full.add(owner)
+                    continue
+            await client.execute("SET", self._key("vtime"), finish)
+            return job_id
+        return None
+
+    async def _consume(self, client: RedisClient) -> None:
+        while True:
+            try:
+                job_id = await self._claim(client)
+                if job_id is None:
+                    await asyncio.sleep(self.poll_interval)
+                    continue
+                await self._process(client, job_id)
+            except (OSError, asyncio.IncompleteReadError, RedisError) as e:
+                logger.error("Render queue consumer error: %s", e)
+                await asyncio.sleep(self.poll_interval * 5)
+
+    async def _process(self, client: RedisClient, job_id: str) -> None:
+        await client.execute(
+            "ZADD", self._key("inflight"),
+            time.time() + self.visibility_timeout, job_id,
+        )
+        attempts_key = self._key("attempts", job_id)
+        attempts = await client.execute("INCR", attempts_key)
+        await client.execute("EXPIRE", attempts_key, self.result_ttl)
+
+        raw = await client.execute("GET", self._key("job", job_id))
+        current = await self.status(job_id)
+        if raw is None or (
+            current is not None and current.status in TERMINAL_STATUSES
+        ):
+            # Expired job, or a duplicate delivery of a finished one
+            await self._ack(client, job_id)
+            return
+
+        job = RenderJob.model_validate_json(raw)
+        tenant_name = job.api_key_id or "anonymous"
+        running_key = (
+            self._key("running", tenant_name)
+            if self._max_concurrency(tenant_name) else None
+        )
+        if attempts > self.max_attempts:
+            result = job_status(
+                job,
+                "failed",
+                error=ErrorResponse(
+                    status=500,
+                    code="job_attempts_exceeded",
+                    message="PDF generation was abandoned",
+                    details=f"The job was attempted {attempts - 1} times",
+                ),
+            )
+        else:
+            await self._store_status(client, job_status(job, "running"))
+            progress.publish(job_id, "running")
+            # The heartbeat is cancelled mid-command, so it gets its own connection
+            heartbeat_client = RedisClient(self.url)
+            heartbeat = asyncio.create_task(
+                self._heartbeat(heartbeat_client, job_id, running_key)
+            )
+            try:
+                result = await execute_job(job)
+            finally:
+                heartbeat.cancel()
+                await asyncio.gather(heartbeat, return_exceptions=True)
+                await heartbeat_client.close()
+        metrics.inc("render_jobs_total", status=result.status)
+        await self._store_status(client, result)
+        await self._ack(client, job_id, running_key)
+        publish_result(result)
+        webhooks.notify(job, result)
+
+    async def _ack(
+        self, client: RedisClient, job_id: str, running_key: Optional[str] = None
+    ) -> None:
+        await client.execute("ZREM", self._key("inflight"), job_id)
+        await client.execute("LREM", self._key("processing"), 1, job_id)
+        if running_key is not None:
+            await client.execute("ZREM", running_key, job_id)
+        await client.execute("DEL", self._key("job", job_id))
+        await client.execute("DEL", self._key("owner", job_id))
+
+    async def _heartbeat(
+        self, client: RedisClient, job_id: str, running_key: Optional[str] = None
+    ) -> None:
+        while True:
+            await asyncio.sleep(self.visibility_timeout / 3)
+            deadline = time.time() + self.visibility_timeout
+            await client.execute("ZADD", self._key("inflight"), deadline, job_id)
+            if running_key is not None:
+                await client.execute("ZADD", running_key, deadline, job_id)
+
+    async def requeue_expired(self) -> int:
+        """Return jobs whose visibility timeout passed to the head of the queue."""
+        expired = await self.client.execute(
+            "ZRANGEBYSCORE", self._key("inflight"), "-inf", time.time()
+        )
+        requeued = 0
+        for job_id in expired or []:
+            # ZREM succeeds on exactly one node, so each job is requeued once
+            if await self.client.execute("ZREM", self._key("inflight"), job_id):
+                await self.client.execute("LREM", self._key("processing"), 1, job_id)
+                virtual_time = await self.client.execute("GET", self._key("vtime"))
+                await self.client.execute(
+                    "ZADD", self._key("pending"), virtual_time or 0, job_id
+                )
+                requeued += 1
+        if requeued:
+            metrics.inc("render_jobs_requeued_total", requeued)
+            logger.warning("Requeued %d render jobs after visibility timeout", requeued)
+        return requeued
+
+    async def _reap_loop(self) -> None:
+        interval = max(self.poll_interval, min(self.visibility_timeout / 3, 30))
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.requeue_expired()
+            except (OSError, asyncio.IncompleteReadError, RedisError) as e:
+                logger.error("Render queue reaper error: %s", e)
+
+
+_queue: Optional[JobQueue] = None
+
+
+def get_render_queue() -> JobQueue:
+    """Return the configured queue backend, creating it on first use."""
+    global _queue
+    if _queue is None:
+        if settings.QUEUE_BACKEND == "redis":
+            _queue = RedisQueue(
+                settings.REDIS_URL,
+                prefix=settings.REDIS_PREFIX,
+                concurrency=render_slots(),
+                visibility_timeout=settings.JOB_VISIBILITY_TIMEOUT_SECONDS,
+                max_attempts=settings.JOB_MAX_ATTEMPTS,
+                result_ttl=settings.JOB_RESULT_TTL_SECONDS,
+                worker=settings.RENDER_WORKER,
+            )
+        else:
+            _queue = InProcessQueue(render_slots())
+    return _queue
+
+
+def reset_render_queue() -> None:
+    """Forget the configured backend so settings changes take effect."""
+    global _queue
+    _queue = None
@@ -0,0 +1,228 @@
+"""Offline bulk renderer for JSON Lines files of ``CreatePDFRequest`` records.
+
+Usage:
+    python -m app.render requests.jsonl --output-dir out/ [--processes 8]
+    cat requests.jsonl | python -m app.render - --output-dir out/
+
+Each line is validated with ``CreatePDFRequest`` and rendered by
+``generate_pdf`` in a pool of worker processes. One result per line is
+appended to ``manifest.jsonl`` in the output directory as soon as it is
+known, so an interrupted run can be started again with the same arguments
+and only renders lines that have not completed (or whose content changed).
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import IO, Iterator, Optional
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+
+from .dependencies import generate_pdf
+from .models import CreatePDFRequest
+from .templates import load_template
+
+
+MANIFEST_NAME = "manifest.jsonl"
+
+
+def _read_lines(source: IO[str]) -> Iterator[tuple[int, str]]:
+    for number, line in enumerate(source, 1):
+        if line.strip():
+            yield number, line.strip()
+
+
+def _output_name(line: int, request: CreatePDFRequest) -> str:
+    stem = request.output_filename[:-4] if request.output_filename else "document"
+    return f"{line:06d}-{stem}.pdf"
+
+
+def load_manifest(path: Path) -> dict[int, dict]:
+    """Return the latest manifest entry for each input line."""
+    entries: dict[int, dict] = {}
+    if not path.exists():
+        return entries
+    with path.open(encoding="utf-8") as manifest:
+        for raw in manifest:
+            try:
+                entry = json.loads(raw)
+            except json.JSONDecodeError:
+                continue  # A line cut short by an interruption
+            entries[entry["line"]] = entry
+    return entries
+
+
+def _is_done(entry: Optional[dict], digest: str, output_dir: Path) -> bool:
+    return (
+        entry is not None
+        and entry.get("sha256") == digest
+        and entry.get("status") == "completed"
+        and (output_dir / entry["file"]).is_file()
+    )
+
+
+def render_record(line: int, payload: str, output_path: str) -> dict:
+    """Render one validated request in a worker process."""
+    request = CreatePDFRequest.model_validate_json(payload)
+    started = time.perf_counter()
+
+    async def run() -> int:
+        template = (
+            await load_template(request.template_id)
+            if request.template_id is not None
+            else None
+        )
+        return await generate_pdf(
+            pdf_title=request.pdf_title,
+            body_content=request.body_content,
+            css_content=request.css_content,
+            output_path=Path(output_path),
+            contains_code=request.contains_code,
+            template=template,
+            optimization_profile=request.optimization_profile,
+            max_pages=request.max_pages,
+            preview_pages=request.preview_pages,
+            incremental=request.incremental,
+        )
+
+    try:
+        page_count = asyncio.run(run())
+    except HTTPException as e:
+        detail = e.detail if isinstance(e.detail, dict) else {"details": str(e.detail)}
+        return {"line": line, "status": "failed", "error": detail}
+    return {
+        "line": line,
+        "status": "completed",
+        "file": Path(output_path).name,
+        "page_count": page_count,
+        "render_ms": round((time.perf_counter() - started) * 1000, 3),
+    }
+
+
+class _Manifest:
+    def __init__(self, path: Path) -> None:
+        self.file = path.open("a", encoding="utf-8")
+
+    def write(self, entry: dict) -> None:
+        self.file.write(json.dumps(entry) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self) -> None:
+        self.file.close()
+
+
+def run(
+    source: IO[str], output_dir: Path, processes: int, max_pending: Optional[int] = None
+) -> dict[str, int]:
+    """
+    Render every pending line of ``source`` into ``output_dir``.
+
+    Args:
+        source (IO[str]): JSON Lines input of CreatePDFRequest records.
+        output_dir (Path): Directory receiving the PDFs and the manifest.
+        processes (int): Number of worker processes.
+        max_pending (Optional[int]): Records submitted ahead of completion;
+            bounds memory for very large inputs. Defaults to twice
+            ``processes``.
+
+    Returns:
+        dict[str, int]: Counts of completed, failed, invalid and skipped lines.
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = output_dir / MANIFEST_NAME
+    previous = load_manifest(manifest_path)
+    manifest = _Manifest(manifest_path)
+    counts = {"completed": 0, "failed": 0, "invalid": 0, "skipped": 0}
+    limit = max_pending or processes * 2
+    pending: dict[Future, tuple[int, str]] = {}
+
+    def record(entry: dict) -> None:
+        counts[entry["status"]] += 1
+        manifest.write(entry)
+
+    def collect(block: bool) -> None:
+        done, _ = wait(
+            pending, timeout=None if block else 0, return_when=FIRST_COMPLETED
+        )
+        for future in done:
+            line, digest = pending.pop(future)
+            try:
+                entry = future.result()
+            except Exception as e:
+                entry = {
+                    "line": line,
+                    "status": "failed",
+                    "error": {"details": f"{type(e).__name__}: {e}"},
+                }
+            record({**entry, "sha256": digest})
+
+    try:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            for line, text in _read_lines(source):
+                digest = hashlib.sha256(text.encode()).hexdigest()
+                if _is_done(previous.get(line), digest, output_dir):
+                    counts["skipped"] += 1
+                    continue
+                try:
+                    request = CreatePDFRequest.model_validate_json(text)
+                except ValidationError as e:
+                    record({
+                        "line": line,
+                        "sha256": digest,
+                        "status": "invalid",
+                        "error": {"details": e.errors(include_url=False)},
+                    })
+                    continue
+                output_path = output_dir / _output_name(line, request)
+                future = executor.submit(
+                    render_record, line, request.model_dump_json(), str(output_path)
+                )
+                pending[future] = (line, digest)
+                while len(pending) >= limit:
+                    collect(block=True)
+            while pending:
+                collect(block=True)
+    finally:
+        manifest.close()
+    return counts
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.render",
+        description="Render a JSON Lines file of CreatePDFRequest records to PDFs.",
+    )
+    parser.add_argument(
+        "input", nargs="?", default="-", help="JSONL file, or '-' for stdin"
+    )
+    parser.add_argument(
+        "--output-dir", type=Path, required=True, help="Where PDFs and the manifest go"
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Worker processes (default: CPU count)",
+    )
+    args = parser.parse_args(argv)
+
+    if args.input == "-":
+        counts = run(sys.stdin, args.output_dir, args.processes)
+    else:
+        with open(args.input, encoding="utf-8") as source:
+            counts = run(source, args.output_dir, args.processes)
+
+    print(json.dumps(counts), file=sys.stderr)
+    return 1 if counts["failed"] or counts["invalid"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
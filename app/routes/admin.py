@@ -0,0 +1,71 @@
+# /routes/admin.py
+import logging
+import os
+import sqlite3
+import time
+
+from fastapi import APIRouter, Depends
+
+from ..concurrency import get_render_limiter
+from ..config import settings
+from ..dependencies import get_admin_api_key
+from ..index import downloads_usage
+from ..metrics import metrics
+from ..models import DownloadsUsage, StatsResponse, WorkerStats
+from ..queue import get_render_queue
+from ..stats import cache_stats, render_stats
+from ..webhooks import webhooks
+
+
+logger = logging.getLogger(__name__)
+
+admin_router = APIRouter()
+
+_started = time.monotonic()
+
+
+@admin_router.get(
+    "/admin/stats",
+    response_model=StatsResponse,
+    include_in_schema=False,
+    dependencies=[Depends(get_admin_api_key)],
+)
+async def get_stats() -> StatsResponse:
+    """Report what this worker is doing right now.
+
+    Every value is read from state maintained as jobs start and finish, so
+    the endpoint stays cheap when the service is overloaded. Queue depth and
+    downloads usage are shared by all workers; the rest is per worker.
+
+    Returns:
+        StatsResponse: Queue, worker pool, in-flight renders, cache hit
+        ratios, downloads volume usage and the slowest recent renders.
+    """
+    try:
+        files, size = await downloads_usage()
+    except sqlite3.Error as e:
+        logger.error("Downloads usage unavailable: %s", e)
+        files = size = None
+    quota = settings.DOWNLOADS_QUOTA_BYTES
+    limiter = get_render_limiter()
+    inflight = render_stats.inflight()
+    return StatsResponse(
+        queue=await get_render_queue().stats(),
+        workers=WorkerStats(
+            pid=os.getpid(),
+            uptime_seconds=time.monotonic() - _started,
+            render_limit=limiter.limit if limiter is not None else None,
+            renders_running=len(inflight),
+            maintenance_leader=metrics.get("maintenance_leader") == 1,
+            webhook_backlog=webhooks.backlog,
+        ),
+        inflight=inflight,
+        caches=cache_stats(),
+        downloads=DownloadsUsage(
+            files=files,
+            bytes=size,
+            quota_bytes=quota,
+            quota_used=size / quota if quota and size is not None else None,
+        ),
+        slowest=render_stats.slowest(),
+    )
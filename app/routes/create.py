@@ -1,20 +1,22 @@
 # /routes/create.py
-import random
-import string
 import logging
-from datetime import datetime, timezone
-from pathlib import Path
+from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
 
+from ..compression import DecompressingRoute
 from ..models import CreatePDFRequest, CreatePDFResponse, ErrorResponse
-from ..dependencies import generate_pdf, get_api_key
-from ..config import settings
+from ..dependencies import api_key_identity, get_api_key
+from ..idempotency import claim_key, complete_key, release_key
+from ..jobs import COMPLETED_MESSAGE, new_job
+from ..queue import get_render_queue
+from ..tenants import admit
+from ..webhooks import check_callback
 
 
 logger = logging.getLogger(__name__)
 
-pdf_router = APIRouter()
+pdf_router = APIRouter(route_class=DecompressingRoute)
 
 
 @pdf_router.post(
@@ -26,9 +28,23 @@ pdf_router = APIRouter()
     response_model=CreatePDFResponse,
     responses={
         403: {"description": "Invalid or missing API key", "model": ErrorResponse},
+        404: {"description": "Template not found", "model": ErrorResponse},
+        409: {
+            "description": "Request with this idempotency key in progress",
+            "model": ErrorResponse,
+        },
+        422: {
+            "description": (
+                "Idempotency key reused with a different request, the "
+                "document exceeds its page limit, or callback_url was given "
+                "without webhooks enabled"
+            ),
+            "model": ErrorResponse,
+        },
+        429: {"description": "Tenant rate limit exceeded", "model": ErrorResponse},
         500: {"description": "Internal Server Error", "model": ErrorResponse},
+        504: {"description": "Render queue wait timed out", "model": ErrorResponse},
     },
-    dependencies=[Depends(get_api_key)],
     openapi_extra={
         "requestBody": {
             "content": {
@@ -53,6 +69,7 @@ pdf_router = APIRouter()
                                 "You can download it from the following URL:"
                             ),
                             "url": "https://example.com/downloads/example-pdf.pdf",
+                            "page_count": 3,
                         }
                     }
                 }
@@ -86,46 +103,69 @@ pdf_router = APIRouter()
         },
     },
 )
-async def create_pdf(request: CreatePDFRequest) -> CreatePDFResponse:
+async def create_pdf(
+    request: CreatePDFRequest,
+    response: Response,
+    api_key: str = Depends(get_api_key),
+    idempotency_key: Optional[str] = Header(
+        None,
+        alias="Idempotency-Key",
+        min_length=1,
+        max_length=255,
+        description=(
+            "Optional client-chosen key. Retrying with the same key and body "
+            "returns the original result without rendering again."
+        ),
+    ),
+) -> CreatePDFResponse:
     """Generate a PDF file from the provided request data.
 
     Args:
         request: Parameters for PDF generation.
+        response: Outgoing response, marked when a stored result is replayed.
+        api_key: The validated API key, recorded as a hashed identity.
+        idempotency_key: Optional key identifying retries of this request.
 
     Returns:
         CreatePDFResponse: Information about the generated PDF file.
 
     Raises:
-        HTTPException: If PDF generation fails or a filesystem error occurs.
+        HTTPException: If the idempotency key belongs to a different or
+            unfinished request, the tenant's rate limit is exceeded, the
+            document exceeds its page limit, PDF
+            generation fails, a filesystem error occurs or
+            the queued job does not finish within ``JOB_WAIT_TIMEOUT_SECONDS``.
     """
-    filename_suffix = datetime.now(tz=timezone.utc).strftime("-%Y%m%d%H%M%S")
-    random_chars = "".join(random.choices(string.ascii_letters + string.digits, k=6))
-    filename = (
-        f"{random_chars}{filename_suffix}.pdf"
-        if request.output_filename is None
-        else f"{request.output_filename[:-4]}{filename_suffix}.pdf"
-    )
-    output_path = Path("/app/downloads") / filename
-
+    await check_callback(request)
+    identity = api_key_identity(api_key)
+    claim = None
+    if idempotency_key is not None:
+        claim = await claim_key(identity, idempotency_key, request)
+        if claim is not None and claim.response is not None:
+            response.headers["Idempotent-Replayed"] = "true"
+            return CreatePDFResponse.model_validate_json(claim.response)
     try:
-        # Generate the PDF using the provided parameters, including contains_code
-        await generate_pdf(
-            pdf_title=request.pdf_title,
-            body_content=request.body_content,
-            css_content=request.css_content,
-            output_path=output_path,
-            contains_code=request.contains_code  # Passing contains_code directly
-        )
+        result = await _render(request, api_key, identity)
+    except BaseException:
+        if claim is not None:
+            await release_key(claim)
+        raise
+    if claim is not None:
+        await complete_key(claim, result)
+    return result
 
-        return CreatePDFResponse(
-            results=("PDF generation is complete. "
-                     "You can download it from the following URL:"),
-            url=f"{settings.BASE_URL}{settings.ROOT_PATH}/downloads/{filename}",
-        )
+
+async def _render(
+    request: CreatePDFRequest, api_key: str, identity: str
+) -> CreatePDFResponse:
+    admit(api_key, request)
+    try:
+        job = new_job(request, identity)
+        result = await get_render_queue().submit(job)
     except HTTPException:
         raise
     except OSError as e:
-        logger.error("File error creating PDF: %s", e)
+        logger.error("Render queue error: %s", e)
         raise HTTPException(
             status_code=500,
             detail={
@@ -146,3 +186,14 @@ async def create_pdf(request: CreatePDFRequest) -> CreatePDFResponse:
                 "details": str(e),
             },
         ) from e
+
+    if result.status == "failed":
+        raise HTTPException(
+            status_code=result.error.status, detail=result.error.model_dump()
+        )
+    return CreatePDFResponse(
+        results=COMPLETED_MESSAGE,
+        url=result.url,
+        page_count=result.page_count,
+        preview=request.preview_pages is not None,
+    )
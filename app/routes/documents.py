@@ -0,0 +1,84 @@
+# /routes/documents.py
+import logging
+import sqlite3
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from ..compression import DecompressingRoute
+from ..models import DocumentListResponse, ErrorResponse
+from ..dependencies import get_api_key, tenant_scope
+from ..index import list_documents
+
+
+logger = logging.getLogger(__name__)
+
+document_router = APIRouter(route_class=DecompressingRoute)
+
+
+@document_router.get(
+    "/documents",
+    operation_id="list_documents",
+    summary="List documents",
+    description=(
+        "Page through the index of generated documents, newest or largest "
+        "first. Tenant keys only see their own documents; the admin key sees "
+        "every tenant and may filter by API key identity."
+    ),
+    tags=["PDF"],
+    response_model=DocumentListResponse,
+    responses={
+        403: {
+            "description": "Invalid API key, or another tenant's documents requested",
+            "model": ErrorResponse,
+        },
+        500: {"description": "Internal Server Error", "model": ErrorResponse},
+    },
+)
+async def get_documents(
+    limit: int = Query(20, ge=1, le=100, description="Maximum items per page"),
+    offset: int = Query(0, ge=0, description="Number of items to skip"),
+    order_by: Literal["created_at", "size"] = Query(
+        "created_at", description="Sort newest first or largest first"
+    ),
+    api_key_id: Optional[str] = Query(
+        None, description="Only include documents created by this API key identity"
+    ),
+    api_key: str = Depends(get_api_key),
+) -> DocumentListResponse:
+    """Return a page of indexed documents with aggregate totals."""
+    scope = tenant_scope(api_key)
+    if scope is not None:
+        if api_key_id is not None and api_key_id != scope:
+            raise HTTPException(
+                status_code=403,
+                detail={
+                    "status": 403,
+                    "code": "tenant_forbidden",
+                    "message": "Documents of other tenants are not visible",
+                    "details": "Omit api_key_id or use the admin API key",
+                },
+            )
+        api_key_id = scope
+    try:
+        items, total, total_bytes = await list_documents(
+            limit, offset, api_key_id, order_by
+        )
+    except sqlite3.Error as e:
+        logger.error("Failed to list documents: %s", e)
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "status": 500,
+                "code": "internal_server_error",
+                "message": "Internal Server Error",
+                "details": str(e),
+            },
+        ) from e
+    return DocumentListResponse(
+        items=items,
+        total=total,
+        total_bytes=total_bytes,
+        limit=limit,
+        offset=offset,
+    )
@@ -0,0 +1,224 @@
+# /routes/jobs.py
+import asyncio
+import logging
+import time
+from typing import AsyncIterator, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Path, Request
+from fastapi.responses import StreamingResponse
+
+from ..compression import DecompressingRoute
+from ..config import settings
+from ..models import CreatePDFRequest, ErrorResponse, JobStatusResponse, ProgressEvent
+from ..dependencies import api_key_identity, get_api_key
+from ..jobs import new_job
+from ..progress import TERMINAL_STAGES, progress
+from ..queue import (
+    TERMINAL_STATUSES,
+    JobQueue,
+    RedisError,
+    get_render_queue,
+    publish_result,
+)
+from ..tenants import admit
+from ..webhooks import check_callback
+
+
+logger = logging.getLogger(__name__)
+
+job_router = APIRouter(prefix="/jobs", tags=["PDF"], route_class=DecompressingRoute)
+
+
+# Comment lines keep idle connections open through proxies
+KEEPALIVE_SECONDS = 15.0
+
+
+def _queue_unavailable(e: Exception) -> HTTPException:
+    logger.error("Render queue error: %s", e)
+    return HTTPException(
+        status_code=503,
+        detail={
+            "status": 503,
+            "code": "queue_unavailable",
+            "message": "Render queue unavailable",
+            "details": str(e),
+        },
+    )
+
+
+@job_router.post(
+    "",
+    operation_id="submit_pdf_job",
+    summary="Submit PDF job",
+    description=(
+        "Queue a PDF for rendering on any node and return immediately. "
+        "Poll the job to obtain the download URL."
+    ),
+    status_code=202,
+    response_model=JobStatusResponse,
+    responses={
+        403: {"description": "Invalid or missing API key", "model": ErrorResponse},
+        422: {"description": "callback_url given without webhooks enabled", "model": ErrorResponse},
+        429: {"description": "Tenant rate limit exceeded", "model": ErrorResponse},
+        503: {"description": "Render queue unavailable", "model": ErrorResponse},
+    },
+)
+async def submit_job(
+    request: CreatePDFRequest, api_key: str = Depends(get_api_key)
+) -> JobStatusResponse:
+    """Enqueue a render job without waiting for it to finish."""
+    await check_callback(request)
+    admit(api_key, request)
+    job = new_job(request, api_key_identity(api_key))
+    try:
+        return await get_render_queue().enqueue(job)
+    except (OSError, RedisError) as e:
+        raise _queue_unavailable(e) from e
+
+
+def _job_not_found(job_id: str) -> HTTPException:
+    return HTTPException(
+        status_code=404,
+        detail={
+            "status": 404,
+            "code": "job_not_found",
+            "message": "Job not found",
+            "details": f"No job is known with id '{job_id}'",
+        },
+    )
+
+
+@job_router.get(
+    "/{job_id}",
+    operation_id="get_pdf_job",
+    summary="Get PDF job",
+    description="Return the status of a queued job and its URL once completed.",
+    response_model=JobStatusResponse,
+    responses={
+        403: {"description": "Invalid or missing API key", "model": ErrorResponse},
+        404: {"description": "Job not found", "model": ErrorResponse},
+        503: {"description": "Render queue unavailable", "model": ErrorResponse},
+    },
+    dependencies=[Depends(get_api_key)],
+)
+async def get_job(
+    job_id: str = Path(..., description="Identifier returned when submitting"),
+) -> JobStatusResponse:
+    """Look up the latest status of a render job."""
+    try:
+        status = await get_render_queue().status(job_id)
+    except (OSError, RedisError) as e:
+        raise _queue_unavailable(e) from e
+    if status is None:
+        raise _job_not_found(job_id)
+    return status
+
+
+def _format_event(event: ProgressEvent) -> str:
+    data = event.model_dump_json(exclude_none=True)
+    return f"id: {event.seq}\nevent: {event.stage}\ndata: {data}\n\n"
+
+
+def _sync_from_status(job_id: str, status: Optional[JobStatusResponse]) -> None:
+    """Publish transitions of jobs rendered by another node from their status."""
+    if status is None:
+        return
+    history = progress.history(job_id)
+    latest = history[-1].stage if history else None
+    if status.status in TERMINAL_STATUSES and latest not in TERMINAL_STAGES:
+        publish_result(status)
+    elif status.status == "running" and latest in (None, "validated", "queued"):
+        progress.publish(job_id, "running")
+
+
+async def _event_stream(
+    request: Request,
+    queue: JobQueue,
+    job_id: str,
+    history: list[ProgressEvent],
+    events: asyncio.Queue,
+    after: int,
+) -> AsyncIterator[str]:
+    pending = [event for event in history if event.seq > after]
+    last_seq = after
+    last_sent = time.monotonic()
+    try:
+        while True:
+            for event in pending:
+                if event.seq <= last_seq:
+                    continue
+                yield _format_event(event)
+                last_seq = event.seq
+                last_sent = time.monotonic()
+                if event.stage in TERMINAL_STAGES:
+                    return
+            pending = []
+            try:
+                pending.append(
+                    await asyncio.wait_for(events.get(), settings.PROGRESS_POLL_SECONDS)
+                )
+                while not events.empty():
+                    pending.append(events.get_nowait())
+                continue
+            except asyncio.TimeoutError:
+                pass
+            if await request.is_disconnected():
+                return
+            try:
+                _sync_from_status(job_id, await queue.status(job_id))
+            except (OSError, RedisError) as e:
+                logger.warning("Job status unavailable for %s: %s", job_id, e)
+            if time.monotonic() - last_sent >= KEEPALIVE_SECONDS:
+                yield ": keep-alive\n\n"
+                last_sent = time.monotonic()
+    finally:
+        progress.unsubscribe(job_id, events)
+
+
+@job_router.get(
+    "/{job_id}/events",
+    operation_id="stream_pdf_job_events",
+    summary="Stream PDF job progress",
+    description=(
+        "Server-Sent Events stream of the job's stage transitions (validated, "
+        "queued, running, highlighting, layout, serializing, stored) with its "
+        "queue position and pages laid out so far. The stream ends with a "
+        "completed or failed event; reconnect with Last-Event-ID to resume."
+    ),
+    response_class=StreamingResponse,
+    responses={
+        200: {
+            "description": "Stream of progress events",
+            "content": {"text/event-stream": {}},
+        },
+        403: {"description": "Invalid or missing API key", "model": ErrorResponse},
+        404: {"description": "Job not found", "model": ErrorResponse},
+        503: {"description": "Render queue unavailable", "model": ErrorResponse},
+    },
+    dependencies=[Depends(get_api_key)],
+)
+async def stream_job_events(
+    request: Request,
+    job_id: str = Path(..., description="Identifier returned when submitting"),
+    last_event_id: Optional[str] = Header(
+        None, description="Resume after the event with this id"
+    ),
+) -> StreamingResponse:
+    """Stream progress events for a render job."""
+    queue = get_render_queue()
+    history, events = progress.subscribe(job_id)
+    try:
+        status = await queue.status(job_id)
+    except (OSError, RedisError) as e:
+        progress.unsubscribe(job_id, events)
+        raise _queue_unavailable(e) from e
+    if status is None and not history:
+        progress.unsubscribe(job_id, events)
+        raise _job_not_found(job_id)
+    _sync_from_status(job_id, status)
+    after = int(last_event_id) if last_event_id and last_event_id.isdigit() else 0
+    return StreamingResponse(
+        _event_stream(request, queue, job_id, history, events, after),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,22 @@
+# /routes/metrics.py
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+from ..dependencies import get_api_key
+from ..metrics import metrics
+
+
+metrics_router = APIRouter()
+
+
+@metrics_router.get(
+    "/metrics",
+    response_class=PlainTextResponse,
+    include_in_schema=False,
+    dependencies=[Depends(get_api_key)],
+)
+def get_metrics() -> PlainTextResponse:
+    """Expose this worker's metrics in the Prometheus text format."""
+    return PlainTextResponse(
+        metrics.render(), media_type="text/plain; version=0.0.4"
+    )
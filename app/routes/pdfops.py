@@ -0,0 +1,180 @@
+# /routes/pdfops.py
+import logging
+from pathlib import Path
+from typing import Awaitable, Union
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import FileResponse
+
+from ..compression import DecompressingRoute
+from ..config import settings
+from ..models import (
+    ErrorResponse,
+    MergePDFRequest,
+    PDFOperationResponse,
+    StampPDFRequest,
+)
+from ..dependencies import api_key_identity, get_api_key, tenant_scope
+from ..jobs import download_url, output_filename
+from ..pdfops import merge_pdfs, stamp_pdf
+from ..tenants import admit_cost
+
+
+logger = logging.getLogger(__name__)
+
+pdfops_router = APIRouter(route_class=DecompressingRoute)
+
+MERGED_MESSAGE = "PDF merge is complete. You can download it from the following URL:"
+STAMPED_MESSAGE = "PDF stamping is complete. You can download it from the following URL:"
+
+OPERATION_RESPONSES = {
+    200: {"content": {"application/pdf": {}}},
+    403: {"description": "Invalid or missing API key", "model": ErrorResponse},
+    404: {"description": "Source PDF not found", "model": ErrorResponse},
+    422: {"description": "Source file is not a readable PDF", "model": ErrorResponse},
+    429: {"description": "Tenant rate limit exceeded", "model": ErrorResponse},
+    500: {"description": "Internal Server Error", "model": ErrorResponse},
+}
+
+
+async def _run_operation(
+    operation: Awaitable[int], filename: str, message: str, http_request: Request
+) -> Union[PDFOperationResponse, FileResponse]:
+    try:
+        page_count = await operation
+    except HTTPException:
+        raise
+    except OSError as e:
+        logger.error("File error writing %s: %s", filename, e)
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "status": 500,
+                "code": "internal_server_error",
+                "message": "Internal Server Error",
+                "details": str(e),
+            },
+        ) from e
+    except Exception as e:
+        logger.exception("Unexpected error writing %s", filename)
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "status": 500,
+                "code": "internal_server_error",
+                "message": "Internal Server Error",
+                "details": str(e),
+            },
+        ) from e
+
+    if "application/pdf" in http_request.headers.get("accept", ""):
+        return FileResponse(
+            Path(settings.DOWNLOADS_DIR) / filename,
+            media_type="application/pdf",
+            filename=filename,
+            headers={"X-Page-Count": str(page_count)},
+        )
+    return PDFOperationResponse(
+        results=message, url=download_url(filename), page_count=page_count
+    )
+
+
+@pdfops_router.post(
+    "/merge",
+    operation_id="merge_pdfs",
+    summary="Merge PDFs",
+    description=(
+        "Concatenate previously generated PDFs into a new document without "
+        "rendering them again. Send 'Accept: application/pdf' to receive the "
+        "merged file in the response instead of its download URL."
+    ),
+    tags=["PDF"],
+    response_model=PDFOperationResponse,
+    responses=OPERATION_RESPONSES,
+)
+async def merge(
+    request: MergePDFRequest,
+    http_request: Request,
+    api_key: str = Depends(get_api_key),
+) -> Union[PDFOperationResponse, FileResponse]:
+    """Merge stored PDFs in the requested order.
+
+    Args:
+        request: Source filenames and an optional output filename.
+        http_request: The incoming request, used for content negotiation.
+        api_key: The validated API key, recorded as a hashed identity.
+
+    Returns:
+        PDFOperationResponse | FileResponse: The merged PDF's download URL,
+        or the PDF itself when the client accepts ``application/pdf``.
+
+    Raises:
+        HTTPException: If a source is missing or unreadable, the tenant's
+            rate limit is exceeded or a filesystem error occurs.
+    """
+    # Merging costs a fraction of a render, so only the request rate is charged
+    admit_cost(api_key, 0.0)
+    filename = output_filename(request.output_filename)
+    return await _run_operation(
+        merge_pdfs(
+            request.filenames,
+            filename,
+            api_key_identity(api_key),
+            scope=tenant_scope(api_key),
+        ),
+        filename,
+        MERGED_MESSAGE,
+        http_request,
+    )
+
+
+@pdfops_router.post(
+    "/stamp",
+    operation_id="stamp_pdf",
+    summary="Stamp PDF",
+    description=(
+        "Overlay watermarks, recipient names or small HTML stamps onto a "
+        "previously generated PDF without rendering the document again. Each "
+        "stamp is laid out once per page size and cached. Send "
+        "'Accept: application/pdf' to receive the stamped file directly."
+    ),
+    tags=["PDF"],
+    response_model=PDFOperationResponse,
+    responses=OPERATION_RESPONSES,
+)
+async def stamp(
+    request: StampPDFRequest,
+    http_request: Request,
+    api_key: str = Depends(get_api_key),
+) -> Union[PDFOperationResponse, FileResponse]:
+    """Composite stamps onto every page of a stored PDF.
+
+    Args:
+        request: Source filename, stamps and an optional output filename.
+        http_request: The incoming request, used for content negotiation.
+        api_key: The validated API key, recorded as a hashed identity.
+
+    Returns:
+        PDFOperationResponse | FileResponse: The stamped PDF's download URL,
+        or the PDF itself when the client accepts ``application/pdf``.
+
+    Raises:
+        HTTPException: If the source is missing or unreadable, the tenant's
+            rate limit is exceeded or a filesystem error occurs.
+    """
+    # Stamps are laid out once per page size and cached, so like merges only
+    # the request rate is charged
+    admit_cost(api_key, 0.0)
+    filename = output_filename(request.output_filename)
+    return await _run_operation(
+        stamp_pdf(
+            request.filename,
+            request.stamps,
+            filename,
+            api_key_identity(api_key),
+            scope=tenant_scope(api_key),
+        ),
+        filename,
+        STAMPED_MESSAGE,
+        http_request,
+    )
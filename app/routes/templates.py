@@ -0,0 +1,106 @@
+# /routes/templates.py
+import logging
+
+from fastapi import APIRouter, Depends, Path, Response
+
+from ..compression import DecompressingRoute
+from ..models import TEMPLATE_ID_PATTERN, ErrorResponse, TemplateRequest, TemplateResponse
+from ..dependencies import api_key_identity, get_api_key
+from ..templates import (
+    delete_template,
+    get_template_info,
+    save_template,
+    template_namespace,
+)
+
+
+logger = logging.getLogger(__name__)
+
+template_router = APIRouter(
+    prefix="/templates", tags=["Templates"], route_class=DecompressingRoute
+)
+
+TemplateId = Path(
+    ...,
+    description="Identifier of the template",
+    pattern=f"^{TEMPLATE_ID_PATTERN}$",
+    examples=["quarterly-report"],
+)
+
+_not_found_example = {
+    "status": 404,
+    "code": "template_not_found",
+    "message": "Template not found",
+    "details": "No template is stored with id 'quarterly-report'",
+}
+
+
+@template_router.put(
+    "/{template_id}",
+    operation_id="put_template",
+    summary="Store template",
+    description=(
+        "Create or replace a named template. The template is validated and "
+        "precompiled once; every upload increments its version. When tenants "
+        "are configured each tenant has its own template namespace."
+    ),
+    response_model=TemplateResponse,
+    responses={
+        403: {"description": "Invalid or missing API key", "model": ErrorResponse},
+        422: {"description": "Template could not be compiled", "model": ErrorResponse},
+    },
+)
+async def put_template(
+    request: TemplateRequest,
+    template_id: str = TemplateId,
+    api_key: str = Depends(get_api_key),
+) -> TemplateResponse:
+    """Validate, precompile and store a template in the caller's namespace."""
+    return await save_template(
+        template_id, request, template_namespace(api_key_identity(api_key))
+    )
+
+
+@template_router.get(
+    "/{template_id}",
+    operation_id="get_template",
+    summary="Get template",
+    description="Return the current version and timestamps of a stored template.",
+    response_model=TemplateResponse,
+    responses={
+        403: {"description": "Invalid or missing API key", "model": ErrorResponse},
+        404: {"description": "Template not found", "model": ErrorResponse},
+    },
+    openapi_extra={
+        "responses": {
+            "404": {"content": {"application/json": {"example": _not_found_example}}}
+        }
+    },
+)
+async def get_template(
+    template_id: str = TemplateId, api_key: str = Depends(get_api_key)
+) -> TemplateResponse:
+    """Return metadata for one of the caller's stored templates."""
+    return await get_template_info(
+        template_id, template_namespace(api_key_identity(api_key))
+    )
+
+
+@template_router.delete(
+    "/{template_id}",
+    operation_id="delete_template",
+    summary="Delete template",
+    description="Remove a stored template.",
+    status_code=204,
+    response_class=Response,
+    responses={
+        403: {"description": "Invalid or missing API key", "model": ErrorResponse},
+        404: {"description": "Template not found", "model": ErrorResponse},
+    },
+)
+async def remove_template(
+    template_id: str = TemplateId, api_key: str = Depends(get_api_key)
+) -> Response:
+    """Delete one of the caller's stored templates."""
+    await delete_template(template_id, template_namespace(api_key_identity(api_key)))
+    return Response(status_code=204)
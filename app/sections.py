@@ -0,0 +1,139 @@
+"""Section splitting and the laid-out section cache for incremental renders."""
+
+import hashlib
+import os
+import re
+import uuid
+from pathlib import Path
+from typing import Optional
+
+from .config import settings
+from .pdfops import write_atomically
+from .stats import record_cache
+from .transforms import prune_cache
+
+# Explicit section boundary; when present, headings no longer split sections
+SECTION_MARKER = "<!-- section -->"
+
+_TAG = re.compile(r"<!--.*?-->|<(/?)([a-zA-Z][a-zA-Z0-9-]*)\b[^>]*?(/?)>", re.DOTALL)
+_VOID = frozenset({
+    "area", "base", "br", "col", "embed", "hr", "img", "input",
+    "link", "meta", "source", "track", "wbr",
+})
+_SECTION_HEADINGS = frozenset({"h1", "h2"})
+
+
+def split_sections(html: str) -> list[str]:
+    """
+    Split body HTML into sections that can be laid out independently.
+
+    Sections start at each top-level ``<!-- section -->`` marker or, when
+    the body has none, before each top-level ``<h1>`` or ``<h2>``. Headings
+    nested in other elements never split, and a body whose tags do not
+    balance is kept as a single section.
+
+    Args:
+        html (str): Body HTML.
+
+    Returns:
+        list[str]: Consecutive sections whose concatenation is ``html``,
+        apart from blank leading text.
+    """
+    use_markers = SECTION_MARKER in html
+    depth = 0
+    cuts = []
+    for match in _TAG.finditer(html):
+        if match.group(2) is None:
+            if use_markers and depth == 0 and match.group(0) == SECTION_MARKER:
+                cuts.append(match.start())
+            continue
+        closing, name, self_closing = match.group(1), match.group(2).lower(), match.group(3)
+        if closing:
+            depth -= 1
+            if depth < 0:
+                return [html]
+        elif name not in _VOID and not self_closing:
+            if not use_markers and depth == 0 and name in _SECTION_HEADINGS:
+                cuts.append(match.start())
+            depth += 1
+    if depth != 0:
+        return [html]
+    bounds = [0, *cuts, len(html)]
+    sections = [html[start:end] for start, end in zip(bounds, bounds[1:])]
+    return [section for section in sections if section.strip()] or [html]
+
+
+def section_key(*parts: str) -> str:
+    """Hash a section document with everything else that affects its layout."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def cached_section(key: str) -> Optional[Path]:
+    """Return the cached PDF for a section key, refreshing its LRU position."""
+    path = Path(settings.SECTIONS_DIR) / f"{key}.pdf"
+    hit = path.is_file()
+    record_cache("sections", hit)
+    if not hit:
+        return None
+    os.utime(path)
+    return path
+
+
+def section_pages(path: Path) -> int:
+    """Return the number of pages in a cached section."""
+    from pypdf import PdfReader
+
+    return len(PdfReader(path).pages)
+
+
+def partial_section_path(key: str) -> Path:
+    """
+    Return a private path to render a section into before storing it.
+
+    Each call gets its own path, since render threads of one worker may lay
+    out the same section at the same time.
+    """
+    sections_dir = Path(settings.SECTIONS_DIR)
+    sections_dir.mkdir(parents=True, exist_ok=True)
+    return sections_dir / f".{key}.{uuid.uuid4().hex}.part"
+
+
+def store_section(key: str, partial: Path) -> Path:
+    """Move a rendered section into the cache and evict the oldest entries."""
+    path = Path(settings.SECTIONS_DIR) / f"{key}.pdf"
+    os.replace(partial, path)
+    prune_cache(path.parent, settings.SECTION_CACHE_SIZE)
+    return path
+
+
+def assemble(sections: list[Path], footer: Optional[Path], output_path: Path) -> int:
+    """
+    Concatenate section PDFs and overlay the page footers.
+
+    Pages are copied at the object level, so cached sections are not laid
+    out again. ``footer`` holds one transparent page per output page with
+    the title and page numbers for the whole document.
+
+    Returns:
+        int: Number of pages in the assembled PDF.
+    """
+    from pypdf import PdfReader, PdfWriter, Transformation
+
+    writer = PdfWriter()
+    for index, path in enumerate(sections):
+        reader = PdfReader(path)
+        if index == 0 and reader.metadata:
+            writer.add_metadata(reader.metadata)
+        writer.append(reader)
+    if footer is not None:
+        for page, overlay in zip(writer.pages, PdfReader(footer).pages):
+            box = page.mediabox
+            page.merge_transformed_page(
+                overlay, Transformation().translate(box.left, box.bottom)
+            )
+    write_atomically(writer, output_path)
+    return len(writer.pages)
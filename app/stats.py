@@ -0,0 +1,153 @@
+"""Live render statistics maintained incrementally for GET /admin/stats."""
+
+import heapq
+import itertools
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Optional
+
+from .metrics import metrics
+from .models import CacheStats, CreatePDFRequest, DocumentFeatures, RenderActivity
+
+
+metrics.describe("cache_requests_total", "counter", "Cache lookups by cache and result")
+
+# Caches reported by /admin/stats, in display order
+CACHES = ("idempotency", "css", "highlighting", "images", "stamps", "sections")
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    """Count a lookup in one of the ``CACHES``."""
+    metrics.inc("cache_requests_total", cache=cache, result="hit" if hit else "miss")
+
+
+def cache_stats() -> dict[str, CacheStats]:
+    stats = {}
+    for cache in CACHES:
+        hits = int(metrics.get("cache_requests_total", cache=cache, result="hit") or 0)
+        misses = int(metrics.get("cache_requests_total", cache=cache, result="miss") or 0)
+        total = hits + misses
+        stats[cache] = CacheStats(
+            hits=hits, misses=misses, hit_ratio=hits / total if total else None
+        )
+    return stats
+
+
+def document_features(request: CreatePDFRequest) -> DocumentFeatures:
+    """Measure the request properties that most affect render time."""
+    body = request.body_content.lower()
+    return DocumentFeatures(
+        body_bytes=len(request.body_content.encode()),
+        css_bytes=len(request.css_content.encode()) if request.css_content else 0,
+        code_blocks=body.count("<pre"),
+        tables=body.count("<table"),
+        images=body.count("<img"),
+        contains_code=request.contains_code,
+        template_id=request.template_id,
+        optimization_profile=request.optimization_profile,
+        preview=request.preview_pages is not None,
+        incremental=request.incremental,
+    )
+
+
+@dataclass
+class _Render:
+    job_id: str
+    tenant: Optional[str]
+    features: DocumentFeatures
+    started: float
+    started_at: datetime = field(default_factory=lambda: datetime.now(tz=timezone.utc))
+    stage: Optional[str] = None
+    pages: Optional[int] = None
+
+    def activity(self, seconds: float, status: Optional[str] = None) -> RenderActivity:
+        return RenderActivity(
+            job_id=self.job_id,
+            tenant=self.tenant,
+            stage=self.stage,
+            status=status,
+            started_at=self.started_at,
+            seconds=seconds,
+            page_count=self.pages,
+            features=self.features,
+        )
+
+
+class RenderStats:
+    """
+    In-flight renders and the slowest recent ones for one worker process.
+
+    Finished renders are kept in two bounded min-heaps covering the current
+    and the previous ``window`` seconds, so recording a render is
+    ``O(log size)`` and reading the slowest merges at most ``2 * size``
+    entries. Progress stages may be reported from render threads.
+    """
+
+    def __init__(self, size: int = 10, window: float = 600.0) -> None:
+        self.size = size
+        self.window = window
+        self._lock = threading.Lock()
+        self._inflight: dict[str, _Render] = {}
+        self._current: list[tuple[float, int, RenderActivity]] = []
+        self._previous: list[tuple[float, int, RenderActivity]] = []
+        self._window_start = time.monotonic()
+        self._seq = itertools.count()
+
+    def start(self, job_id: str, tenant: Optional[str], request: CreatePDFRequest) -> None:
+        render = _Render(job_id, tenant, document_features(request), time.monotonic())
+        with self._lock:
+            self._inflight[job_id] = render
+
+    def progress(self, job_id: str, stage: str, pages: Optional[int] = None) -> None:
+        with self._lock:
+            render = self._inflight.get(job_id)
+            if render is not None:
+                render.stage = stage
+                if pages is not None:
+                    render.pages = pages
+
+    def finish(self, job_id: str, status: str, page_count: Optional[int] = None) -> None:
+        now = time.monotonic()
+        with self._lock:
+            render = self._inflight.pop(job_id, None)
+            if render is None:
+                return
+            if page_count is not None:
+                render.pages = page_count
+            seconds = now - render.started
+            self._rotate(now)
+            entry = (seconds, next(self._seq), render.activity(seconds, status))
+            if len(self._current) < self.size:
+                heapq.heappush(self._current, entry)
+            elif seconds > self._current[0][0]:
+                heapq.heapreplace(self._current, entry)
+
+    def _rotate(self, now: float) -> None:
+        if now - self._window_start >= self.window:
+            # After a full idle window the previous renders are stale as well
+            self._previous = self._current if now - self._window_start < 2 * self.window else []
+            self._current = []
+            self._window_start = now
+
+    def inflight(self) -> list[RenderActivity]:
+        now = time.monotonic()
+        with self._lock:
+            renders = sorted(self._inflight.values(), key=lambda render: render.started)
+            return [render.activity(now - render.started) for render in renders]
+
+    def slowest(self) -> list[RenderActivity]:
+        with self._lock:
+            self._rotate(time.monotonic())
+            entries = heapq.nlargest(self.size, self._current + self._previous)
+        return [activity for _, _, activity in entries]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._inflight.clear()
+            self._current, self._previous = [], []
+            self._window_start = time.monotonic()
+
+
+render_stats = RenderStats()
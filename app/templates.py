@@ -0,0 +1,296 @@
+"""Server-side template registry with a per-worker compiled template cache."""
+
+import asyncio
+import json
+import logging
+import os
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Optional
+
+from fastapi import HTTPException
+
+from .config import settings
+from .dependencies import DEFAULT_CSS
+from .models import TEMPLATE_BODY_PLACEHOLDER, TemplateRequest, TemplateResponse
+from .stats import record_cache
+
+
+logger = logging.getLogger(__name__)
+
+_FONT_MIME_TYPES = {
+    "woff2": "font/woff2",
+    "woff": "font/woff",
+    "truetype": "font/ttf",
+    "opentype": "font/otf",
+}
+
+_HEADER_CSS = (
+    ".pdf-template-header{position:running(pdf-template-header);}"
+    "@page{@top-center{content:element(pdf-template-header);}}"
+)
+_FOOTER_CSS = (
+    ".pdf-template-footer{position:running(pdf-template-footer);}"
+    "@page{@bottom-center{content:element(pdf-template-footer);}}"
+)
+
+
+@dataclass(frozen=True)
+class CompiledTemplate:
+    """A stored template with its stylesheets parsed and fonts loaded."""
+
+    template_id: str
+    version: int
+    stylesheets: tuple
+    font_config: Any
+    prologue_html: str
+    wrapper_html: str
+
+    def wrap(self, body_content: str) -> str:
+        """Return the body HTML with the template header, footer and wrapper."""
+        return self.prologue_html + self.wrapper_html.replace(
+            TEMPLATE_BODY_PLACEHOLDER, body_content, 1
+        )
+
+
+# Compiled templates keyed by namespace and id, with the file mtime they
+# were loaded from
+_compiled_cache: dict[tuple[Optional[str], str], tuple[int, CompiledTemplate]] = {}
+
+
+def template_namespace(api_key_id: Optional[str]) -> Optional[str]:
+    """
+    Return the namespace of an API key identity's templates.
+
+    With tenants (``API_KEYS``) configured every identity has its own
+    templates, so one tenant cannot read, replace or delete another's.
+    Single-key deployments and the offline renderer share one namespace
+    (None).
+    """
+    return api_key_id if settings.API_KEYS and api_key_id else None
+
+
+def _template_path(template_id: str, namespace: Optional[str] = None) -> Path:
+    folder = Path(settings.TEMPLATES_DIR)
+    if namespace is not None:
+        # Prefixed, so names such as ".." stay inside TEMPLATES_DIR
+        folder = folder / f"tenant-{namespace}"
+    return folder / f"{template_id}.json"
+
+
+def _template_not_found(template_id: str) -> HTTPException:
+    return HTTPException(
+        status_code=404,
+        detail={
+            "status": 404,
+            "code": "template_not_found",
+            "message": "Template not found",
+            "details": f"No template is stored with id '{template_id}'",
+        },
+    )
+
+
+def _font_face(font: dict) -> str:
+    mime = _FONT_MIME_TYPES[font["format"]]
+    return (
+        f'@font-face{{font-family:"{font["family"]}";'
+        f'src:url(data:{mime};base64,{font["data"]}) format("{font["format"]}");}}'
+    )
+
+
+def _compile(template_id: str, record: dict) -> CompiledTemplate:
+    """Parse a stored template record into reusable WeasyPrint objects."""
+    from weasyprint import CSS
+    from weasyprint.text.fonts import FontConfiguration
+
+    css_parts = [_font_face(font) for font in record.get("fonts", [])]
+    prologue_html = ""
+    if record.get("header_html"):
+        css_parts.append(_HEADER_CSS)
+        prologue_html += (
+            f'<div class="pdf-template-header">{record["header_html"]}</div>'
+        )
+    if record.get("footer_html"):
+        css_parts.append(_FOOTER_CSS)
+        prologue_html += (
+            f'<div class="pdf-template-footer">{record["footer_html"]}</div>'
+        )
+    if record.get("css_content"):
+        css_parts.append(record["css_content"])
+
+    font_config = FontConfiguration()
+    # Passed as user stylesheets, so inline request CSS still overrides them
+    stylesheets = (
+        CSS(string=DEFAULT_CSS),
+        CSS(string="".join(css_parts), font_config=font_config),
+    )
+    return CompiledTemplate(
+        template_id=template_id,
+        version=record["version"],
+        stylesheets=stylesheets,
+        font_config=font_config,
+        prologue_html=prologue_html,
+        wrapper_html=record.get("wrapper_html") or TEMPLATE_BODY_PLACEHOLDER,
+    )
+
+
+def _read_record(path: Path) -> dict:
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def _to_response(record: dict) -> TemplateResponse:
+    return TemplateResponse(
+        template_id=record["template_id"],
+        version=record["version"],
+        created_at=record["created_at"],
+        updated_at=record["updated_at"],
+    )
+
+
+def _load_compiled(
+    template_id: str, namespace: Optional[str] = None
+) -> Optional[CompiledTemplate]:
+    """Return the compiled template, recompiling only when its version changed."""
+    path = _template_path(template_id, namespace)
+    key = (namespace, template_id)
+    try:
+        mtime_ns = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        _compiled_cache.pop(key, None)
+        return None
+    cached = _compiled_cache.get(key)
+    if cached is not None and cached[0] == mtime_ns:
+        record_cache("css", True)
+        return cached[1]
+    record = _read_record(path)
+    reused = cached is not None and cached[1].version == record["version"]
+    record_cache("css", reused)
+    compiled = cached[1] if reused else _compile(template_id, record)
+    _compiled_cache[key] = (mtime_ns, compiled)
+    return compiled
+
+
+def _store(
+    template_id: str, request: TemplateRequest, namespace: Optional[str] = None
+) -> dict:
+    path = _template_path(template_id, namespace)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    now = datetime.now(tz=timezone.utc).isoformat()
+    try:
+        previous = _read_record(path)
+    except FileNotFoundError:
+        previous = None
+    record = {
+        "template_id": template_id,
+        "version": previous["version"] + 1 if previous else 1,
+        "created_at": previous["created_at"] if previous else now,
+        "updated_at": now,
+        **request.model_dump(),
+    }
+    # Compile before persisting so broken templates are never stored
+    compiled = _compile(template_id, record)
+    # Each save gets its own file, as threads of a worker may save one template
+    tmp_path = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+    tmp_path.write_text(json.dumps(record), encoding="utf-8")
+    os.replace(tmp_path, path)
+    _compiled_cache[(namespace, template_id)] = (path.stat().st_mtime_ns, compiled)
+    return record
+
+
+def _remove(template_id: str, namespace: Optional[str] = None) -> bool:
+    _compiled_cache.pop((namespace, template_id), None)
+    try:
+        _template_path(template_id, namespace).unlink()
+    except FileNotFoundError:
+        return False
+    return True
+
+
+async def save_template(
+    template_id: str, request: TemplateRequest, namespace: Optional[str] = None
+) -> TemplateResponse:
+    """
+    Validate, precompile and persist a template, bumping its version.
+
+    Args:
+        template_id (str): Identifier of the template to create or replace.
+        request (TemplateRequest): Template definition.
+        namespace (Optional[str]): Namespace from ``template_namespace``.
+
+    Returns:
+        TemplateResponse: Metadata of the stored template.
+
+    Raises:
+        HTTPException: If the template cannot be compiled or stored.
+    """
+    try:
+        record = await asyncio.to_thread(_store, template_id, request, namespace)
+    except OSError as e:
+        logger.error("Filesystem error storing template: %s", e)
+        raise HTTPException(
+            status_code=500,
+            detail={
+                "status": 500,
+                "code": "internal_server_error",
+                "message": "Internal Server Error",
+                "details": str(e),
+            },
+        ) from e
+    except Exception as e:
+        logger.warning("Template %s failed to compile: %s", template_id, e)
+        raise HTTPException(
+            status_code=422,
+            detail={
+                "status": 422,
+                "code": "template_compile_error",
+                "message": "Template could not be compiled",
+                "details": str(e),
+            },
+        ) from e
+    return _to_response(record)
+
+
+async def get_template_info(
+    template_id: str, namespace: Optional[str] = None
+) -> TemplateResponse:
+    """Return metadata for a stored template or raise a 404 HTTPException."""
+    try:
+        record = await asyncio.to_thread(
+            _read_record, _template_path(template_id, namespace)
+        )
+    except FileNotFoundError as e:
+        raise _template_not_found(template_id) from e
+    return _to_response(record)
+
+
+async def delete_template(template_id: str, namespace: Optional[str] = None) -> None:
+    """Delete a stored template or raise a 404 HTTPException."""
+    if not await asyncio.to_thread(_remove, template_id, namespace):
+        raise _template_not_found(template_id)
+
+
+async def load_template(
+    template_id: str, namespace: Optional[str] = None
+) -> CompiledTemplate:
+    """
+    Return the compiled template for rendering.
+
+    Compiled templates are cached per worker and reused until the stored
+    version changes.
+
+    Args:
+        template_id (str): Identifier of the stored template.
+        namespace (Optional[str]): Namespace from ``template_namespace``.
+
+    Returns:
+        CompiledTemplate: Precompiled stylesheets, fonts and wrapper HTML.
+
+    Raises:
+        HTTPException: If the template does not exist.
+    """
+    compiled = await asyncio.to_thread(_load_compiled, template_id, namespace)
+    if compiled is None:
+        raise _template_not_found(template_id)
+    return compiled
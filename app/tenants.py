@@ -0,0 +1,267 @@
+"""Per-tenant API keys, rate limits and weighted fair-share render scheduling."""
+
+import asyncio
+import hmac
+import math
+import threading
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Callable, Optional
+
+from fastapi import HTTPException
+
+from .config import TenantSettings, settings
+from .metrics import metrics
+from .models import CreatePDFRequest
+
+
+metrics.describe("rate_limited_total", "counter", "Requests rejected by tenant limits")
+
+
+def find_tenant(api_key: Optional[str]) -> Optional[TenantSettings]:
+    """Return the configured tenant owning ``api_key``, if any."""
+    if not api_key:
+        return None
+    for tenant in settings.API_KEYS:
+        if hmac.compare_digest(tenant.key.encode(), api_key.encode()):
+            return tenant
+    return None
+
+
+def tenant_by_name(name: Optional[str]) -> Optional[TenantSettings]:
+    for tenant in settings.API_KEYS:
+        if tenant.name == name:
+            return tenant
+    return None
+
+
+def estimate_cost(request: CreatePDFRequest) -> float:
+    """
+    Estimate render cost in units of ``RENDER_COST_UNIT_BYTES`` of markup.
+
+    Layout time grows with the amount of HTML and CSS, and highlighting code
+    blocks roughly doubles it, so every request costs at least one unit.
+    """
+    size = len(request.body_content) + len(request.css_content or "")
+    cost = 1.0 + size / settings.RENDER_COST_UNIT_BYTES
+    return cost * 2 if request.contains_code else cost
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at ``rate`` up to ``burst`` tokens."""
+
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, amount: float = 1.0) -> float:
+        """Take ``amount`` tokens; return 0 or the seconds until they are available."""
+        self._refill(time.monotonic())
+        # Requests larger than the bucket may proceed once it is full
+        amount = min(amount, self.burst)
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Request and render-cost token buckets for each tenant in this worker."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._buckets: dict[str, tuple[TokenBucket, TokenBucket]] = {}
+
+    def _tenant_buckets(self, tenant: TenantSettings) -> tuple[TokenBucket, TokenBucket]:
+        buckets = self._buckets.get(tenant.name)
+        if buckets is None:
+            buckets = self._buckets[tenant.name] = (
+                TokenBucket(tenant.requests_per_second, tenant.request_burst),
+                TokenBucket(tenant.cost_per_second, tenant.cost_burst),
+            )
+        return buckets
+
+    def check(self, tenant: TenantSettings, cost: float) -> None:
+        """
+        Charge a request against the tenant's buckets.
+
+        Raises:
+            HTTPException: 429 with ``Retry-After`` when a bucket is empty.
+        """
+        with self._lock:
+            requests, costs = self._tenant_buckets(tenant)
+            if tenant.requests_per_second:
+                wait = requests.take()
+                if wait:
+                    self._reject(tenant, "request_rate_limited", wait)
+            if tenant.cost_per_second:
+                wait = costs.take(cost)
+                if wait:
+                    # Give back the request token so only admitted work is charged
+                    requests.tokens = min(requests.burst, requests.tokens + 1)
+                    self._reject(tenant, "render_cost_limited", wait)
+
+    def _reject(self, tenant: TenantSettings, code: str, wait: float) -> None:
+        metrics.inc("rate_limited_total", tenant=tenant.name, reason=code)
+        raise HTTPException(
+            status_code=429,
+            detail={
+                "status": 429,
+                "code": code,
+                "message": "Rate limit exceeded",
+                "details": f"Retry after {wait:.1f} seconds",
+            },
+            headers={"Retry-After": str(math.ceil(wait))},
+        )
+
+    def reset(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+
+rate_limiter = RateLimiter()
+
+
+def admit(api_key: Optional[str], request: CreatePDFRequest) -> None:
+    """Apply the caller's rate limits to a render request."""
+    admit_cost(api_key, estimate_cost(request))
+
+
+def admit_cost(api_key: Optional[str], cost: float) -> None:
+    """Apply the caller's rate limits to work of an already known cost."""
+    tenant = find_tenant(api_key)
+    if tenant is not None:
+        rate_limiter.check(tenant, cost)
+
+
+@dataclass(order=True)
+class _Waiter:
+    finish: float
+    seq: int
+    key: str = field(compare=False)
+    tenant: str = field(compare=False)
+    max_concurrency: int = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+class FairScheduler:
+    """
+    Weighted fair queuing for render slots (self-clocked fair queuing).
+
+    Each job gets a virtual finish tag ``max(V, F_tenant) + cost / weight``
+    and free slots go to the waiting job with the smallest tag whose tenant is
+    below its concurrency cap. A tenant submitting a large batch advances its
+    own tags, so other tenants' jobs are interleaved instead of queuing behind
+    the whole batch.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        on_change: Optional[Callable[[list[str]], None]] = None,
+    ) -> None:
+        self.capacity = capacity
+        self.on_change = on_change
+        self.virtual_time = 0.0
+        self._finish: dict[str, float] = {}
+        self._running: dict[str, int] = {}
+        self._active = 0
+        self._waiting: list[_Waiter] = []
+        self._seq = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._waiting)
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    def waiting(self) -> list[str]:
+        """Keys of waiting jobs in the order they will be dispatched."""
+        return [waiter.key for waiter in sorted(self._waiting)]
+
+    def _dispatch(self) -> bool:
+        dispatched = False
+        while self._active < self.capacity:
+            eligible = [
+                waiter
+                for waiter in self._waiting
+                if not waiter.max_concurrency
+                or self._running.get(waiter.tenant, 0) < waiter.max_concurrency
+            ]
+            if not eligible:
+                break
+            waiter = min(eligible)
+            self._waiting.remove(waiter)
+            if waiter.future.cancelled():
+                continue
+            self.virtual_time = waiter.finish
+            self._active += 1
+            self._running[waiter.tenant] = self._running.get(waiter.tenant, 0) + 1
+            waiter.future.set_result(None)
+            dispatched = True
+        return dispatched
+
+    def release(self, tenant: str) -> None:
+        """Free a slot taken by ``acquire`` and dispatch waiting jobs."""
+        self._active -= 1
+        self._running[tenant] -= 1
+        if not self._running[tenant]:
+            del self._running[tenant]
+        if self._dispatch() and self.on_change is not None:
+            self.on_change(self.waiting())
+
+    async def acquire(
+        self,
+        key: str,
+        tenant: str,
+        cost: float = 1.0,
+        weight: float = 1.0,
+        max_concurrency: int = 0,
+    ) -> None:
+        start = max(self.virtual_time, self._finish.get(tenant, 0.0))
+        finish = start + cost / weight
+        self._finish[tenant] = finish
+        self._seq += 1
+        waiter = _Waiter(
+            finish=finish,
+            seq=self._seq,
+            key=key,
+            tenant=tenant,
+            max_concurrency=max_concurrency,
+            future=asyncio.get_running_loop().create_future(),
+        )
+        self._waiting.append(waiter)
+        if not self._dispatch() and self.on_change is not None:
+            self.on_change(self.waiting())
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter in self._waiting:
+                self._waiting.remove(waiter)
+            elif waiter.future.done() and not waiter.future.cancelled():
+                self.release(tenant)
+            raise
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        key: str,
+        tenant: str,
+        cost: float = 1.0,
+        weight: float = 1.0,
+        max_concurrency: int = 0,
+    ) -> AsyncIterator[None]:
+        await self.acquire(key, tenant, cost, weight, max_concurrency)
+        try:
+            yield
+        finally:
+            self.release(tenant)
@@ -0,0 +1,372 @@
+"""Request tracing compatible with W3C Trace Context and OTLP/JSON export."""
+
+import logging
+import os
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+import orjson
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .config import settings
+from .metrics import metrics
+
+
+logger = logging.getLogger(__name__)
+
+metrics.describe("trace_spans_dropped_total", "counter", "Spans dropped by the exporter")
+
+_TRACEPARENT = re.compile(r"^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})")
+
+# OTLP span kinds
+KINDS = {"internal": 1, "server": 2, "client": 3}
+
+
+@dataclass(frozen=True)
+class SpanContext:
+    trace_id: str
+    span_id: str
+    sampled: bool
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[SpanContext]:
+    """Parse a W3C ``traceparent`` header, ignoring invalid values."""
+    match = _TRACEPARENT.match((value or "").strip().lower())
+    if match is None:
+        return None
+    version, trace_id, span_id, flags = match.groups()
+    if version == "ff" or set(trace_id) == {"0"} or set(span_id) == {"0"}:
+        return None
+    return SpanContext(trace_id, span_id, bool(int(flags, 16) & 1))
+
+
+def format_traceparent(context: SpanContext) -> str:
+    return f"00-{context.trace_id}-{context.span_id}-{'01' if context.sampled else '00'}"
+
+
+class Span:
+    """A timed operation; only sampled spans are exported."""
+
+    __slots__ = (
+        "name", "context", "parent_id", "kind", "attributes",
+        "start_ns", "end_ns", "error",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        context: SpanContext,
+        parent_id: Optional[str],
+        kind: str,
+        attributes: Optional[dict[str, Any]],
+    ) -> None:
+        self.name = name
+        self.context = context
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        if self.context.sampled:
+            self.attributes[key] = value
+
+    def record_exception(self, exc: BaseException) -> None:
+        # Client errors are expected outcomes, not span failures
+        if isinstance(exc, HTTPException) and exc.status_code < 500:
+            self.set_attribute("http.response.status_code", exc.status_code)
+            return
+        self.error = f"{type(exc).__name__}: {exc}"
+
+    def to_otlp(self) -> dict:
+        span = {
+            "traceId": self.context.trace_id,
+            "spanId": self.context.span_id,
+            "name": self.name,
+            "kind": KINDS[self.kind],
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or self.start_ns),
+            "attributes": _otlp_attributes(self.attributes),
+            "status": (
+                {"code": 2, "message": self.error} if self.error else {"code": 1}
+            ),
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: dict[str, Any]) -> list[dict]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()]
+
+
+def otlp_payload(spans: list[Span], service_name: str) -> dict:
+    """Build an OTLP/JSON ``ExportTraceServiceRequest`` for a batch of spans."""
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": _otlp_attributes({"service.name": service_name})
+                },
+                "scopeSpans": [
+                    {
+                        "scope": {"name": "app.tracing"},
+                        "spans": [span.to_otlp() for span in spans],
+                    }
+                ],
+            }
+        ]
+    }
+
+
+class FileSpanExporter:
+    """Append one OTLP/JSON request per batch to a JSON Lines file."""
+
+    def __init__(self, path: Path, max_bytes: int = 50 * 1024 * 1024) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+
+    def export(self, payload: dict) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            if self.path.stat().st_size > self.max_bytes:
+                os.replace(self.path, self.path.with_suffix(self.path.suffix + ".1"))
+        except FileNotFoundError:
+            pass
+        with self.path.open("ab") as file:
+            file.write(orjson.dumps(payload) + b"\n")
+
+
+class OtlpHttpSpanExporter:
+    """POST OTLP/JSON batches to a collector's ``/v1/traces`` endpoint."""
+
+    def __init__(self, endpoint: str, timeout: float = 5.0) -> None:
+        self.endpoint = endpoint
+        self.timeout = timeout
+
+    def export(self, payload: dict) -> None:
+        request = urllib.request.Request(
+            self.endpoint,
+            data=orjson.dumps(payload),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+
+class BatchSpanProcessor:
+    """
+    Buffer finished spans and export them from a background thread.
+
+    The buffer is bounded; spans are dropped rather than slowing requests
+    when the exporter cannot keep up.
+    """
+
+    def __init__(
+        self,
+        exporter,
+        service_name: str,
+        max_queue: int = 2048,
+        batch_size: int = 256,
+        interval: float = 5.0,
+    ) -> None:
+        self.exporter = exporter
+        self.service_name = service_name
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.interval = interval
+        self._spans: deque[Span] = deque()
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(
+            target=self._run, name="span-exporter", daemon=True
+        )
+        self._thread.start()
+
+    def on_end(self, span: Span) -> None:
+        with self._condition:
+            if len(self._spans) >= self.max_queue:
+                metrics.inc("trace_spans_dropped_total")
+                return
+            self._spans.append(span)
+            if len(self._spans) >= self.batch_size:
+                self._condition.notify()
+
+    def _drain(self) -> None:
+        while True:
+            with self._condition:
+                batch = [
+                    self._spans.popleft()
+                    for _ in range(min(self.batch_size, len(self._spans)))
+                ]
+            if not batch:
+                return
+            try:
+                self.exporter.export(otlp_payload(batch, self.service_name))
+            except (OSError, urllib.error.URLError) as e:
+                metrics.inc("trace_spans_dropped_total", len(batch))
+                logger.warning("Span export failed: %s", e)
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                if not self._stopped and len(self._spans) < self.batch_size:
+                    self._condition.wait(self.interval)
+                stopped = self._stopped
+            self._drain()
+            if stopped:
+                return
+
+    def shutdown(self) -> None:
+        """Export buffered spans and stop the background thread."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        self._thread.join(timeout=10)
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class Tracer:
+    """
+    Create spans linked through a context variable.
+
+    The context variable follows ``await`` and ``asyncio.to_thread``, so
+    render stages running in worker threads join the request's trace. Root
+    spans are sampled with probability ``TRACE_SAMPLE_RATIO`` and children
+    follow their parent's decision, as OpenTelemetry's parent-based sampler
+    does.
+    """
+
+    def __init__(self) -> None:
+        self.processor: Optional[BatchSpanProcessor] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.processor is not None
+
+    def configure(self) -> None:
+        """Start exporting spans as configured by ``TRACE_EXPORTER``."""
+        self.shutdown()
+        if settings.TRACE_EXPORTER == "file":
+            exporter = FileSpanExporter(Path(settings.TRACE_FILE_PATH))
+        elif settings.TRACE_EXPORTER == "otlp":
+            exporter = OtlpHttpSpanExporter(settings.TRACE_OTLP_ENDPOINT)
+        else:
+            return
+        self.processor = BatchSpanProcessor(exporter, settings.TRACE_SERVICE_NAME)
+
+    def shutdown(self) -> None:
+        if self.processor is not None:
+            self.processor.shutdown()
+            self.processor = None
+
+    def current_span(self) -> Optional[Span]:
+        return _current_span.get()
+
+    def current_traceparent(self) -> Optional[str]:
+        span = _current_span.get()
+        return format_traceparent(span.context) if span is not None else None
+
+    @contextmanager
+    def start_span(
+        self,
+        name: str,
+        kind: str = "internal",
+        attributes: Optional[dict[str, Any]] = None,
+        parent: Optional[SpanContext] = None,
+    ) -> Iterator[Span]:
+        """Run the block inside a new span, a child of ``parent`` or the current span."""
+        if parent is None:
+            current = _current_span.get()
+            parent = current.context if current is not None else None
+        if parent is not None:
+            trace_id, sampled, parent_id = parent.trace_id, parent.sampled, parent.span_id
+        else:
+            trace_id = f"{random.getrandbits(128):032x}"
+            sampled = random.random() < settings.TRACE_SAMPLE_RATIO
+            parent_id = None
+        context = SpanContext(
+            trace_id, f"{random.getrandbits(64):016x}", sampled and self.enabled
+        )
+        span = Span(name, context, parent_id, kind, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end_ns = time.time_ns()
+            processor = self.processor
+            if context.sampled and processor is not None:
+                processor.on_end(span)
+
+
+tracer = Tracer()
+
+
+class TracingMiddleware:
+    """Open a server span per HTTP request, continuing incoming trace context."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        # Routing has not happened yet; the span is renamed after the app
+        # runs so names stay low-cardinality (route templates, not paths)
+        with tracer.start_span(
+            scope["method"],
+            kind="server",
+            attributes={
+                "http.request.method": scope["method"],
+                "url.path": scope["path"],
+            },
+            parent=parse_traceparent(headers.get("traceparent")),
+        ) as span:
+
+            async def send_with_status(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.response.status_code", message["status"])
+                    if message["status"] >= 500:
+                        span.error = f"HTTP {message['status']}"
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                route = scope.get("route")
+                if route is not None:
+                    span.name = f"{scope['method']} {route.path}"
+                    span.set_attribute("http.route", route.path)
@@ -0,0 +1,258 @@
+"""Pre-layout transforms applied to body HTML before WeasyPrint sees it."""
+
+import base64
+import binascii
+import hashlib
+import io
+import logging
+import math
+import os
+import re
+import uuid
+from pathlib import Path
+from typing import Optional
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .config import settings
+from .stats import record_cache
+
+
+logger = logging.getLogger(__name__)
+
+_TABLE = re.compile(
+    r"<table\b(?P<attrs>[^>]*)>(?P<body>(?:(?!<table\b).)*?)</table\s*>",
+    re.DOTALL | re.IGNORECASE,
+)
+_TABLE_TAG = re.compile(r"<(/?)table\b", re.IGNORECASE)
+_HEAD_PARTS = re.compile(
+    r"<caption\b.*?</caption\s*>|<colgroup\b.*?</colgroup\s*>|<col\b[^>]*>"
+    r"|<thead\b.*?</thead\s*>|<tfoot\b.*?</tfoot\s*>",
+    re.DOTALL | re.IGNORECASE,
+)
+_ROW = re.compile(r"<tr\b.*?</tr\s*>", re.DOTALL | re.IGNORECASE)
+_ID = re.compile(r"""\s+id\s*=\s*("[^"]*"|'[^']*'|[^\s>]+)""", re.IGNORECASE)
+_STYLE = re.compile(r"""(\s+style\s*=\s*)("([^"]*)"|'([^']*)')""", re.IGNORECASE)
+
+
+def _with_style(attrs: str, declarations: str) -> str:
+    """Append CSS declarations to a tag's attributes, merging any style."""
+    match = _STYLE.search(attrs)
+    if match is None:
+        return f'{attrs} style="{declarations}"'
+    existing = match.group(3) if match.group(3) is not None else match.group(4)
+    existing = existing.strip().rstrip(";")
+    merged = f"{existing};{declarations}" if existing else declarations
+    quote = match.group(2)[0]
+    return f"{attrs[:match.start()]}{match.group(1)}{quote}{merged}{quote}{attrs[match.end():]}"
+
+
+def _split_table(match: re.Match, max_rows: int) -> str:
+    attrs, body = match.group("attrs"), match.group("body")
+    rows = _ROW.findall(_HEAD_PARTS.sub("", body))
+    # Row spans would be cut at fragment boundaries
+    if len(rows) <= max_rows or re.search(r"\browspan\b", body, re.IGNORECASE):
+        return match.group(0)
+    parts = _HEAD_PARTS.findall(body)
+    caption = "".join(p for p in parts if p[:8].lower() == "<caption")
+    columns = "".join(p for p in parts if p[:4].lower() == "<col")
+    thead = "".join(p for p in parts if p[:6].lower() == "<thead")
+    tfoot = "".join(p for p in parts if p[:6].lower() == "<tfoot")
+
+    chunks = [rows[i:i + max_rows] for i in range(0, len(rows), max_rows)]
+    fragments = []
+    for index, chunk in enumerate(chunks):
+        first, last = index == 0, index == len(chunks) - 1
+        fragment_attrs = attrs if first else _ID.sub("", attrs)
+        declarations = []
+        # Fragments follow on without a gap; the repeated <thead> heads
+        # every page they break across
+        if not first:
+            declarations.append("margin-top:0")
+        if not last:
+            declarations.append("margin-bottom:0")
+        if declarations:
+            fragment_attrs = _with_style(fragment_attrs, ";".join(declarations))
+        fragments.append(
+            f"<table{fragment_attrs}>"
+            f"{caption if first else ''}{columns}{thead}"
+            f"<tbody>{''.join(chunk)}</tbody>"
+            f"{tfoot if last else ''}</table>"
+        )
+    return "".join(fragments)
+
+
+def split_large_tables(html: str, max_rows: int) -> str:
+    """
+    Split tables with more than ``max_rows`` body rows into fragments.
+
+    Laying out one huge table box is the slowest and most memory-hungry
+    part of rendering long reports. Each fragment repeats the table's
+    ``<thead>`` and column definitions and follows on directly from the one
+    before, so headers still appear at the top of every page. Tables using
+    ``rowspan``, tables containing nested tables and the nested tables
+    themselves are left untouched.
+
+    Args:
+        html (str): Body HTML.
+        max_rows (int): Largest number of body rows kept in one table.
+
+    Returns:
+        str: The HTML with oversized tables split.
+    """
+    if max_rows <= 0 or "<tr" not in html.lower():
+        return html
+    depth, scanned = 0, 0
+
+    def split(match: re.Match) -> str:
+        nonlocal depth, scanned
+        # _TABLE only matches innermost tables, so an outer table is never
+        # split; one inside another table's cell is kept whole as well
+        for tag in _TABLE_TAG.finditer(html, scanned, match.start()):
+            depth += -1 if tag.group(1) else 1
+        scanned = match.end()
+        return match.group(0) if depth > 0 else _split_table(match, max_rows)
+
+    return _TABLE.sub(split, html)
+
+
+_IMG = re.compile(r"<img\b[^>]*>", re.IGNORECASE)
+_DATA_SRC = re.compile(
+    r"""(?P<prefix>\ssrc\s*=\s*)(?P<quote>["'])data:(?P<mime>image/[a-z0-9.+-]+);base64,"""
+    r"""(?P<data>[A-Za-z0-9+/=\s]+)(?P=quote)""",
+    re.IGNORECASE,
+)
+_WIDTH_ATTR = re.compile(r"""\swidth\s*=\s*["']?(\d+(?:\.\d+)?)(?:px)?["']?[\s>/]""", re.IGNORECASE)
+_STYLE_WIDTH = re.compile(
+    r"(?:^|[;\s\"'])width\s*:\s*(\d+(?:\.\d+)?)(px|in|cm|mm|pt|%)", re.IGNORECASE
+)
+
+# Inches per CSS unit
+_UNITS = {"px": 1 / 96, "in": 1.0, "cm": 1 / 2.54, "mm": 1 / 25.4, "pt": 1 / 72}
+# Percentages are resolved against the widest common page (A3 portrait)
+_MAX_PAGE_WIDTH_IN = 11.7
+# Output formats by source format; anything else becomes PNG or JPEG
+_FORMATS = {"JPEG": ("JPEG", "image/jpeg"), "PNG": ("PNG", "image/png")}
+
+
+def prune_cache(directory: Path, keep: int) -> None:
+    """Delete all but the ``keep`` most recently used files in a cache folder."""
+    # Hits refresh mtime, so the least recently used entries go first
+    cached = sorted(
+        (path for path in directory.iterdir() if not path.name.startswith(".")),
+        key=lambda path: path.stat().st_mtime,
+    )
+    for path in cached[: max(0, len(cached) - keep)]:
+        path.unlink(missing_ok=True)
+
+
+def rendered_width_inches(tag: str) -> Optional[float]:
+    """Return the width an ``<img>`` tag declares, in inches, if any."""
+    style = re.search(r"""\sstyle\s*=\s*("[^"]*"|'[^']*')""", tag, re.IGNORECASE)
+    if style is not None:
+        match = _STYLE_WIDTH.search(style.group(1))
+        if match is not None:
+            value, unit = float(match.group(1)), match.group(2).lower()
+            if unit == "%":
+                return _MAX_PAGE_WIDTH_IN * value / 100
+            return value * _UNITS[unit]
+    match = _WIDTH_ATTR.search(tag)
+    if match is not None:
+        return float(match.group(1)) / 96
+    return None
+
+
+def _downscale(data: bytes, max_pixels: int) -> Optional[tuple[bytes, str]]:
+    image = Image.open(io.BytesIO(data))
+    if image.width <= max_pixels:
+        return None
+    output_format, mime = _FORMATS.get(image.format, (None, None))
+    image = ImageOps.exif_transpose(image)
+    if output_format is None:
+        has_alpha = image.mode in ("RGBA", "LA", "P")
+        output_format, mime = _FORMATS["PNG" if has_alpha else "JPEG"]
+    if output_format == "JPEG" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    height = max(1, round(image.height * max_pixels / image.width))
+    image = image.resize((max_pixels, height), Image.LANCZOS)
+    buffer = io.BytesIO()
+    if output_format == "JPEG":
+        image.save(buffer, format="JPEG", quality=85, optimize=True)
+    else:
+        image.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue(), mime
+
+
+def downscaled_image(data: bytes, max_pixels: int) -> Optional[tuple[bytes, str]]:
+    """
+    Return ``data`` resampled to at most ``max_pixels`` wide, or None if smaller.
+
+    Results are cached in ``IMAGES_DIR`` by source hash and target width, so
+    an image is decoded and resampled once however many requests embed it.
+    """
+    key = f"{hashlib.sha256(data).hexdigest()}-{max_pixels}"
+    images_dir = Path(settings.IMAGES_DIR)
+    for mime, extension in (("image/jpeg", "jpg"), ("image/png", "png")):
+        path = images_dir / f"{key}.{extension}"
+        if path.is_file():
+            os.utime(path)
+            record_cache("images", True)
+            return path.read_bytes(), mime
+    record_cache("images", False)
+    result = _downscale(data, max_pixels)
+    if result is not None:
+        images_dir.mkdir(parents=True, exist_ok=True)
+        extension = "jpg" if result[1] == "image/jpeg" else "png"
+        # Concurrent renders may embed the same image, so each gets its own file
+        partial = images_dir / f".{key}.{uuid.uuid4().hex}.part"
+        partial.write_bytes(result[0])
+        os.replace(partial, images_dir / f"{key}.{extension}")
+        prune_cache(images_dir, settings.IMAGE_CACHE_SIZE)
+    return result
+
+
+def _normalize_tag(tag: str, dpi: int) -> str:
+    source = _DATA_SRC.search(tag)
+    if source is None:
+        return tag
+    # Images without a declared width are laid out at their pixel size
+    width = rendered_width_inches(tag)
+    if width is None:
+        return tag
+    try:
+        data = base64.b64decode(source.group("data"), validate=False)
+        result = downscaled_image(data, max(1, math.ceil(width * dpi)))
+    except (
+        binascii.Error, Image.DecompressionBombError, UnidentifiedImageError, OSError, ValueError
+    ) as e:
+        logger.warning("Leaving undecodable embedded image unchanged: %s", e)
+        return tag
+    if result is None:
+        return tag
+    encoded = base64.b64encode(result[0]).decode()
+    quote = source.group("quote")
+    return (
+        f"{tag[:source.start()]}{source.group('prefix')}{quote}"
+        f"data:{result[1]};base64,{encoded}{quote}{tag[source.end():]}"
+    )
+
+
+def normalize_images(html: str, dpi: int) -> str:
+    """
+    Downsample embedded ``data:`` images to ``dpi`` at their declared width.
+
+    Only images whose width is set by a ``width`` attribute or an inline
+    ``width`` style are resampled, so the layout never changes; widths set
+    by stylesheets are not seen. Percentages are resolved against the
+    widest common page. Remote images are left for WeasyPrint to fetch.
+
+    Args:
+        html (str): Body HTML.
+        dpi (int): Highest resolution kept, in pixels per inch.
+
+    Returns:
+        str: The HTML with oversized embedded images replaced.
+    """
+    if dpi <= 0 or "data:image" not in html:
+        return html
+    return _IMG.sub(lambda match: _normalize_tag(match.group(0), dpi), html)
@@ -0,0 +1,266 @@
+"""Signed completion webhooks delivered off the render path."""
+
+import asyncio
+import hashlib
+import hmac
+import logging
+import random
+import time
+import urllib.error
+import urllib.request
+from typing import Optional
+
+from fastapi import HTTPException
+
+from .config import settings
+from .jobs import COMPLETED_MESSAGE, RenderJob
+from .metrics import metrics
+from .models import CreatePDFRequest, JobStatusResponse, RenderTimings, WebhookPayload
+from .outbound import UnsafeURLError, resolve_url
+from .tracing import parse_traceparent, tracer
+
+
+logger = logging.getLogger(__name__)
+
+metrics.describe("webhook_deliveries_total", "counter", "Webhook deliveries by outcome")
+metrics.describe(
+    "webhook_dropped_total", "counter", "Webhooks dropped because the queue was full"
+)
+
+USER_AGENT = "pdf-generation-api-webhooks/1"
+
+
+class WebhookDeliveryError(Exception):
+    """Delivery failed; ``retryable`` tells whether another attempt may succeed."""
+
+    def __init__(self, message: str, retryable: bool) -> None:
+        super().__init__(message)
+        self.retryable = retryable
+
+
+def build_payload(job: RenderJob, result: JobStatusResponse) -> WebhookPayload:
+    """Describe a finished job with the create_pdf response fields and timings."""
+
+    def elapsed_ms(start, end) -> float:
+        return (end - start).total_seconds() * 1000
+
+    completed = result.status == "completed"
+    return WebhookPayload(
+        event="pdf.completed" if completed else "pdf.failed",
+        job_id=job.job_id,
+        results=COMPLETED_MESSAGE if completed else None,
+        url=result.url,
+        page_count=result.page_count,
+        error=result.error,
+        timings=RenderTimings(
+            queued_ms=(
+                elapsed_ms(job.created_at, result.started_at)
+                if result.started_at is not None
+                else None
+            ),
+            render_ms=result.render_ms,
+            total_ms=elapsed_ms(job.created_at, result.updated_at),
+        ),
+    )
+
+
+async def check_callback(request: CreatePDFRequest) -> None:
+    """
+    Reject a ``callback_url`` that would not be delivered as a signed webhook.
+
+    Raises:
+        HTTPException: 422 if ``WEBHOOK_SECRET`` is not configured or the
+            URL does not resolve only to public addresses.
+    """
+    if request.callback_url is None:
+        return
+    if not settings.WEBHOOK_SECRET:
+        raise HTTPException(
+            status_code=422,
+            detail={
+                "status": 422,
+                "code": "webhooks_disabled",
+                "message": "Completion webhooks are not enabled",
+                "details": "Set WEBHOOK_SECRET to accept callback_url",
+            },
+        )
+    try:
+        await asyncio.to_thread(resolve_url, request.callback_url)
+    except UnsafeURLError as e:
+        raise HTTPException(
+            status_code=422,
+            detail={
+                "status": 422,
+                "code": "invalid_callback_url",
+                "message": "callback_url is not allowed",
+                "details": str(e),
+            },
+        ) from e
+
+
+def sign(body: bytes, timestamp: str, secret: str) -> str:
+    """Return the ``X-Webhook-Signature`` value for a delivery."""
+    message = timestamp.encode() + b"." + body
+    return "sha256=" + hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Surface redirects as errors so deliveries cannot be steered elsewhere."""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+_opener = urllib.request.build_opener(_NoRedirect)
+
+
+def _post(url: str, body: bytes, headers: dict[str, str], timeout: float) -> int:
+    try:
+        # Checked again on delivery, since DNS may have changed since submission
+        resolve_url(url)
+    except UnsafeURLError as e:
+        raise WebhookDeliveryError(str(e), False) from e
+    request = urllib.request.Request(url, data=body, headers=headers, method="POST")
+    try:
+        with _opener.open(request, timeout=timeout) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        # 429 and server errors are transient; other client errors are final
+        retryable = e.code == 429 or e.code >= 500
+        raise WebhookDeliveryError(f"HTTP {e.code}", retryable) from e
+    except (urllib.error.URLError, OSError) as e:
+        raise WebhookDeliveryError(str(e), True) from e
+
+
+class WebhookDispatcher:
+    """
+    Deliver webhooks from a bounded in-memory queue.
+
+    ``submit`` never waits: when the queue is full the delivery is dropped and
+    counted, so a slow receiver cannot stall render workers. A few delivery
+    tasks POST payloads in threads and retry transient failures with jittered
+    exponential backoff.
+    """
+
+    def __init__(self) -> None:
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: list[asyncio.Task] = []
+
+    @property
+    def backlog(self) -> int:
+        """Deliveries queued but not yet taken by a delivery task."""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue(maxsize=settings.WEBHOOK_QUEUE_SIZE)
+        self._tasks = [
+            asyncio.create_task(self._worker())
+            for _ in range(settings.WEBHOOK_WORKERS)
+        ]
+
+    async def stop(self, drain_timeout: float = 5.0) -> None:
+        """Give queued deliveries a moment to finish, then cancel the workers."""
+        if self._queue is None:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                "Dropping %d undelivered webhooks on shutdown", self._queue.qsize()
+            )
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    def submit(
+        self, url: str, payload: WebhookPayload, traceparent: Optional[str] = None
+    ) -> bool:
+        """Queue a delivery without blocking; return False if it was dropped."""
+        if self._queue is None:
+            logger.warning("Webhook dispatcher not running; dropping %s", payload.job_id)
+            metrics.inc("webhook_dropped_total")
+            return False
+        try:
+            self._queue.put_nowait((url, payload, traceparent))
+        except asyncio.QueueFull:
+            logger.warning("Webhook queue full; dropping %s", payload.job_id)
+            metrics.inc("webhook_dropped_total")
+            return False
+        return True
+
+    def notify(self, job: RenderJob, result: JobStatusResponse) -> None:
+        """Queue the completion webhook for a finished job, if it asked for one."""
+        if job.request.callback_url is not None:
+            self.submit(
+                job.request.callback_url, build_payload(job, result), job.traceparent
+            )
+
+    async def deliver(
+        self, url: str, payload: WebhookPayload, traceparent: Optional[str] = None
+    ) -> bool:
+        """
+        POST one payload, retrying transient failures with backoff.
+
+        Deliveries run in a ``webhook.deliver`` span continuing the trace of
+        the request that submitted the job (``traceparent``), which receivers
+        get in the ``traceparent`` header.
+        """
+        if not settings.WEBHOOK_SECRET:
+            # Never send a delivery the receiver cannot authenticate
+            logger.error("WEBHOOK_SECRET is not set; not delivering %s", payload.job_id)
+            metrics.inc("webhook_deliveries_total", outcome="failed")
+            return False
+        with tracer.start_span(
+            "webhook.deliver",
+            kind="client",
+            attributes={"job.id": payload.job_id},
+            parent=parse_traceparent(traceparent),
+        ):
+            return await self._deliver(url, payload)
+
+    async def _deliver(self, url: str, payload: WebhookPayload) -> bool:
+        body = payload.model_dump_json().encode()
+        for attempt in range(1, settings.WEBHOOK_MAX_ATTEMPTS + 1):
+            timestamp = str(int(time.time()))
+            headers = {
+                "Content-Type": "application/json",
+                "User-Agent": USER_AGENT,
+                "X-Webhook-Id": payload.job_id,
+                "X-Webhook-Event": payload.event,
+                "X-Webhook-Timestamp": timestamp,
+                "traceparent": tracer.current_traceparent(),
+            }
+            headers["X-Webhook-Signature"] = sign(body, timestamp, settings.WEBHOOK_SECRET)
+            try:
+                await asyncio.to_thread(
+                    _post, url, body, headers, settings.WEBHOOK_TIMEOUT_SECONDS
+                )
+            except WebhookDeliveryError as e:
+                if not e.retryable or attempt == settings.WEBHOOK_MAX_ATTEMPTS:
+                    logger.error(
+                        "Webhook for %s failed after %d attempts: %s",
+                        payload.job_id, attempt, e,
+                    )
+                    metrics.inc("webhook_deliveries_total", outcome="failed")
+                    return False
+                delay = settings.WEBHOOK_BACKOFF_SECONDS * 2 ** (attempt - 1)
+                await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+            else:
+                metrics.inc("webhook_deliveries_total", outcome="delivered")
+                return True
+        return False
+
+    async def _worker(self) -> None:
+        while True:
+            url, payload, traceparent = await self._queue.get()
+            try:
+                await self.deliver(url, payload, traceparent)
+            except Exception:
+                logger.exception("Unexpected webhook delivery error")
+            finally:
+                self._queue.task_done()
+
+
+webhooks = WebhookDispatcher()
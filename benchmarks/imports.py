@@ -0,0 +1,91 @@
+"""Measure import time of the app package and guard against regressions.
+
+Imports each module in a fresh interpreter ``--repeat`` times and reports
+the best and median wall time, together with any of the render libraries
+(WeasyPrint, Pygments, pypdf) that the import pulled in. The HTTP front end
+and the request models must not load them; renders import them on first use
+or, in render workers, at startup.
+
+Usage:
+    python -m benchmarks.imports [--modules app.models,app.main] [--repeat 5]
+        [--budget-ms app.models=250,app.main=600]
+
+The exit status is 1 when a module loads a render library or its best time
+exceeds its budget. Budgets depend on the machine, so compare against a run
+of the previous release on the same host.
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+
+# Libraries that only the render path may import
+HEAVY_MODULES = ("weasyprint", "pygments", "pypdf")
+
+PROBE = """
+import sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+heavy = sorted(name for name in {heavy!r} if name in sys.modules)
+print(__import__("json").dumps({{"seconds": elapsed, "heavy": heavy}}))
+"""
+
+
+def measure(module: str) -> dict:
+    """Import ``module`` in a new interpreter and return its import time."""
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        cwd=BASE_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def parse_budgets(value: str) -> dict[str, float]:
+    budgets = {}
+    for item in filter(None, value.split(",")):
+        module, _, milliseconds = item.partition("=")
+        budgets[module.strip()] = float(milliseconds)
+    return budgets
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modules", default="app.models,app.main")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--budget-ms", type=parse_budgets, default={},
+        help="Comma-separated module=milliseconds limits on the best import time",
+    )
+    args = parser.parse_args()
+
+    failed = False
+    report = []
+    print(f"{'module':<16}{'best ms':>10}{'median ms':>11}  render libraries")
+    for module in filter(None, args.modules.split(",")):
+        runs = [measure(module) for _ in range(max(1, args.repeat))]
+        times = [run["seconds"] * 1000 for run in runs]
+        heavy = sorted({name for run in runs for name in run["heavy"]})
+        best, median = min(times), statistics.median(times)
+        budget = args.budget_ms.get(module)
+        failed |= bool(heavy) or (budget is not None and best > budget)
+        print(f"{module:<16}{best:>10.1f}{median:>11.1f}  {', '.join(heavy) or '-'}")
+        report.append({
+            "module": module, "best_ms": best, "median_ms": median,
+            "budget_ms": budget, "heavy": heavy,
+        })
+    print(json.dumps(report))
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
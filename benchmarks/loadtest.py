@@ -0,0 +1,313 @@
+"""Load test the API across ``WORKERS`` and ``UVICORN_CONCURRENCY`` settings.
+
+Starts the app under uvicorn for every combination of ``--workers`` and
+``--concurrency``, then replays the JSONL corpus of ``CreatePDFRequest``
+records as an open-loop Poisson arrival process at each ``--rates`` value,
+mixing ``POST /`` renders with ``GET /downloads/{filename}`` fetches of
+documents created earlier in the run. For every configuration it prints
+offered rate against achieved throughput, error rate and latency
+percentiles, and the saturation point: the highest rate that was sustained
+without exceeding ``--max-error-rate`` or ``--max-p95``.
+
+Usage:
+    python -m benchmarks.loadtest [--workers 1,2,4] [--concurrency 8,32,64]
+        [--rates 1,2,4,8,16] [--duration 30] [--download-ratio 0.5]
+
+The app runs from this checkout with its downloads, index and templates in
+a temporary directory. Requires ``httpx`` (listed in requirements-test.txt).
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+API_KEY = "loadtest"
+
+
+@dataclass
+class Sample:
+    kind: str
+    status: int
+    seconds: float
+
+
+@dataclass
+class RateResult:
+    rate: float
+    duration: float
+    samples: list[Sample] = field(default_factory=list)
+
+    def summary(self) -> dict:
+        ok = [s.seconds for s in self.samples if 200 <= s.status < 300]
+        total = len(self.samples)
+        return {
+            "offered_rps": self.rate,
+            "requests": total,
+            "throughput_rps": len(ok) / self.duration,
+            "error_rate": (total - len(ok)) / total if total else 0.0,
+            "p50": percentile(ok, 50),
+            "p95": percentile(ok, 95),
+            "p99": percentile(ok, 99),
+            "renders": sum(1 for s in self.samples if s.kind == "render"),
+            "downloads": sum(1 for s in self.samples if s.kind == "download"),
+        }
+
+
+def percentile(values: list[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile, or None without samples."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def saturation_point(
+    rows: list[dict], max_error_rate: float, max_p95: float, min_efficiency: float
+) -> Optional[float]:
+    """
+    Return the highest offered rate sustained before the first overloaded one.
+
+    A rate is overloaded when errors exceed ``max_error_rate``, the p95
+    latency exceeds ``max_p95`` seconds, or achieved throughput falls below
+    ``min_efficiency`` of the offered rate.
+    """
+    sustained = None
+    for row in sorted(rows, key=lambda row: row["offered_rps"]):
+        if (
+            row["error_rate"] > max_error_rate
+            or row["p95"] is None
+            or row["p95"] > max_p95
+            or row["throughput_rps"] < row["offered_rps"] * min_efficiency
+        ):
+            break
+        sustained = row["offered_rps"]
+    return sustained
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class Server:
+    """A uvicorn process serving this checkout with isolated storage."""
+
+    def __init__(self, workers: int, concurrency: int, data_dir: Path) -> None:
+        self.port = _free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        env = {
+            **os.environ,
+            "API_KEY": API_KEY,
+            "BASE_URL": "",
+            "DOWNLOADS_DIR": str(data_dir),
+            "TEMPLATES_DIR": str(data_dir / ".templates"),
+            "STAMPS_DIR": str(data_dir / ".stamps"),
+            "SECTIONS_DIR": str(data_dir / ".sections"),
+            "IMAGES_DIR": str(data_dir / ".images"),
+            "INDEX_PATH": str(data_dir / ".index" / "documents.sqlite3"),
+            "IDEMPOTENCY_PATH": str(data_dir / ".index" / "idempotency.sqlite3"),
+            "TRACE_FILE_PATH": str(data_dir / ".traces" / "spans.jsonl"),
+        }
+        self.process = subprocess.Popen(
+            [
+                sys.executable, "-m", "uvicorn", "app.main:app",
+                "--host", "127.0.0.1",
+                "--port", str(self.port),
+                "--workers", str(workers),
+                "--limit-concurrency", str(concurrency),
+                "--log-level", "warning",
+            ],
+            cwd=BASE_DIR,
+            env=env,
+        )
+
+    async def wait_ready(self, client, timeout: float = 60.0) -> None:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with {self.process.returncode}")
+            try:
+                await client.get(f"{self.base_url}/metrics")
+                return
+            except Exception:
+                await asyncio.sleep(0.2)
+        raise RuntimeError("uvicorn did not become ready")
+
+    def stop(self) -> None:
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+
+async def _render(client, server: Server, body: dict, downloads: list[str]) -> Sample:
+    start = time.perf_counter()
+    try:
+        response = await client.post(
+            f"{server.base_url}/", json=body, headers={"X-API-Key": API_KEY}
+        )
+        status = response.status_code
+        if status == 200:
+            downloads.append(response.json()["url"].rsplit("/", 1)[-1])
+    except Exception:
+        status = 0
+    return Sample("render", status, time.perf_counter() - start)
+
+
+async def _download(client, server: Server, filename: str) -> Sample:
+    start = time.perf_counter()
+    try:
+        response = await client.get(f"{server.base_url}/downloads/{filename}")
+        status = response.status_code
+    except Exception:
+        status = 0
+    return Sample("download", status, time.perf_counter() - start)
+
+
+async def drive(
+    client,
+    server: Server,
+    corpus: list[dict],
+    downloads: list[str],
+    rate: float,
+    duration: float,
+    download_ratio: float,
+    rng: random.Random,
+) -> RateResult:
+    """
+    Send requests with exponential inter-arrival times for ``duration`` seconds.
+
+    Arrivals do not wait for earlier responses, so queueing inside the server
+    shows up as latency instead of silently lowering the offered rate.
+    """
+    tasks = []
+    start = time.perf_counter()
+    next_at = 0.0
+    while True:
+        next_at += rng.expovariate(rate)
+        if next_at >= duration:
+            break
+        delay = start + next_at - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if downloads and rng.random() < download_ratio:
+            coro = _download(client, server, rng.choice(downloads))
+        else:
+            coro = _render(client, server, rng.choice(corpus), downloads)
+        tasks.append(asyncio.create_task(coro))
+    samples = await asyncio.gather(*tasks)
+    return RateResult(rate, duration, list(samples))
+
+
+async def run_configuration(args, corpus: list[dict], workers: int, concurrency: int):
+    import httpx
+
+    rng = random.Random(args.seed)
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=256)
+    with tempfile.TemporaryDirectory() as tmp:
+        server = Server(workers, concurrency, Path(tmp))
+        try:
+            async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+                await server.wait_ready(client)
+                downloads: list[str] = []
+                # Warm up workers and seed documents for the download mix
+                for body in corpus:
+                    await _render(client, server, body, downloads)
+                rows = []
+                for rate in args.rates:
+                    result = await drive(
+                        client, server, corpus, downloads, rate,
+                        args.duration, args.download_ratio, rng,
+                    )
+                    rows.append(result.summary())
+                    print(_format_row(workers, concurrency, rows[-1]), flush=True)
+        finally:
+            server.stop()
+    return rows
+
+
+def _ms(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value * 1000:.0f}"
+
+
+def _format_row(workers: int, concurrency: int, row: dict) -> str:
+    return (
+        f"{workers:>7}{concurrency:>12}{row['offered_rps']:>9.1f}"
+        f"{row['throughput_rps']:>9.2f}{row['error_rate'] * 100:>8.1f}"
+        f"{_ms(row['p50']):>8}{_ms(row['p95']):>8}{_ms(row['p99']):>8}"
+    )
+
+
+def _int_list(value: str) -> list[int]:
+    return [int(item) for item in value.split(",")]
+
+
+def _float_list(value: str) -> list[float]:
+    return [float(item) for item in value.split(",")]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--corpus", type=Path, default=Path(__file__).with_name("corpus.jsonl")
+    )
+    parser.add_argument("--workers", type=_int_list, default=[1, 2, 4])
+    parser.add_argument("--concurrency", type=_int_list, default=[8, 32, 64])
+    parser.add_argument("--rates", type=_float_list, default=[1, 2, 4, 8, 16])
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds per rate")
+    parser.add_argument("--download-ratio", type=float, default=0.5)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--max-p95", type=float, default=10.0, help="Seconds")
+    parser.add_argument("--min-efficiency", type=float, default=0.9)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    # Plain JSON: the load generator does not need the rendering stack
+    with args.corpus.open(encoding="utf-8") as lines:
+        corpus = [json.loads(line) for line in lines if line.strip()]
+    print(
+        f"{'workers':>7}{'concurrency':>12}{'offered':>9}{'rps':>9}{'err %':>8}"
+        f"{'p50 ms':>8}{'p95 ms':>8}{'p99 ms':>8}"
+    )
+    results = []
+    for workers in args.workers:
+        for concurrency in args.concurrency:
+            rows = asyncio.run(run_configuration(args, corpus, workers, concurrency))
+            results.append({
+                "workers": workers,
+                "concurrency": concurrency,
+                "saturation_rps": saturation_point(
+                    rows, args.max_error_rate, args.max_p95, args.min_efficiency
+                ),
+                "rates": rows,
+            })
+
+    print()
+    print(f"{'workers':>7}{'concurrency':>12}{'saturation rps':>16}")
+    for result in results:
+        saturation = result["saturation_rps"]
+        print(
+            f"{result['workers']:>7}{result['concurrency']:>12}"
+            f"{'-' if saturation is None else f'{saturation:.1f}':>16}"
+        )
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
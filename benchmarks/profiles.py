@@ -0,0 +1,118 @@
+"""Benchmark output size and render time of each PDF optimization profile.
+
+Renders every document of a JSONL corpus of ``CreatePDFRequest`` records
+with WeasyPrint defaults and with each entry of ``OPTIMIZATION_PROFILES``,
+then prints the total size and mean render time per profile.
+
+Usage:
+    python -m benchmarks.profiles [--corpus benchmarks/corpus.jsonl] [--repeat 3]
+
+A synthetic document embedding a large photo-like image is added to the
+corpus unless ``--no-images`` is given, since image handling is where the
+profiles differ the most.
+"""
+
+import argparse
+import asyncio
+import base64
+import io
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from app.dependencies import OPTIMIZATION_PROFILES, generate_pdf  # noqa: E402
+from app.models import CreatePDFRequest  # noqa: E402
+
+
+def load_corpus(path: Path) -> list[CreatePDFRequest]:
+    with path.open(encoding="utf-8") as corpus:
+        return [
+            CreatePDFRequest.model_validate_json(line)
+            for line in corpus
+            if line.strip()
+        ]
+
+
+def image_document(width: int = 3000, height: int = 2000) -> CreatePDFRequest:
+    """Return a request embedding a large, noisy JPEG as a data: URI."""
+    from PIL import Image
+
+    image = Image.effect_noise((width, height), 64).convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=95)
+    data = base64.b64encode(buffer.getvalue()).decode()
+    return CreatePDFRequest(
+        pdf_title="Photo Report",
+        body_content=(
+            f'<p>Site survey</p><img src="data:image/jpeg;base64,{data}" '
+            'style="width:100%">'
+        ),
+    )
+
+
+async def render(request: CreatePDFRequest, output: Path, profile) -> float:
+    start = time.perf_counter()
+    await generate_pdf(
+        pdf_title=request.pdf_title,
+        body_content=request.body_content,
+        css_content=request.css_content,
+        output_path=output,
+        contains_code=request.contains_code,
+        optimization_profile=profile,
+    )
+    return time.perf_counter() - start
+
+
+async def run(corpus: list[CreatePDFRequest], repeat: int) -> list[dict]:
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for profile in [None, *OPTIMIZATION_PROFILES]:
+            timings, total_bytes = [], 0
+            for index, request in enumerate(corpus):
+                output = Path(tmp) / f"{profile or 'default'}-{index}.pdf"
+                for _ in range(repeat):
+                    timings.append(await render(request, output, profile))
+                total_bytes += output.stat().st_size
+            results.append({
+                "profile": profile or "default",
+                "total_bytes": total_bytes,
+                "mean_seconds": statistics.mean(timings),
+            })
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--corpus", type=Path, default=Path(__file__).with_name("corpus.jsonl")
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-images", action="store_true")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    if not args.no_images:
+        corpus.append(image_document())
+
+    results = asyncio.run(run(corpus, args.repeat))
+    baseline = results[0]
+    print(f"{'profile':<10}{'bytes':>14}{'size':>9}{'mean s':>10}{'time':>9}")
+    for row in results:
+        size_ratio = row["total_bytes"] / baseline["total_bytes"]
+        time_ratio = row["mean_seconds"] / baseline["mean_seconds"]
+        print(
+            f"{row['profile']:<10}{row['total_bytes']:>14,}{size_ratio:>9.2f}"
+            f"{row['mean_seconds']:>10.3f}{time_ratio:>9.2f}"
+        )
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""Soak-test real renders and fail on memory growth per render.
+
+Runs thousands of ``generate_pdf`` renders in one long-lived process, the
+way a uvicorn worker does, cycling through a varied corpus: the JSONL
+corpus, code highlighting, large tables, embedded images and every
+optimization profile. After ``--warmup`` renders have filled caches and
+pools, it samples resident memory and a ``tracemalloc`` snapshot every
+``--sample-every`` renders. It reports growth per render, estimated by a
+least-squares fit over the samples, and the source lines whose
+allocations grew the most since the first sample. The exit status is 1
+when RSS growth exceeds ``--budget-kb`` per render.
+
+Usage:
+    python -m benchmarks.soak [--renders 5000] [--warmup 100]
+        [--sample-every 250] [--budget-kb 4] [--concurrency 1] [--top 15]
+
+``tracemalloc`` slows rendering noticeably; ``--no-tracemalloc`` keeps
+only the RSS measurements for faster, longer runs.
+"""
+
+import argparse
+import asyncio
+import gc
+import itertools
+import json
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Optional
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+from app.config import settings  # noqa: E402
+from app.dependencies import OPTIMIZATION_PROFILES, generate_pdf  # noqa: E402
+from app.models import CreatePDFRequest  # noqa: E402
+from benchmarks.profiles import image_document, load_corpus  # noqa: E402
+from benchmarks.tables import table_body  # noqa: E402
+
+CODE_SAMPLE = (
+    '<pre><code class="language-python">def total(items):\n'
+    "    return sum(item.price * item.quantity for item in items)\n"
+    "</code></pre>"
+    '<pre><code class="language-javascript">const xs = [1, 2, 3].map(x => x * 2);'
+    "</code></pre>"
+)
+
+
+def varied_corpus(path: Path) -> list[CreatePDFRequest]:
+    """Return the JSONL corpus plus documents exercising other render paths."""
+    corpus = load_corpus(path)
+    corpus.append(CreatePDFRequest(
+        pdf_title="Code Listing", body_content=CODE_SAMPLE, contains_code=True
+    ))
+    corpus.append(CreatePDFRequest(pdf_title="Inventory", body_content=table_body(400)))
+    corpus.append(image_document(1600, 1200))
+    return corpus
+
+
+def rss_kb() -> int:
+    """Current resident set size in kilobytes."""
+    try:
+        for line in Path("/proc/self/status").read_text().splitlines():
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    except OSError:
+        pass
+    # Peak rather than current RSS, but it still shows sustained growth
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def growth_per_render(points: list[tuple[int, float]]) -> Optional[float]:
+    """Least-squares slope of memory against renders completed."""
+    if len(points) < 2:
+        return None
+    renders, values = zip(*points)
+    return statistics.linear_regression(renders, values).slope
+
+
+class Sampler:
+    """Record RSS and traced memory, keeping the first snapshot as baseline."""
+
+    def __init__(self, trace: bool, frames: int) -> None:
+        self.trace = trace
+        self.frames = frames
+        self.samples: list[dict] = []
+        self.baseline: Optional[tracemalloc.Snapshot] = None
+        self.latest: Optional[tracemalloc.Snapshot] = None
+
+    def start(self) -> None:
+        if self.trace:
+            tracemalloc.start(self.frames)
+
+    def sample(self, renders: int, elapsed: float) -> dict:
+        gc.collect()
+        row = {"renders": renders, "seconds": elapsed, "rss_kb": rss_kb()}
+        if self.trace:
+            snapshot = tracemalloc.take_snapshot().filter_traces([
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+            ])
+            row["traced_kb"] = sum(stat.size for stat in snapshot.statistics("filename")) / 1024
+            if self.baseline is None:
+                self.baseline = snapshot
+            self.latest = snapshot
+        self.samples.append(row)
+        return row
+
+    def top_sites(self, limit: int) -> list[dict]:
+        if self.baseline is None or self.latest is None:
+            return []
+        stats = self.latest.compare_to(self.baseline, "lineno")
+        return [
+            {
+                "site": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                "growth_kb": stat.size_diff / 1024,
+                "count_diff": stat.count_diff,
+            }
+            for stat in stats[:limit]
+            if stat.size_diff > 0
+        ]
+
+
+async def soak(
+    corpus: list[CreatePDFRequest],
+    renders: int,
+    warmup: int,
+    sample_every: int,
+    concurrency: int,
+    sampler: Sampler,
+    output_dir: Path,
+) -> None:
+    profiles = [None, *OPTIMIZATION_PROFILES]
+    jobs = itertools.cycle(itertools.product(corpus, profiles))
+    rng = random.Random(0)
+    completed = 0
+    started = time.perf_counter()
+
+    async def render_one(slot: int) -> None:
+        nonlocal completed
+        request, profile = next(jobs)
+        output = output_dir / f"soak-{slot}.pdf"
+        await generate_pdf(
+            # Varying titles defeats caching keyed on the full document
+            pdf_title=f"{request.pdf_title} {rng.randrange(10 ** 6)}",
+            body_content=request.body_content,
+            css_content=request.css_content,
+            output_path=output,
+            contains_code=request.contains_code,
+            optimization_profile=profile,
+        )
+        output.unlink(missing_ok=True)
+        completed += 1
+
+    async def worker(slot: int) -> None:
+        while completed < warmup + renders:
+            await render_one(slot)
+            measured = completed - warmup
+            if measured == 0:
+                sampler.start()
+            if measured >= 0 and measured % sample_every == 0:
+                row = sampler.sample(measured, time.perf_counter() - started)
+                traced = f"{row['traced_kb'] / 1024:>10.1f}" if "traced_kb" in row else f"{'-':>10}"
+                print(
+                    f"{row['renders']:>8}{row['seconds']:>10.0f}"
+                    f"{row['rss_kb'] / 1024:>10.1f}{traced}",
+                    flush=True,
+                )
+
+    print(f"{'renders':>8}{'seconds':>10}{'RSS MB':>10}{'traced MB':>10}")
+    await asyncio.gather(*(worker(slot) for slot in range(concurrency)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--corpus", type=Path, default=Path(__file__).with_name("corpus.jsonl")
+    )
+    parser.add_argument("--renders", type=int, default=5000)
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument("--sample-every", type=int, default=250)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument(
+        "--budget-kb", type=float, default=4.0,
+        help="Largest acceptable RSS growth per render, in kilobytes",
+    )
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--frames", type=int, default=1)
+    parser.add_argument("--no-tracemalloc", action="store_true")
+    args = parser.parse_args()
+
+    sampler = Sampler(trace=not args.no_tracemalloc, frames=args.frames)
+    with tempfile.TemporaryDirectory() as tmp:
+        # Keep image and stamp caches out of the real downloads volume
+        settings.IMAGES_DIR = str(Path(tmp) / ".images")
+        settings.DOWNLOADS_DIR = tmp
+        asyncio.run(soak(
+            varied_corpus(args.corpus),
+            args.renders,
+            args.warmup,
+            max(1, args.sample_every),
+            max(1, args.concurrency),
+            sampler,
+            Path(tmp),
+        ))
+
+    rss_growth = growth_per_render([(s["renders"], s["rss_kb"]) for s in sampler.samples])
+    traced_growth = growth_per_render(
+        [(s["renders"], s["traced_kb"]) for s in sampler.samples if "traced_kb" in s]
+    )
+    sites = sampler.top_sites(args.top)
+    if sites:
+        print(f"\n{'growth KB':>10}{'blocks':>9}  site")
+        for site in sites:
+            print(f"{site['growth_kb']:>10.1f}{site['count_diff']:>9}  {site['site']}")
+    print()
+    if rss_growth is not None:
+        print(f"RSS growth: {rss_growth:.2f} KB/render (budget {args.budget_kb} KB)")
+    if traced_growth is not None:
+        print(f"Python heap growth: {traced_growth:.2f} KB/render")
+    print(json.dumps({
+        "samples": sampler.samples,
+        "rss_kb_per_render": rss_growth,
+        "traced_kb_per_render": traced_growth,
+        "top_sites": sites,
+    }))
+    if rss_growth is None:
+        sys.exit("Not enough samples; raise --renders or lower --sample-every")
+    if rss_growth > args.budget_kb:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Benchmark render time and peak memory of very large tables with chunking.
+
+Renders a synthetic inventory table at each row count with table chunking
+disabled and with ``TABLE_CHUNK_ROWS`` set to ``--chunk-rows``, each run in
+a fresh process so peak resident memory is measured per render.
+
+Usage:
+    python -m benchmarks.tables [--rows 1000,5000,20000] [--chunk-rows 200]
+"""
+
+import argparse
+import asyncio
+import json
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+if str(BASE_DIR) not in sys.path:
+    sys.path.insert(0, str(BASE_DIR))
+
+
+def table_body(rows: int) -> str:
+    """Return an inventory table styled by the default table CSS."""
+    body = "".join(
+        f"<tr><td>SKU-{i:06d}</td><td>Item {i}</td><td>{i % 97}</td>"
+        f"<td>${i * 1.25:,.2f}</td></tr>"
+        for i in range(rows)
+    )
+    return (
+        "<table><thead><tr><th>SKU</th><th>Item</th><th>Qty</th><th>Price</th>"
+        f"</tr></thead><tbody>{body}</tbody></table>"
+    )
+
+
+def measure(rows: int, chunk_rows: int) -> dict:
+    """Render one table in this process; return seconds, pages and peak RSS."""
+    from app.config import settings
+    from app.dependencies import generate_pdf
+
+    settings.TABLE_CHUNK_ROWS = chunk_rows
+    body = table_body(rows)
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        pages = asyncio.run(generate_pdf(
+            pdf_title="Inventory",
+            body_content=body,
+            css_content=None,
+            output_path=Path(tmp) / "table.pdf",
+            contains_code=False,
+        ))
+        seconds = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "rows": rows,
+        "chunk_rows": chunk_rows,
+        "pages": pages,
+        "seconds": seconds,
+        # ru_maxrss is in kilobytes on Linux
+        "peak_mb": peak / 1024,
+        "render_mb": (peak - baseline) / 1024,
+    }
+
+
+def run_isolated(rows: int, chunk_rows: int) -> dict:
+    with ProcessPoolExecutor(max_workers=1, max_tasks_per_child=1) as executor:
+        return executor.submit(measure, rows, chunk_rows).result()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--rows", type=lambda value: [int(n) for n in value.split(",")],
+        default=[1000, 5000, 20000],
+    )
+    parser.add_argument("--chunk-rows", type=int, default=200)
+    args = parser.parse_args()
+
+    results = []
+    print(
+        f"{'rows':>8}{'chunk':>8}{'pages':>7}{'seconds':>10}{'time':>7}"
+        f"{'peak MB':>10}{'mem':>7}"
+    )
+    for rows in args.rows:
+        baseline = run_isolated(rows, 0)
+        chunked = run_isolated(rows, args.chunk_rows)
+        for row in (baseline, chunked):
+            print(
+                f"{row['rows']:>8}{row['chunk_rows'] or '-':>8}{row['pages']:>7}"
+                f"{row['seconds']:>10.2f}{row['seconds'] / baseline['seconds']:>7.2f}"
+                f"{row['peak_mb']:>10.0f}{row['peak_mb'] / baseline['peak_mb']:>7.2f}"
+            )
+        results.extend([baseline, chunked])
+    print(json.dumps(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,8 @@ import sys
 import types
 from pathlib import Path
 
+import pytest
+
 BASE_DIR = Path(__file__).resolve().parents[1]
 if str(BASE_DIR) not in sys.path:
     sys.path.insert(0, str(BASE_DIR))
@@ -14,12 +16,59 @@ class HTML:
     def __init__(self, string):
         self.string = string
 
-    def write_pdf(self, target):
+    pages = [None]
+
+    def render(self, **options):
+        return self
+
+    def write_pdf(self, target, **options):
         Path(target).write_bytes(b"")
 
 
+class CSS:
+    def __init__(self, string=None, font_config=None):
+        self.string = string
+        self.font_config = font_config
+
+
+class FontConfiguration:
+    pass
+
+
 weasyprint_stub.HTML = HTML
+weasyprint_stub.CSS = CSS
+
+fonts_stub = types.ModuleType("weasyprint.text.fonts")
+fonts_stub.FontConfiguration = FontConfiguration
 
 sys.modules.setdefault("weasyprint", weasyprint_stub)
+sys.modules.setdefault("weasyprint.text", types.ModuleType("weasyprint.text"))
+sys.modules.setdefault("weasyprint.text.fonts", fonts_stub)
 
 os.environ.setdefault("ROOT_PATH", "")
+
+
+@pytest.fixture(autouse=True)
+def isolated_index(monkeypatch, tmp_path_factory):
+    import app.config as config
+
+    index_dir = tmp_path_factory.mktemp("index")
+    monkeypatch.setattr(config.settings, "INDEX_PATH", str(index_dir / "documents.sqlite3"))
+
+
+@pytest.fixture(autouse=True)
+def isolated_render_queue():
+    import app.queue as queue_module
+
+    queue_module.reset_render_queue()
+    yield
+    queue_module.reset_render_queue()
+
+
+@pytest.fixture(autouse=True)
+def isolated_highlighting():
+    import app.dependencies as deps
+
+    for cached in (deps._formatter, deps._pygments_css, deps._highlight_block):
+        cached.cache_clear()
+    yield
@@ -0,0 +1,116 @@
+import gzip
+import json
+from pathlib import Path
+
+import brotli
+import pytest
+import zstandard
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+import app.config as config
+import app.jobs as jobs_module
+from app.compression import decompress_body
+from app.main import app
+
+PAYLOAD = {
+    "pdf_title": "Example PDF",
+    "body_content": "<p>Hello World</p>" * 200,
+}
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setattr(config.settings, "API_KEY", "secret")
+
+    async def fake_generate_pdf(output_path, **kwargs):
+        Path(output_path).write_bytes(b"PDF")
+
+    monkeypatch.setattr(config.settings, "DOWNLOADS_DIR", str(tmp_path))
+    monkeypatch.setattr(jobs_module, "generate_pdf", fake_generate_pdf)
+    return TestClient(app)
+
+
+@pytest.mark.parametrize(
+    "encoding, compress",
+    [
+        ("gzip", gzip.compress),
+        ("br", brotli.compress),
+        ("zstd", lambda data: zstandard.ZstdCompressor().compress(data)),
+    ],
+)
+def test_create_pdf_accepts_compressed_body(client, encoding, compress):
+    response = client.post(
+        "/",
+        content=compress(json.dumps(PAYLOAD).encode()),
+        headers={
+            "X-API-Key": "secret",
+            "Content-Type": "application/json",
+            "Content-Encoding": encoding,
+        },
+    )
+    assert response.status_code == 200
+    assert response.json()["results"].startswith("PDF generation is complete")
+
+
+def test_create_pdf_rejects_oversized_body(client, monkeypatch):
+    monkeypatch.setattr(config.settings, "MAX_DECOMPRESSED_BODY_BYTES", 100)
+    response = client.post(
+        "/",
+        content=gzip.compress(json.dumps(PAYLOAD).encode()),
+        headers={
+            "X-API-Key": "secret",
+            "Content-Type": "application/json",
+            "Content-Encoding": "gzip",
+        },
+    )
+    assert response.status_code == 413
+    assert response.json()["code"] == "payload_too_large"
+
+
+def test_create_pdf_rejects_unknown_encoding(client):
+    response = client.post(
+        "/",
+        content=json.dumps(PAYLOAD).encode(),
+        headers={
+            "X-API-Key": "secret",
+            "Content-Type": "application/json",
+            "Content-Encoding": "compress",
+        },
+    )
+    assert response.status_code == 415
+    assert response.json()["code"] == "unsupported_content_encoding"
+
+
+def test_invalid_json_is_validation_error(client):
+    response = client.post(
+        "/",
+        content=b"{not json",
+        headers={"X-API-Key": "secret", "Content-Type": "application/json"},
+    )
+    assert response.status_code == 422
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "br"])
+def test_large_json_responses_are_compressed(client, encoding):
+    response = client.get("/openapi.json", headers={"Accept-Encoding": encoding})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == encoding
+    assert response.json()["openapi"] == "3.1.0"
+
+
+def test_small_json_responses_are_not_compressed(client):
+    response = client.post(
+        "/",
+        json={"pdf_title": "x"},
+        headers={"X-API-Key": "bad", "Accept-Encoding": "gzip"},
+    )
+    assert response.status_code == 403
+    assert "content-encoding" not in response.headers
+
+
+def test_decompress_body_rejects_corrupt_data():
+    with pytest.raises(HTTPException) as exc:
+        decompress_body(b"not gzip", "gzip", 1000)
+    assert exc.value.status_code == 400
+    assert exc.value.detail["code"] == "invalid_content_encoding"
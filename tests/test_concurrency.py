@@ -0,0 +1,155 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+import app.concurrency as concurrency
+import app.config as config
+import app.queue as queue_module
+from app.concurrency import AdaptiveLimiter, get_render_limiter
+from app.dependencies import generate_pdf
+from app.metrics import metrics
+
+
+@pytest.fixture(autouse=True)
+def fresh_limiter():
+    concurrency.reset_render_limiter()
+    yield
+    concurrency.reset_render_limiter()
+
+
+def limiter(**overrides):
+    options = {"minimum": 1, "maximum": 8, "initial": 4, "memory_probe": lambda: 0.5}
+    options.update(overrides)
+    return AdaptiveLimiter(**options)
+
+
+def feed(target, seconds_per_page, count=None):
+    """Record finished renders with the given latency per page."""
+    for _ in range(count or max(3, target.limit)):
+        target.inflight += 1
+        target._release(seconds_per_page)
+
+
+def test_limit_is_clamped_between_floor_and_ceiling():
+    assert limiter(initial=20).limit == 8
+    assert limiter(initial=0).limit == 1
+    assert limiter(minimum=0, maximum=0).limit == 1
+
+
+def test_latency_rise_cuts_the_limit_multiplicatively():
+    target = limiter()
+    feed(target, 0.1)
+    assert target.limit == 4 and target.baseline == pytest.approx(0.1)
+    feed(target, 0.5)
+    assert target.limit == 3
+    assert metrics.get(
+        "render_concurrency_decisions_total", decision="decrease", reason="latency"
+    ) >= 1
+    assert metrics.get("render_concurrency_limit") == 3
+
+
+def test_memory_pressure_cuts_the_limit_down_to_the_floor():
+    target = limiter(initial=2, memory_probe=lambda: 0.01)
+    for _ in range(5):
+        feed(target, 0.1)
+    assert target.limit == 1
+
+
+def test_queueing_raises_the_limit_up_to_the_ceiling():
+    target = limiter(maximum=5)
+    for _ in range(4):
+        target._saturated = True
+        feed(target, 0.1)
+    assert target.limit == 5
+    assert metrics.get(
+        "render_concurrency_decisions_total", decision="increase", reason="queueing"
+    ) >= 1
+
+
+def test_steady_load_holds_the_limit():
+    target = limiter()
+    for _ in range(3):
+        feed(target, 0.1)
+    assert target.limit == 4
+
+
+def test_waiters_are_admitted_as_slots_free():
+    target = limiter(initial=2)
+    running, peak = 0, 0
+
+    async def render():
+        nonlocal running, peak
+        async with target.slot() as sample:
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            sample.pages = 1
+
+    async def scenario():
+        await asyncio.gather(*(render() for _ in range(6)))
+
+    asyncio.run(scenario())
+    assert peak == 2
+    assert target.inflight == 0
+
+
+def test_cancelled_waiter_does_not_leak_a_slot():
+    target = limiter(initial=1)
+
+    async def scenario():
+        await target.acquire()
+        waiter = asyncio.create_task(target.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        target._release(None)
+
+    asyncio.run(scenario())
+    assert target.inflight == 0 and not target._waiters
+
+
+def test_failed_render_frees_its_slot_without_a_sample():
+    target = limiter()
+
+    async def scenario():
+        async with target.slot():
+            raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(scenario())
+    assert target.inflight == 0 and target._samples == []
+
+
+def test_limiter_is_disabled_without_a_ceiling(monkeypatch):
+    monkeypatch.setattr(config.settings, "RENDER_CONCURRENCY_MAX", 0)
+    assert get_render_limiter() is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("ceiling, capacity", [(0, 2), (6, 6)])
+async def test_queue_admits_renders_up_to_the_ceiling(monkeypatch, ceiling, capacity):
+    monkeypatch.setattr(config.settings, "RENDER_CONCURRENCY", 2)
+    monkeypatch.setattr(config.settings, "RENDER_CONCURRENCY_MAX", ceiling)
+    stats = await queue_module.get_render_queue().stats()
+    # Otherwise the scheduler would stop the limit from growing past 2
+    assert stats.capacity == capacity
+
+
+@pytest.mark.asyncio
+async def test_generate_pdf_renders_through_the_limiter(monkeypatch, tmp_path):
+    monkeypatch.setattr(config.settings, "RENDER_CONCURRENCY_MAX", 2)
+    output = tmp_path / "limited.pdf"
+    pages = await generate_pdf(
+        pdf_title="Limited",
+        body_content="<p>x</p>",
+        css_content=None,
+        output_path=output,
+        contains_code=False,
+    )
+    assert pages == 1
+    assert Path(output).exists()
+    limiter = get_render_limiter()
+    assert limiter.inflight == 0 and len(limiter._samples) == 1
@@ -11,10 +11,15 @@ async def test_generate_pdf_success_extra_css(monkeypatch, tmp_path):
     captured = {}
 
     class DummyHTML:
+        pages = [None]
+
         def __init__(self, string):
             captured["string"] = string
 
-        def write_pdf(self, target):
+        def render(self, **options):
+            return self
+
+        def write_pdf(self, target, **options):
             Path(target).write_bytes(b"PDF")
 
     def fake_highlight(code, lexer, formatter):
@@ -35,7 +40,7 @@ async def test_generate_pdf_success_extra_css(monkeypatch, tmp_path):
 
     output = tmp_path / "out.pdf"
 
-    await deps.generate_pdf(
+    page_count = await deps.generate_pdf(
         pdf_title="Title",
         body_content="<p>Hello</p>",
         css_content="p{color:blue;}",
@@ -44,6 +49,7 @@ async def test_generate_pdf_success_extra_css(monkeypatch, tmp_path):
     )
 
     assert output.exists()
+    assert page_count == 1
     assert "p{color:blue;}" in captured["string"]
     assert "font-family" in captured["string"]
 
@@ -54,10 +60,15 @@ async def test_generate_pdf_highlights_code(monkeypatch, tmp_path):
     highlight_called = {}
 
     class DummyHTML:
+        pages = [None]
+
         def __init__(self, string):
             captured["string"] = string
 
-        def write_pdf(self, target):
+        def render(self, **options):
+            return self
+
+        def write_pdf(self, target, **options):
             Path(target).write_bytes(b"PDF")
 
     def fake_highlight(code, lexer, formatter):
@@ -99,7 +110,10 @@ async def test_generate_pdf_error(monkeypatch, tmp_path):
         def __init__(self, string):
             pass
 
-        def write_pdf(self, target):
+        def render(self, **options):
+            return self
+
+        def write_pdf(self, target, **options):
             raise ValueError("fail")
 
     monkeypatch.setattr(deps, "HTML", FailingHTML)
@@ -114,3 +128,35 @@ async def test_generate_pdf_error(monkeypatch, tmp_path):
         )
 
     assert exc.value.status_code == 500
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("profile", ["fast", "small", "print"])
+async def test_generate_pdf_optimization_profile(monkeypatch, tmp_path, profile):
+    captured = {}
+
+    class DummyHTML:
+        pages = [None]
+
+        def __init__(self, string):
+            pass
+
+        def render(self, **options):
+            return self
+
+        def write_pdf(self, target, **options):
+            captured["options"] = options
+            Path(target).write_bytes(b"PDF")
+
+    monkeypatch.setattr(deps, "HTML", DummyHTML)
+
+    await deps.generate_pdf(
+        pdf_title="Title",
+        body_content="<p>Hello</p>",
+        css_content=None,
+        output_path=tmp_path / "out.pdf",
+        contains_code=False,
+        optimization_profile=profile,
+    )
+
+    assert captured["options"] == deps.OPTIMIZATION_PROFILES[profile]
@@ -0,0 +1,131 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.config as config
+import app.jobs as jobs_module
+from app.main import app
+from app.metrics import metrics
+
+PAYLOAD = {"pdf_title": "Invoice", "body_content": "<p>Total: $10</p>"}
+
+
+@pytest.fixture
+def renders(monkeypatch, tmp_path):
+    monkeypatch.setattr(config.settings, "API_KEY", "secret")
+    monkeypatch.setattr(config.settings, "BASE_URL", "")
+    monkeypatch.setattr(config.settings, "DOWNLOADS_DIR", str(tmp_path))
+    monkeypatch.setattr(
+        config.settings, "IDEMPOTENCY_PATH", str(tmp_path / ".index" / "idem.sqlite3")
+    )
+    calls = []
+
+    async def fake_generate_pdf(output_path, **kwargs):
+        calls.append(output_path)
+        if kwargs["body_content"] == "<p>fail</p>":
+            raise OSError("disk full")
+        Path(output_path).write_bytes(b"PDF")
+        return 1
+
+    monkeypatch.setattr(jobs_module, "generate_pdf", fake_generate_pdf)
+    return calls
+
+
+def _post(client, payload, key, api_key="secret"):
+    return client.post(
+        "/",
+        json=payload,
+        headers={"X-API-Key": api_key, "Idempotency-Key": key},
+    )
+
+
+def test_retry_with_same_key_returns_original_result(renders):
+    metrics.reset()
+    client = TestClient(app)
+    first = _post(client, PAYLOAD, "call-1")
+    # Formatting differences do not change the fingerprint
+    retry = _post(client, {**PAYLOAD, "pdf_title": "  Invoice "}, "call-1")
+
+    assert first.status_code == retry.status_code == 200
+    assert retry.json() == first.json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert "Idempotent-Replayed" not in first.headers
+    assert len(renders) == 1
+    assert metrics.get("cache_requests_total", cache="idempotency", result="hit") == 1
+    assert metrics.get("cache_requests_total", cache="idempotency", result="miss") == 1
+    assert metrics.get("cache_requests_total", cache="render", result="hit") is None
+
+    assert _post(client, PAYLOAD, "call-2").json()["url"] != first.json()["url"]
+    assert len(renders) == 2
+
+
+def test_reused_key_with_different_body_is_rejected(renders):
+    client = TestClient(app)
+    assert _post(client, PAYLOAD, "call-1").status_code == 200
+
+    response = _post(client, {**PAYLOAD, "body_content": "<p>Other</p>"}, "call-1")
+    assert response.status_code == 422
+    assert response.json()["code"] == "idempotency_key_mismatch"
+    assert len(renders) == 1
+
+
+def test_failed_requests_can_be_retried_with_the_same_key(renders):
+    client = TestClient(app)
+    failing = {**PAYLOAD, "body_content": "<p>fail</p>"}
+    assert _post(client, failing, "call-1").status_code == 500
+    assert _post(client, failing, "call-1").status_code == 500
+    assert len(renders) == 2
+
+
+def test_keys_expire(renders, monkeypatch):
+    monkeypatch.setattr(config.settings, "IDEMPOTENCY_TTL_SECONDS", -1)
+    client = TestClient(app)
+    _post(client, PAYLOAD, "call-1")
+    _post(client, PAYLOAD, "call-1")
+    assert len(renders) == 2
+
+
+def test_concurrent_retry_gets_conflict(renders, monkeypatch):
+    started, finish = asyncio.Event(), asyncio.Event()
+
+    async def slow_generate_pdf(output_path, **kwargs):
+        started.set()
+        await finish.wait()
+        Path(output_path).write_bytes(b"PDF")
+        return 1
+
+    monkeypatch.setattr(jobs_module, "generate_pdf", slow_generate_pdf)
+
+    async def scenario():
+        import httpx
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            headers = {"X-API-Key": "secret", "Idempotency-Key": "call-1"}
+            original = asyncio.create_task(client.post("/", json=PAYLOAD, headers=headers))
+            await started.wait()
+            retry = await client.post("/", json=PAYLOAD, headers=headers)
+            finish.set()
+            return await original, retry
+
+    original, retry = asyncio.run(scenario())
+    assert original.status_code == 200
+    assert retry.status_code == 409
+    assert retry.json()["code"] == "idempotency_key_in_use"
+
+
+def test_keys_are_scoped_to_the_api_key(renders, monkeypatch):
+    from app.config import TenantSettings
+
+    monkeypatch.setattr(
+        config.settings,
+        "API_KEYS",
+        [TenantSettings(name="a", key="key-a"), TenantSettings(name="b", key="key-b")],
+    )
+    client = TestClient(app)
+    assert _post(client, PAYLOAD, "call-1", "key-a").status_code == 200
+    response = _post(client, {**PAYLOAD, "body_content": "<p>b</p>"}, "call-1", "key-b")
+    assert response.status_code == 200
+    assert len(renders) == 2
@@ -0,0 +1,35 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+
+PROBE = (
+    "import json, sys; import {module}; "
+    "print(json.dumps([name for name in ('weasyprint', 'pygments', 'pypdf') if name in sys.modules]))"
+)
+
+
+@pytest.mark.parametrize("module", ["app.models", "app.main", "app.render"])
+def test_import_does_not_load_render_libraries(module):
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE.format(module=module)],
+        cwd=BASE_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert json.loads(result.stdout.splitlines()[-1]) == []
+
+
+def test_render_libraries_load_on_first_use():
+    import app.dependencies as deps
+
+    deps.preload_renderer()
+    assert deps.HTML is sys.modules["weasyprint"].HTML
+    assert issubclass(deps.WeasyPrintError, Exception)
+    with pytest.raises(AttributeError):
+        deps.missing_attribute
@@ -0,0 +1,145 @@
+import os
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.config as config
+import app.index as index_module
+import app.main as main_module
+import app.jobs as jobs_module
+from app.dependencies import api_key_identity, cleanup_downloads_folder
+from app.main import app
+
+Path("/app/downloads").mkdir(parents=True, exist_ok=True)
+
+
+@pytest.mark.asyncio
+async def test_index_document_records_metadata(tmp_path):
+    pdf = tmp_path / "report.pdf"
+    pdf.write_bytes(b"%PDF-1.7 example")
+
+    record = await index_module.index_document(
+        pdf, "report.pdf", page_count=3, render_ms=12.5, api_key_id="abc"
+    )
+
+    assert record.size == len(b"%PDF-1.7 example")
+    assert record.page_count == 3
+    stored = index_module.get_document("report.pdf")
+    assert stored.sha256 == record.sha256
+    assert stored.api_key_id == "abc"
+
+
+@pytest.mark.asyncio
+async def test_index_document_failure_is_not_fatal(tmp_path):
+    record = await index_module.index_document(
+        tmp_path / "missing.pdf", "missing.pdf", None, None, None
+    )
+    assert record is None
+
+
+def test_create_pdf_indexes_document(monkeypatch, tmp_path):
+    monkeypatch.setattr(config.settings, "API_KEY", "secret")
+
+    async def fake_generate_pdf(output_path, **kwargs):
+        Path(output_path).write_bytes(b"PDF")
+        return 2
+
+    monkeypatch.setattr(config.settings, "DOWNLOADS_DIR", str(tmp_path))
+    monkeypatch.setattr(jobs_module, "generate_pdf", fake_generate_pdf)
+    client = TestClient(app)
+
+    response = client.post(
+        "/",
+        json={"pdf_title": "Example", "body_content": "<p>x</p>"},
+        headers={"X-API-Key": "secret"},
+    )
+    assert response.status_code == 200
+
+    listing = client.get("/documents", headers={"X-API-Key": "secret"}).json()
+    assert listing["total"] == 1
+    assert listing["total_bytes"] == 3
+    item = listing["items"][0]
+    assert response.json()["url"].endswith(item["filename"])
+    assert item["page_count"] == 2
+    assert item["api_key_id"] == api_key_identity("secret")
+
+
+@pytest.mark.asyncio
+async def test_list_documents_pagination_and_filters(tmp_path):
+    for name, size, key in [("a.pdf", 10, "k1"), ("b.pdf", 30, "k2"), ("c.pdf", 20, "k1")]:
+        path = tmp_path / name
+        path.write_bytes(b"x" * size)
+        await index_module.index_document(path, name, 1, 1.0, key)
+
+    items, total, total_bytes = await index_module.list_documents(2, 0, None, "size")
+    assert [item.filename for item in items] == ["b.pdf", "c.pdf"]
+    assert total == 3
+    assert total_bytes == 60
+
+    items, total, total_bytes = await index_module.list_documents(10, 1, "k1", "size")
+    assert [item.filename for item in items] == ["a.pdf"]
+    assert (total, total_bytes) == (2, 30)
+
+
+def test_list_documents_validates_query(monkeypatch):
+    monkeypatch.setattr(config.settings, "API_KEY", "secret")
+    client = TestClient(app)
+    response = client.get("/documents?limit=0", headers={"X-API-Key": "secret"})
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_download_uses_index_metadata(monkeypatch):
+    test_file = Path("/app/downloads/indexed.pdf")
+    test_file.write_bytes(b"PDF")
+    record = await index_module.index_document(test_file, "indexed.pdf", 1, 1.0, None)
+    used = []
+    indexed_stat_result = main_module.indexed_stat_result
+    monkeypatch.setattr(
+        main_module, "indexed_stat_result", lambda r: used.append(r) or indexed_stat_result(r)
+    )
+    client = TestClient(app)
+    response = client.get("/downloads/indexed.pdf")
+    test_file.unlink()
+
+    assert response.status_code == 200
+    assert response.content == b"PDF"
+    assert response.headers["etag"] == f'"{record.sha256}"'
+    assert response.headers["content-length"] == "3"
+    assert used == [record]
+
+
+@pytest.mark.asyncio
+async def test_download_of_deleted_indexed_file_is_not_found(monkeypatch, tmp_path):
+    monkeypatch.setattr(config.settings, "DOWNLOADS_DIR", str(tmp_path))
+    test_file = tmp_path / "gone.pdf"
+    test_file.write_bytes(b"PDF")
+    await index_module.index_document(test_file, "gone.pdf", 1, 1.0, None)
+    test_file.unlink()
+
+    response = TestClient(app).get("/downloads/gone.pdf")
+
+    assert response.status_code == 404
+    assert response.json()["code"] == "file_not_found"
+    assert index_module.get_document("gone.pdf") is None
+
+
+@pytest.mark.asyncio
+async def test_cleanup_removes_index_entries(tmp_path):
+    old_file = tmp_path / "old.pdf"
+    old_file.write_bytes(b"old")
+    await index_module.index_document(old_file, "old.pdf", 1, 1.0, None)
+    old_time = datetime.now(tz=timezone.utc) - timedelta(days=8)
+    os.utime(old_file, (old_time.timestamp(), old_time.timestamp()))
+
+    await cleanup_downloads_folder(str(tmp_path))
+
+    assert index_module.get_document("old.pdf") is None
+
+
+def test_download_hides_internal_entries():
+    client = TestClient(app)
+    response = client.get("/downloads/.index/documents.sqlite3")
+    assert response.status_code == 404
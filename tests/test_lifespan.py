@@ -1,5 +1,6 @@
 from fastapi.testclient import TestClient
 import app.main as main_module
+import app.maintenance as maintenance_module
 
 
 def test_lifespan_runs_cleanup(monkeypatch):
@@ -8,10 +9,9 @@ def test_lifespan_runs_cleanup(monkeypatch):
     async def fake_cleanup(path):
         calls.append(path)
 
-    monkeypatch.setattr(main_module, "cleanup_downloads_folder", fake_cleanup)
+    monkeypatch.setattr(maintenance_module, "cleanup_downloads_folder", fake_cleanup)
 
     with TestClient(main_module.app):
         pass
 
     assert calls == ["/app/downloads", "/app/downloads"]
-
@@ -0,0 +1,92 @@
+import os
+import time
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.config as config
+import app.index as index_module
+from app.main import app
+from app.maintenance import LeaderLock, MaintenanceScheduler, _enforce_quota
+from app.metrics import metrics
+
+
+def test_leader_lock_is_exclusive_and_fails_over(tmp_path):
+    first = LeaderLock(tmp_path / "leader.lock")
+    second = LeaderLock(tmp_path / "leader.lock")
+
+    assert first.try_acquire()
+    assert not second.try_acquire()
+
+    first.release()
+    assert second.try_acquire()
+    second.release()
+
+
+@pytest.mark.asyncio
+async def test_only_leader_runs_jobs(tmp_path):
+    runs = []
+
+    async def job(path):
+        runs.append(path)
+
+    leader = MaintenanceScheduler(tmp_path, jobs={"job": job})
+    follower = MaintenanceScheduler(tmp_path, jobs={"job": job})
+
+    await leader.start()
+    await follower.start()
+    assert leader.is_leader
+    assert not follower.is_leader
+    assert runs == [tmp_path]
+
+    # Leadership moves to the follower once the leader stops
+    await leader.stop()
+    await follower._tick()
+    assert follower.is_leader
+    assert len(runs) == 3
+    await follower.stop()
+
+
+@pytest.mark.asyncio
+async def test_job_runtime_and_failures_exposed(monkeypatch, tmp_path):
+    monkeypatch.setattr(config.settings, "API_KEY", None)
+    metrics.reset()
+
+    async def broken(path):
+        raise RuntimeError("boom")
+
+    scheduler = MaintenanceScheduler(tmp_path, jobs={"broken": broken})
+    await scheduler.run_jobs()
+
+    assert metrics.get("maintenance_job_failures_total", job="broken") == 1
+    body = TestClient(app).get("/metrics").text
+    assert 'maintenance_job_seconds_count{job="broken"} 1' in body
+
+
+@pytest.mark.asyncio
+async def test_enforce_quota_removes_oldest(tmp_path):
+    now = time.time()
+    for age, name in [(300, "oldest.pdf"), (200, "middle.pdf"), (100, "newest.pdf")]:
+        path = tmp_path / name
+        path.write_bytes(b"x" * 10)
+        os.utime(path, (now - age, now - age))
+        await index_module.index_document(path, name, 1, 1.0, None)
+
+    removed = _enforce_quota(tmp_path, 20)
+
+    assert removed == 1
+    assert not (tmp_path / "oldest.pdf").exists()
+    assert index_module.get_document("oldest.pdf") is None
+    assert index_module.get_document("newest.pdf") is not None
+
+
+@pytest.mark.asyncio
+async def test_compact_index_drops_missing_files(tmp_path):
+    path = tmp_path / "gone.pdf"
+    path.write_bytes(b"x")
+    await index_module.index_document(path, "gone.pdf", 1, 1.0, None)
+    path.unlink()
+
+    assert index_module.compact_index(Path(tmp_path)) == 1
+    assert index_module.get_document("gone.pdf") is None
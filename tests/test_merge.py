@@ -0,0 +1,120 @@
+import io
+
+import pytest
+from fastapi.testclient import TestClient
+from pypdf import PdfReader, PdfWriter
+
+import app.config as config
+from app.config import TenantSettings
+from app.index import get_document
+from app.main import app
+from app.tenants import rate_limiter
+
+
+def _write_pdf(path, pages, width=200, title=None):
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=width, height=300)
+    if title:
+        writer.add_metadata({"/Title": title})
+    with path.open("wb") as file:
+        writer.write(file)
+
+
+@pytest.fixture
+def downloads(monkeypatch, tmp_path):
+    monkeypatch.setattr(config.settings, "API_KEY", "secret")
+    monkeypatch.setattr(config.settings, "BASE_URL", "")
+    monkeypatch.setattr(config.settings, "DOWNLOADS_DIR", str(tmp_path))
+    _write_pdf(tmp_path / "cover.pdf", 1, width=100, title="Cover")
+    _write_pdf(tmp_path / "report.pdf", 3)
+    return tmp_path
+
+
+def test_merge_concatenates_pages_in_order(downloads):
+    client = TestClient(app)
+    response = client.post(
+        "/merge",
+        json={"filenames": ["cover.pdf", "report.pdf"], "output_filename": "Pack"},
+        headers={"X-API-Key": "secret"},
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["page_count"] == 4
+    filename = data["url"].rsplit("/", 1)[-1]
+    assert filename.startswith("pack-")
+    reader = PdfReader(downloads / filename)
+    assert [float(page.mediabox.width) for page in reader.pages] == [100, 200, 200, 200]
+    assert reader.metadata.title == "Cover"
+    assert get_document(filename).page_count == 4
+    assert not any(path.name.endswith(".part") for path in downloads.iterdir())
+
+
+def test_merge_streams_pdf_when_accepted(downloads):
+    client = TestClient(app)
+    response = client.post(
+        "/merge",
+        json={"filenames": ["report.pdf", "report.pdf"]},
+        headers={"X-API-Key": "secret", "Accept": "application/pdf"},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/pdf"
+    assert response.headers["x-page-count"] == "6"
+    assert len(PdfReader(io.BytesIO(response.content)).pages) == 6
+
+
+def test_merge_charges_only_the_request_rate(downloads, monkeypatch):
+    monkeypatch.setattr(
+        config.settings,
+        "API_KEYS",
+        [
+            TenantSettings(
+                name="ops",
+                key="ops-key",
+                requests_per_second=0.001,
+                request_burst=5,
+                cost_per_second=0.001,
+                cost_burst=2,
+            )
+        ],
+    )
+    rate_limiter.reset()
+    client = TestClient(app)
+    for _ in range(3):
+        response = client.post(
+            "/merge", json={"filenames": ["report.pdf"]}, headers={"X-API-Key": "ops-key"}
+        )
+        assert response.status_code == 200
+
+    requests, costs = rate_limiter._buckets["ops"]
+    assert requests.tokens == pytest.approx(2, abs=0.01)
+    assert costs.tokens == 2
+    rate_limiter.reset()
+
+
+@pytest.mark.parametrize(
+    "filenames, status, code",
+    [
+        (["missing.pdf"], 404, "file_not_found"),
+        (["not-a-pdf.pdf"], 422, "invalid_pdf"),
+    ],
+)
+def test_merge_rejects_unusable_sources(downloads, filenames, status, code):
+    (downloads / "not-a-pdf.pdf").write_bytes(b"plain text")
+    client = TestClient(app)
+    response = client.post(
+        "/merge", json={"filenames": filenames}, headers={"X-API-Key": "secret"}
+    )
+    assert response.status_code == status
+    assert response.json()["code"] == code
+
+
+@pytest.mark.parametrize("filename", ["../etc/passwd.pdf", ".index.pdf", "report.txt"])
+def test_merge_rejects_paths_outside_downloads(downloads, filename):
+    client = TestClient(app)
+    response = client.post(
+        "/merge", json={"filenames": [filename]}, headers={"X-API-Key": "secret"}
+    )
+    assert response.status_code == 422
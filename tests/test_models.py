@@ -95,3 +95,14 @@ def test_create_pdf_response_allows_relative_url():
 def test_create_pdf_response_url_validation(url):
     with pytest.raises(ValidationError):
         CreatePDFResponse(results="ok", url=url)
+
+
+def test_optimization_profile_validation():
+    req = CreatePDFRequest(
+        pdf_title="Title", body_content="<p>x</p>", optimization_profile="small"
+    )
+    assert req.optimization_profile == "small"
+    with pytest.raises(ValidationError):
+        CreatePDFRequest(
+            pdf_title="Title", body_content="<p>x</p>", optimization_profile="tiny"
+        )
@@ -0,0 +1,67 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import app.config as config
+from app.index import _index_file
+from app.main import app
+
+
+@pytest.fixture
+def downloads(monkeypatch, tmp_path):
+    monkeypatch.setattr(config.settings, "DOWNLOADS_DIR", str(tmp_path))
+    (tmp_path / "report.pdf").write_bytes(b"%PDF")
+    (tmp_path / "previews").mkdir()
+    (tmp_path / "previews" / "draft name.pdf").write_bytes(b"%PDF")
+    return tmp_path
+
+
+def test_x_accel_redirect_maps_to_internal_location(monkeypatch, downloads):
+    monkeypatch.setattr(config.settings, "DOWNLOADS_OFFLOAD", "x-accel-redirect")
+    monkeypatch.setattr(config.settings, "ROOT_PATH", "/pdf")
+    client = TestClient(app)
+
+    response = client.get("/downloads/previews/draft name.pdf")
+    assert response.status_code == 200
+    assert response.content == b""
+    assert response.headers["x-accel-redirect"] == "/pdf/_downloads/previews/draft%20name.pdf"
+    assert response.headers["content-type"] == "application/pdf"
+
+
+def test_indexed_downloads_keep_their_etag(monkeypatch, downloads):
+    monkeypatch.setattr(config.settings, "DOWNLOADS_OFFLOAD", "x-accel-redirect")
+    record = _index_file(downloads / "report.pdf", "report.pdf", 1, 1.0, None)
+    client = TestClient(app)
+
+    response = client.get("/downloads/report.pdf")
+    assert response.headers["x-accel-redirect"] == "/_downloads/report.pdf"
+    assert response.headers["etag"] == f'"{record.sha256}"'
+
+
+def test_indexed_offload_does_not_stat_the_file(monkeypatch, downloads):
+    monkeypatch.setattr(config.settings, "DOWNLOADS_OFFLOAD", "x-accel-redirect")
+    _index_file(downloads / "report.pdf", "report.pdf", 1, 1.0, None)
+    (downloads / "report.pdf").unlink()
+    client = TestClient(app)
+
+    # The proxy answers 404 for the missing file; compaction drops the record
+    response = client.get("/downloads/report.pdf")
+    assert response.headers["x-accel-redirect"] == "/_downloads/report.pdf"
+
+
+def test_x_sendfile_uses_the_file_path(monkeypatch, downloads):
+    monkeypatch.setattr(config.settings, "DOWNLOADS_OFFLOAD", "x-sendfile")
+    client = TestClient(app)
+
+    response = client.get("/downloads/report.pdf")
+    assert response.headers["x-sendfile"] == str((downloads / "report.pdf").resolve())
+    assert response.content == b""
+
+
+def test_offload_still_validates_paths(monkeypatch, downloads):
+    monkeypatch.setattr(config.settings, "DOWNLOADS_OFFLOAD", "x-accel-redirect")
+    client = TestClient(app)
+
+    missing = client.get("/downloads/missing.pdf")
+    assert missing.status_code == 404
+    assert "x-accel-redirect" not in missing.headers
+    assert client.get("/downloads/.index/documents.sqlite3").status_code == 404
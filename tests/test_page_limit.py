@@ -0,0 +1,97 @@
+import logging
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+import app.config as config
+import app.dependencies as deps
+from app.dependencies import generate_pdf
+from app.main import app
+
+HEADERS = {"X-API-Key": "secret"}
+
+
+class PagedHTML:
+    """Fake WeasyPrint document reporting each page as it is laid out."""
+
+    total_pages = 10
+    laid_out = 0
+
+    def __init__(self, string):
+        self.string = string
+        self.pages = []
+
+    def render(self, **options):
+        for page in range(1, self.total_pages + 1):
+            logging.getLogger("weasyprint.progress").info(
+                "Step 5 - Creating layout - Page %d", page
+            )
+            PagedHTML.laid_out = page
+            self.pages.append(page)
+        return self
+
+    def write_pdf(self, target, **options):
+        target.write_bytes(b"%PDF")
+
+
+@pytest.fixture
+def paged(monkeypatch):
+    PagedHTML.laid_out = 0
+    monkeypatch.setattr(deps, "HTML", PagedHTML)
+    monkeypatch.setattr(config.settings, "MAX_PAGES", 0)
+
+
+async def _render(tmp_path, **kwargs):
+    return await generate_pdf(
+        pdf_title="Runaway",
+        body_content="<p>x</p>",
+        css_content=None,
+        output_path=tmp_path / "runaway.pdf",
+        contains_code=False,
+        **kwargs,
+    )
+
+
+@pytest.mark.asyncio
+async def test_layout_stops_at_the_first_page_over_the_limit(paged, tmp_path):
+    with pytest.raises(HTTPException) as exc:
+        await _render(tmp_path, max_pages=3)
+    assert exc.value.status_code == 422
+    assert exc.value.detail["code"] == "page_limit_exceeded"
+    assert PagedHTML.laid_out == 3
+    assert not (tmp_path / "runaway.pdf").exists()
+
+
+@pytest.mark.asyncio
+async def test_global_limit_caps_the_requested_limit(paged, monkeypatch, tmp_path):
+    monkeypatch.setattr(config.settings, "MAX_PAGES", 2)
+    with pytest.raises(HTTPException):
+        await _render(tmp_path, max_pages=50)
+    assert PagedHTML.laid_out == 2
+    with pytest.raises(HTTPException):
+        await _render(tmp_path)
+
+
+@pytest.mark.asyncio
+async def test_documents_within_the_limit_render(paged, tmp_path):
+    assert await _render(tmp_path, max_pages=10) == 10
+    assert (tmp_path / "runaway.pdf").read_bytes() == b"%PDF"
+
+
+def test_create_pdf_reports_page_count_and_limit_errors(paged, monkeypatch, tmp_path):
+    monkeypatch.setattr(config.settings, "API_KEY", "secret")
+    monkeypatch.setattr(config.settings, "DOWNLOADS_DIR", str(tmp_path))
+    client = TestClient(app)
+    payload = {"pdf_title": "Runaway", "body_content": "<p>x</p>"}
+
+    response = client.post("/", json=payload, headers=HEADERS)
+    assert response.status_code == 200
+    assert response.json()["page_count"] == 10
+
+    response = client.post("/", json={**payload, "max_pages": 4}, headers=HEADERS)
+    assert response.status_code == 422
+    assert response.json()["code"] == "page_limit_exceeded"
+
+    response = client.post("/", json={**payload, "max_pages": 0}, headers=HEADERS)
+    assert response.status_code == 422
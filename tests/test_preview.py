@@ -0,0 +1,98 @@
+import os
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.config as config
+import app.dependencies as deps
+from app.dependencies import PREVIEW_OPTIONS, generate_pdf
+from app.index import get_document
+from app.main import app
+from app.maintenance import _expire_previews
+
+HEADERS = {"X-API-Key": "secret"}
+
+
+class LongHTML:
+    """Fake WeasyPrint document with several pages, recording what is written."""
+
+    written = None
+
+    def __init__(self, string):
+        self.string = string
+        self.pages = list(range(8))
+
+    def render(self, **options):
+        return self
+
+    def copy(self, pages):
+        document = LongHTML(self.string)
+        document.pages = list(pages)
+        return document
+
+    def write_pdf(self, target, **options):
+        LongHTML.written = {"pages": len(self.pages), "options": options, "html": self.string}
+        target.write_bytes(b"%PDF")
+
+
+@pytest.fixture
+def long_document(monkeypatch):
+    LongHTML.written = None
+    monkeypatch.setattr(deps, "HTML", LongHTML)
+
+    def fail(*args):
+        raise AssertionError("previews must not resample images")
+
+    monkeypatch.setattr(deps, "normalize_images", fail)
+
+
+@pytest.mark.asyncio
+async def test_preview_writes_only_the_leading_pages(long_document, tmp_path):
+    pages = await generate_pdf(
+        pdf_title="Draft",
+        body_content='<img width="10" src="data:image/png;base64,AAAA">',
+        css_content=None,
+        output_path=tmp_path / "draft.pdf",
+        contains_code=False,
+        optimization_profile="print",
+        preview_pages=2,
+    )
+    assert pages == 2
+    assert LongHTML.written["pages"] == 2
+    options = LongHTML.written["options"]
+    assert options == PREVIEW_OPTIONS
+    assert options["full_fonts"] is False
+    assert options["optimize_images"] is False
+    assert '<meta name="keywords" content="preview">' in LongHTML.written["html"]
+
+
+def test_create_pdf_stores_previews_apart(long_document, monkeypatch, tmp_path):
+    monkeypatch.setattr(config.settings, "API_KEY", "secret")
+    monkeypatch.setattr(config.settings, "DOWNLOADS_DIR", str(tmp_path))
+    client = TestClient(app)
+    payload = {"pdf_title": "Draft", "body_content": "<p>x</p>", "preview_pages": 1}
+
+    response = client.post("/", json=payload, headers=HEADERS)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["preview"] is True and data["page_count"] == 1
+    filename = data["url"].split("/downloads/", 1)[1]
+    assert filename.startswith("previews/")
+    assert (tmp_path / filename).is_file()
+    assert get_document(filename) is None
+    assert client.get(f"/downloads/{filename}").status_code == 200
+
+    response = client.post("/", json={**payload, "preview_pages": 11}, headers=HEADERS)
+    assert response.status_code == 422
+
+
+def test_expired_previews_are_removed(tmp_path):
+    old, fresh = tmp_path / "old.pdf", tmp_path / "fresh.pdf"
+    old.write_bytes(b"%PDF")
+    fresh.write_bytes(b"%PDF")
+    stale = time.time() - 7200
+    os.utime(old, (stale, stale))
+    assert _expire_previews(tmp_path, 3600) == 1
+    assert not old.exists() and fresh.exists()
+    assert _expire_previews(tmp_path / "missing", 3600) == 0
@@ -0,0 +1,155 @@
+import json
+import logging
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.config as config
+import app.jobs as jobs_module
+import app.progress as progress_module
+import app.queue as queue_module
+from app.main import app
+from app.models import JobStatusResponse
+from app.progress import ProgressBroker, progress, track_layout_pages
+
+HEADERS = {"X-API-Key": "secret"}
+
+
+def _parse(stream):
+    events = []
+    for block in stream.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((int(fields["id"]), fields["event"], json.loads(fields["data"])))
+    return events
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setattr(config.settings, "API_KEY", "secret")
+    monkeypatch.setattr(config.settings, "DOWNLOADS_DIR", str(tmp_path))
+
+    async def fake_generate_pdf(output_path, contains_code, on_progress, **kwargs):
+        if contains_code:
+            on_progress("highlighting")
+        on_progress("layout", pages=0)
+        on_progress("layout", pages=1)
+        on_progress("layout", pages=2)
+        on_progress("serializing", pages=2)
+        Path(output_path).write_bytes(b"PDF")
+        return 2
+
+    monkeypatch.setattr(jobs_module, "generate_pdf", fake_generate_pdf)
+    with TestClient(app) as client:
+        yield client
+
+
+def test_track_layout_pages_reports_weasyprint_pages():
+    calls = []
+    with track_layout_pages(lambda stage, **data: calls.append((stage, data))):
+        logging.getLogger("weasyprint.progress").info(
+            "Step 5 - Creating layout - Page %d", 3
+        )
+        logging.getLogger("weasyprint.progress").info(
+            "Step 5 - Creating layout - Page %d (up-to-date)", 1
+        )
+    logging.getLogger("weasyprint.progress").info(
+        "Step 5 - Creating layout - Page %d", 4
+    )
+    assert calls == [("layout", {"pages": 3})]
+
+
+def test_layout_hook_keeps_progress_records_out_of_the_root_log(monkeypatch, caplog):
+    progress_logger = logging.getLogger("weasyprint.progress")
+    monkeypatch.setattr(progress_module, "_handler", None)
+    monkeypatch.setattr(progress_logger, "handlers", [])
+    monkeypatch.setattr(progress_logger, "level", logging.NOTSET)
+    monkeypatch.setattr(progress_logger, "propagate", True)
+    monkeypatch.setattr(logging.getLogger(), "level", logging.WARNING)
+
+    calls = []
+    with track_layout_pages(lambda stage, **data: calls.append(data)):
+        progress_logger.info("Step 5 - Creating layout - Page %d", 1)
+    assert calls == [{"pages": 1}]
+    assert caplog.records == []
+
+
+def test_broker_coalesces_layout_updates():
+    broker = ProgressBroker()
+    broker.publish("job", "queued", queue_position=2)
+    broker.publish("job", "layout", pages=1)
+    broker.publish("job", "layout", pages=2)
+    history = broker.history("job")
+    assert [(event.stage, event.seq) for event in history] == [
+        ("queued", 1),
+        ("layout", 3),
+    ]
+    assert history[-1].pages == 2
+
+
+def test_job_events_stream_stage_transitions(client):
+    response = client.post(
+        "/jobs",
+        json={
+            "pdf_title": "Streamed",
+            "body_content": '<pre><code class="language-python">x=1</code></pre>',
+            "contains_code": True,
+        },
+        headers=HEADERS,
+    )
+    job_id = response.json()["job_id"]
+
+    with client.stream("GET", f"/jobs/{job_id}/events", headers=HEADERS) as stream:
+        assert stream.headers["content-type"].startswith("text/event-stream")
+        events = _parse(stream.read().decode())
+
+    stages = [stage for _, stage, _ in events]
+    assert stages == [
+        "validated",
+        "queued",
+        "running",
+        "highlighting",
+        "layout",
+        "serializing",
+        "stored",
+        "completed",
+    ]
+    data = {stage: payload for _, stage, payload in events}
+    assert data["queued"]["queue_position"] == 1
+    assert data["layout"]["pages"] == 2
+    assert data["completed"]["url"].endswith(".pdf")
+
+    resumed = client.get(
+        f"/jobs/{job_id}/events",
+        headers={**HEADERS, "Last-Event-ID": str(events[-2][0])},
+    )
+    assert [stage for _, stage, _ in _parse(resumed.text)] == ["completed"]
+
+
+def test_job_events_unknown_job(client):
+    response = client.get("/jobs/missing/events", headers=HEADERS)
+    assert response.status_code == 404
+    assert response.json()["code"] == "job_not_found"
+
+
+def test_job_events_follow_status_of_remote_render(client, monkeypatch):
+    now = datetime.now(tz=timezone.utc)
+
+    class RemoteQueue(queue_module.JobQueue):
+        async def status(self, job_id):
+            return JobStatusResponse(
+                job_id=job_id,
+                status="failed",
+                error={"status": 500, "code": "boom", "message": "Boom"},
+                created_at=now,
+                updated_at=now,
+            )
+
+    monkeypatch.setattr(queue_module, "_queue", RemoteQueue())
+    response = client.get("/jobs/elsewhere/events", headers=HEADERS)
+
+    events = _parse(response.text)
+    assert [stage for _, stage, _ in events] == ["failed"]
+    assert events[0][2]["error"]["code"] == "boom"
+    assert progress.history("elsewhere")[-1].stage == "failed"
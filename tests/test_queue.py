@@ -0,0 +1,344 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.config as config
+from app.config import TenantSettings
+import app.jobs as jobs_module
+import app.queue as queue_module
+from app.jobs import new_job
+from app.main import app
+from app.models import CreatePDFRequest
+
+
+class FakeRedisServer:
+    """In-memory stand-in speaking enough RESP2 for the render queue."""
+
+    def __init__(self):
+        self.strings = {}
+        self.lists = {}
+        self.zsets = {}
+        self.delays = {}
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self._serve, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return f"redis://127.0.0.1:{self.port}/0"
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _serve(self, reader, writer):
+        try:
+            while True:
+                header = await reader.readuntil(b"\r\n")
+                args = []
+                for _ in range(int(header[1:-2])):
+                    length = int((await reader.readuntil(b"\r\n"))[1:-2])
+                    args.append((await reader.readexactly(length + 2))[:-2].decode())
+                if len(args) > 1 and args[1] in self.delays:
+                    await asyncio.sleep(self.delays[args[1]])
+                writer.write(self._reply(self._dispatch(args[0].upper(), args[1:])))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+
+    def _reply(self, value):
+        if value is None:
+            return b"$-1\r\n"
+        if isinstance(value, int):
+            return b":%d\r\n" % value
+        if isinstance(value, list):
+            return b"*%d\r\n" % len(value) + b"".join(self._reply(v) for v in value)
+        data = value.encode()
+        return b"$%d\r\n%s\r\n" % (len(data), data)
+
+    def _dispatch(self, command, args):
+        if command == "SET":
+            self.strings[args[0]] = args[1]
+            return "OK"
+        if command == "GET":
+            return self.strings.get(args[0])
+        if command == "MGET":
+            return [self.strings.get(key) for key in args]
+        if command == "DEL":
+            return int(self.strings.pop(args[0], None) is not None)
+        if command == "INCR":
+            self.strings[args[0]] = str(int(self.strings.get(args[0], 0)) + 1)
+            return int(self.strings[args[0]])
+        if command == "EXPIRE":
+            return 1
+        if command == "LPUSH":
+            self.lists.setdefault(args[0], []).insert(0, args[1])
+            return len(self.lists[args[0]])
+        if command == "RPUSH":
+            self.lists.setdefault(args[0], []).append(args[1])
+            return len(self.lists[args[0]])
+        if command == "RPOPLPUSH":
+            source = self.lists.get(args[0])
+            if not source:
+                return None
+            value = source.pop()
+            self.lists.setdefault(args[1], []).insert(0, value)
+            return value
+        if command == "LREM":
+            items = self.lists.get(args[0], [])
+            if args[2] in items:
+                items.remove(args[2])
+                return 1
+            return 0
+        if command == "ZADD":
+            self.zsets.setdefault(args[0], {})[args[2]] = float(args[1])
+            return 1
+        if command == "ZREM":
+            return int(self.zsets.get(args[0], {}).pop(args[1], None) is not None)
+        if command == "ZRANGEBYSCORE":
+            high = float(args[2])
+            return [m for m, s in self.zsets.get(args[0], {}).items() if s <= high]
+        if command == "ZREMRANGEBYSCORE":
+            zset = self.zsets.get(args[0], {})
+            expired = [m for m, s in zset.items() if s <= float(args[2])]
+            for member in expired:
+                del zset[member]
+            return len(expired)
+        if command == "ZCARD":
+            return len(self.zsets.get(args[0], {}))
+        if command == "ZRANGE":
+            ordered = self._ordered(args[0])[int(args[1]):int(args[2]) + 1 or None]
+            if "WITHSCORES" in args:
+                return [v for member, score in ordered for v in (member, repr(score))]
+            return [member for member, _ in ordered]
+        if command == "ZRANK":
+            members = [member for member, _ in self._ordered(args[0])]
+            return members.index(args[1]) if args[1] in members else None
+        raise AssertionError(f"Unexpected command {command}")
+
+    def _ordered(self, key):
+        return sorted(self.zsets.get(key, {}).items(), key=lambda item: (item[1], item[0]))
+
+
+@pytest.fixture
+def fake_render(monkeypatch, tmp_path):
+    monkeypatch.setattr(config.settings, "DOWNLOADS_DIR", str(tmp_path))
+    monkeypatch.setattr(config.settings, "BASE_URL", "http://test")
+    rendered = []
+
+    async def fake_generate_pdf(output_path, **kwargs):
+        rendered.append(Path(output_path).name)
+        Path(output_path).write_bytes(b"PDF")
+        return 1
+
+    monkeypatch.setattr(jobs_module, "generate_pdf", fake_generate_pdf)
+    return rendered
+
+
+def _job(api_key_id="abc"):
+    return new_job(
+        CreatePDFRequest(pdf_title="Queued", body_content="<p>x</p>"), api_key_id
+    )
+
+
+@pytest.mark.asyncio
+async def test_cancelled_command_does_not_leak_its_reply():
+    server = FakeRedisServer()
+    url = await server.start()
+    server.strings.update({"a": "first", "b": "second"})
+    server.delays["a"] = 0.1
+    client = queue_module.RedisClient(url)
+    try:
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(client.execute("GET", "a"), 0.01)
+        assert await client.execute("GET", "b") == "second"
+    finally:
+        await client.close()
+        await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_redis_queue_renders_on_another_node(fake_render, tmp_path):
+    server = FakeRedisServer()
+    url = await server.start()
+    api_node = queue_module.RedisQueue(url, worker=False, poll_interval=0.01)
+    render_node = queue_module.RedisQueue(url, concurrency=2, poll_interval=0.01)
+    await api_node.start()
+    await render_node.start()
+    try:
+        job = _job()
+        result = await api_node.submit(job, timeout=5)
+    finally:
+        await render_node.stop()
+        await api_node.stop()
+        await server.stop()
+
+    assert result.status == "completed"
+    assert result.url == f"http://test/downloads/{job.filename}"
+    assert fake_render == [job.filename]
+    assert (tmp_path / job.filename).read_bytes() == b"PDF"
+    assert server.lists["pdf:processing"] == []
+    assert server.zsets["pdf:inflight"] == {}
+
+
+@pytest.mark.asyncio
+async def test_redis_queue_redelivers_after_visibility_timeout(fake_render):
+    server = FakeRedisServer()
+    url = await server.start()
+    queue = queue_module.RedisQueue(url, worker=False, visibility_timeout=0.05)
+    try:
+        job = _job()
+        await queue.enqueue(job)
+        # A consumer takes the job and dies before acknowledging it
+        assert await queue._claim(queue.client) == job.job_id
+        await queue.client.execute("ZADD", "pdf:inflight", 0, job.job_id)
+
+        assert await queue.requeue_expired() == 1
+        assert list(server.zsets["pdf:pending"]) == [job.job_id]
+        assert server.lists["pdf:processing"] == []
+
+        await queue._process(queue.client, job.job_id)
+        status = await queue.status(job.job_id)
+    finally:
+        await queue.stop()
+        await server.stop()
+
+    assert status.status == "completed"
+    assert fake_render == [job.filename]
+
+
+@pytest.mark.asyncio
+async def test_redis_queue_abandons_job_after_max_attempts(fake_render):
+    server = FakeRedisServer()
+    url = await server.start()
+    queue = queue_module.RedisQueue(url, worker=False, max_attempts=1)
+    try:
+        job = _job()
+        await queue.enqueue(job)
+        server.strings[f"pdf:attempts:{job.job_id}"] = "1"
+        await queue._process(queue.client, job.job_id)
+        status = await queue.status(job.job_id)
+    finally:
+        await queue.stop()
+        await server.stop()
+
+    assert status.status == "failed"
+    assert status.error.code == "job_attempts_exceeded"
+    assert fake_render == []
+
+
+@pytest.mark.asyncio
+async def test_redis_queue_interleaves_tenants_by_weight(monkeypatch, fake_render):
+    monkeypatch.setattr(
+        config.settings,
+        "API_KEYS",
+        [
+            TenantSettings(name="batch", key="batch-key"),
+            TenantSettings(name="heavy", key="heavy-key", weight=4),
+        ],
+    )
+    server = FakeRedisServer()
+    url = await server.start()
+    queue = queue_module.RedisQueue(url, worker=False)
+    try:
+        batch = [_job("batch") for _ in range(4)]
+        heavy = [_job("heavy") for _ in range(2)]
+        for job in (*batch, *heavy):
+            await queue.enqueue(job)
+        claimed = [await queue._claim(queue.client) for _ in range(6)]
+        assert await queue._claim(queue.client) is None
+    finally:
+        await queue.stop()
+        await server.stop()
+
+    # The later tenant with four times the weight is served first instead of
+    # waiting behind the whole batch
+    assert claimed[:2] == [heavy[0].job_id, heavy[1].job_id]
+    assert claimed[2:] == [job.job_id for job in batch]
+
+
+@pytest.mark.asyncio
+async def test_redis_queue_caps_tenant_concurrency_across_nodes(monkeypatch, fake_render):
+    monkeypatch.setattr(
+        config.settings,
+        "API_KEYS",
+        [
+            TenantSettings(name="capped", key="capped-key", max_concurrency=1, weight=4),
+            TenantSettings(name="other", key="other-key"),
+        ],
+    )
+    server = FakeRedisServer()
+    url = await server.start()
+    first = queue_module.RedisQueue(url, worker=False)
+    second = queue_module.RedisQueue(url, worker=False)
+    try:
+        capped = [_job("capped") for _ in range(2)]
+        other = _job("other")
+        for job in (*capped, other):
+            await first.enqueue(job)
+
+        assert await first._claim(first.client) == capped[0].job_id
+        # The other node skips the capped tenant's second job
+        assert await second._claim(second.client) == other.job_id
+        assert await second._claim(second.client) is None
+
+        await first._process(first.client, capped[0].job_id)
+        assert server.zsets["pdf:running:capped"] == {}
+        assert await second._claim(second.client) == capped[1].job_id
+    finally:
+        await first.stop()
+        await second.stop()
+        await server.stop()
+
+
+def test_jobs_endpoints(monkeypatch, fake_render):
+    monkeypatch.setattr(config.settings, "API_KEY", "secret")
+    headers = {"X-API-Key": "secret"}
+
+    with TestClient(app) as client:
+        response = client.post(
+            "/jobs",
+            json={"pdf_title": "Queued", "body_content": "<p>x</p>"},
+            headers=headers,
+        )
+        assert response.status_code == 202
+        job_id = response.json()["job_id"]
+
+        for _ in range(100):
+            status = client.get(f"/jobs/{job_id}", headers=headers).json()
+            if status["status"] == "completed":
+                break
+        assert status["status"] == "completed"
+        assert status["page_count"] == 1
+        assert status["url"].startswith("http://test/downloads/")
+
+        missing = client.get("/jobs/unknown", headers=headers)
+        assert missing.status_code == 404
+        assert missing.json()["code"] == "job_not_found"
+
+
+def test_create_pdf_reports_job_failure(monkeypatch, fake_render):
+    monkeypatch.setattr(config.settings, "API_KEY", "secret")
+
+    async def missing_template(template_id, namespace=None):
+        from fastapi import HTTPException
+
+        raise HTTPException(
+            status_code=404,
+            detail={
+                "status": 404,
+                "code": "template_not_found",
+                "message": "Template not found",
+                "details": template_id,
+            },
+        )
+
+    monkeypatch.setattr(jobs_module, "load_template", missing_template)
+    response = TestClient(app).post(
+        "/",
+        json={"pdf_title": "x", "body_content": "<p>x</p>", "template_id": "nope"},
+        headers={"X-API-Key": "secret"},
+    )
+    assert response.status_code == 404
+    assert response.json()["code"] == "template_not_found"
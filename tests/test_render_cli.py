@@ -0,0 +1,55 @@
+import io
+import json
+
+import app.render as render
+from app.render import MANIFEST_NAME, load_manifest, main
+
+VALID = {"pdf_title": "Bulk", "body_content": "<p>x</p>"}
+
+
+def _write_input(path, records):
+    path.write_text(
+        "\n".join(r if isinstance(r, str) else json.dumps(r) for r in records) + "\n"
+    )
+
+
+def test_bulk_render_writes_outputs_and_manifest(tmp_path):
+    source = tmp_path / "in.jsonl"
+    out = tmp_path / "out"
+    _write_input(
+        source,
+        [VALID, {**VALID, "output_filename": "named.pdf"}, {"pdf_title": "missing"}],
+    )
+
+    assert main([str(source), "--output-dir", str(out), "--processes", "2"]) == 1
+
+    entries = load_manifest(out / MANIFEST_NAME)
+    assert {line: e["status"] for line, e in entries.items()} == {
+        1: "completed",
+        2: "completed",
+        3: "invalid",
+    }
+    assert entries[2]["file"] == "000002-named.pdf"
+    assert (out / entries[1]["file"]).is_file()
+    assert entries[1]["page_count"] == 1
+
+
+def test_bulk_render_resumes_without_rerendering(tmp_path):
+    source = tmp_path / "in.jsonl"
+    out = tmp_path / "out"
+    _write_input(source, [VALID, {**VALID, "pdf_title": "Second"}])
+    with source.open() as f:
+        assert render.run(f, out, processes=1)["completed"] == 2
+
+    # Change line 2 only; line 1 is already done
+    _write_input(source, [VALID, {**VALID, "pdf_title": "Changed"}])
+    with source.open() as f:
+        counts = render.run(f, out, processes=1)
+    assert counts == {"completed": 1, "failed": 0, "invalid": 0, "skipped": 1}
+    assert len((out / MANIFEST_NAME).read_text().splitlines()) == 3
+
+
+def test_bulk_render_reads_stdin(tmp_path, monkeypatch):
+    monkeypatch.setattr("sys.stdin", io.StringIO(json.dumps(VALID) + "\n\n"))
+    assert main(["-", "--output-dir", str(tmp_path), "--processes", "1"]) == 0
+    assert load_manifest(tmp_path / MANIFEST_NAME)[1]["status"] == "completed"
@@ -8,7 +8,7 @@ from app.models import CreatePDFResponse
 Path("/app/downloads").mkdir(parents=True, exist_ok=True)
 
 from app.main import app  # noqa: E402
-import app.routes.create as create_module  # noqa: E402
+import app.jobs as jobs_module  # noqa: E402
 
 
 @pytest.mark.asyncio
@@ -18,6 +18,7 @@ async def fake_generate_pdf(
     css_content,
     output_path,
     contains_code,
+    **kwargs,
 ):
     Path(output_path).write_bytes(b"PDF")
 
@@ -26,12 +27,8 @@ def test_create_pdf_endpoint_success(monkeypatch, tmp_path):
     monkeypatch.setattr(config.settings, "API_KEY", "secret")
     monkeypatch.setattr(config.settings, "BASE_URL", "http://test")
 
-    def fake_path(path_str):
-        assert path_str == "/app/downloads"
-        return tmp_path
-
-    monkeypatch.setattr(create_module, "Path", fake_path)
-    monkeypatch.setattr(create_module, "generate_pdf", fake_generate_pdf)
+    monkeypatch.setattr(config.settings, "DOWNLOADS_DIR", str(tmp_path))
+    monkeypatch.setattr(jobs_module, "generate_pdf", fake_generate_pdf)
 
     client = TestClient(app)
 
@@ -61,12 +58,8 @@ def test_create_pdf_endpoint_relative_url(monkeypatch, tmp_path):
     monkeypatch.setattr(config.settings, "API_KEY", "secret")
     monkeypatch.setattr(config.settings, "BASE_URL", "")
 
-    def fake_path(path_str):
-        assert path_str == "/app/downloads"
-        return tmp_path
-
-    monkeypatch.setattr(create_module, "Path", fake_path)
-    monkeypatch.setattr(create_module, "generate_pdf", fake_generate_pdf)
+    monkeypatch.setattr(config.settings, "DOWNLOADS_DIR", str(tmp_path))
+    monkeypatch.setattr(jobs_module, "generate_pdf", fake_generate_pdf)
 
     client = TestClient(app)
 
@@ -117,18 +110,14 @@ def test_create_pdf_endpoint_with_code_and_filename(monkeypatch, tmp_path):
     monkeypatch.setattr(config.settings, "API_KEY", "secret")
     monkeypatch.setattr(config.settings, "BASE_URL", "http://test")
 
-    def fake_path(path_str):
-        assert path_str == "/app/downloads"
-        return tmp_path
-
     async def fake_generate_pdf(
-        pdf_title, body_content, css_content, output_path, contains_code
+        pdf_title, body_content, css_content, output_path, contains_code, **kwargs
     ):
         assert contains_code is True
         Path(output_path).write_bytes(b"PDF")
 
-    monkeypatch.setattr(create_module, "Path", fake_path)
-    monkeypatch.setattr(create_module, "generate_pdf", fake_generate_pdf)
+    monkeypatch.setattr(config.settings, "DOWNLOADS_DIR", str(tmp_path))
+    monkeypatch.setattr(jobs_module, "generate_pdf", fake_generate_pdf)
 
     client = TestClient(app)
     payload = {
@@ -156,18 +145,14 @@ def test_create_pdf_endpoint_with_uppercase_tags(monkeypatch, tmp_path):
     monkeypatch.setattr(config.settings, "API_KEY", "secret")
     monkeypatch.setattr(config.settings, "BASE_URL", "http://test")
 
-    def fake_path(path_str):
-        assert path_str == "/app/downloads"
-        return tmp_path
-
     async def fake_generate_pdf(
-        pdf_title, body_content, css_content, output_path, contains_code
+        pdf_title, body_content, css_content, output_path, contains_code, **kwargs
     ):
         assert contains_code is True
         Path(output_path).write_bytes(b"PDF")
 
-    monkeypatch.setattr(create_module, "Path", fake_path)
-    monkeypatch.setattr(create_module, "generate_pdf", fake_generate_pdf)
+    monkeypatch.setattr(config.settings, "DOWNLOADS_DIR", str(tmp_path))
+    monkeypatch.setattr(jobs_module, "generate_pdf", fake_generate_pdf)
 
     client = TestClient(app)
     payload = {
@@ -195,7 +180,7 @@ def test_create_pdf_endpoint_generate_pdf_error(monkeypatch):
     async def fail_generate_pdf(*args, **kwargs):
         raise Exception("boom")
 
-    monkeypatch.setattr(create_module, "generate_pdf", fail_generate_pdf)
+    monkeypatch.setattr(jobs_module, "generate_pdf", fail_generate_pdf)
 
     client = TestClient(app)
     payload = {
@@ -0,0 +1,147 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi import HTTPException
+from pypdf import PdfReader, PdfWriter
+
+import app.config as config
+import app.dependencies as deps
+from app.dependencies import generate_pdf
+from app.metrics import metrics
+from app.sections import split_sections
+
+
+class SectionHTML:
+    """Fake WeasyPrint document writing one blank page per <p> element."""
+
+    laid_out: list[str] = []
+
+    def __init__(self, string):
+        self.string = string
+
+    def render(self, **options):
+        SectionHTML.laid_out.append(self.string)
+        if "pdf-footer-page" in self.string:
+            pages = self.string.count('class="pdf-footer-page"')
+        else:
+            pages = max(1, self.string.count("<p>"))
+        self.pages = [None] * pages
+        return self
+
+    def write_pdf(self, target, **options):
+        writer = PdfWriter()
+        for _ in self.pages:
+            writer.add_blank_page(612, 792)
+        with open(target, "wb") as file:
+            writer.write(file)
+
+
+@pytest.fixture
+def sections_dir(monkeypatch, tmp_path):
+    SectionHTML.laid_out = []
+    monkeypatch.setattr(deps, "HTML", SectionHTML)
+    monkeypatch.setattr(config.settings, "SECTIONS_DIR", str(tmp_path / ".sections"))
+    metrics.reset()
+    return tmp_path / ".sections"
+
+
+def render(body, tmp_path, **kwargs):
+    return generate_pdf(
+        pdf_title="Manual",
+        body_content=body,
+        css_content=None,
+        output_path=tmp_path / "manual.pdf",
+        contains_code=False,
+        incremental=True,
+        **kwargs,
+    )
+
+
+def test_split_sections_at_top_level_headings():
+    body = "<p>intro</p><h2>One</h2><div><h2>nested</h2></div><h1>Two</h1><p>x</p>"
+    assert split_sections(body) == [
+        "<p>intro</p>",
+        "<h2>One</h2><div><h2>nested</h2></div>",
+        "<h1>Two</h1><p>x</p>",
+    ]
+
+
+def test_split_sections_prefers_markers():
+    body = "<h2>A</h2><p>a</p><!-- section --><h2>B</h2><br><p>b</p>"
+    assert split_sections(body) == ["<h2>A</h2><p>a</p>", "<!-- section --><h2>B</h2><br><p>b</p>"]
+
+
+def test_unbalanced_markup_is_one_section():
+    body = "<h2>A</h2><p>open<h2>B</h2>"
+    assert split_sections(body) == [body]
+
+
+@pytest.mark.asyncio
+async def test_only_changed_sections_are_laid_out_again(sections_dir, tmp_path):
+    body = "<h2>A</h2><p>1</p><p>2</p><h2>B</h2><p>3</p><h2>C</h2><p>4</p><p>5</p>"
+    assert await render(body, tmp_path) == 5
+    # Three sections plus the footer overlay
+    assert len(SectionHTML.laid_out) == 4
+    assert "<h1>Manual</h1>" in SectionHTML.laid_out[0]
+    assert "<h1>Manual</h1>" not in SectionHTML.laid_out[1]
+    assert "counter(page)" not in SectionHTML.laid_out[0]
+    footer = SectionHTML.laid_out[-1]
+    assert footer.count('class="pdf-footer-page"') == 5
+    assert "counter(pages)" in footer and "Manual" in footer
+
+    SectionHTML.laid_out = []
+    revised = body.replace("<p>3</p>", "<p>3</p><p>3b</p>")
+    assert await render(revised, tmp_path) == 6
+    assert len(SectionHTML.laid_out) == 2
+    assert "3b" in SectionHTML.laid_out[0]
+    assert SectionHTML.laid_out[1].count('class="pdf-footer-page"') == 6
+    assert len(PdfReader(tmp_path / "manual.pdf").pages) == 6
+    assert metrics.get("cache_requests_total", cache="sections", result="hit") == 2
+
+    SectionHTML.laid_out = []
+    assert await render(revised, tmp_path) == 6
+    assert SectionHTML.laid_out == []
+
+
+@pytest.mark.asyncio
+async def test_stylesheet_changes_invalidate_sections(sections_dir, tmp_path):
+    body = "<h2>A</h2><p>1</p><h2>B</h2><p>2</p>"
+    await render(body, tmp_path)
+    SectionHTML.laid_out = []
+    await render(body, tmp_path, optimization_profile="small")
+    assert len(SectionHTML.laid_out) == 3
+
+
+@pytest.mark.asyncio
+async def test_page_limit_counts_cached_sections(sections_dir, tmp_path):
+    body = "<h2>A</h2><p>1</p><p>2</p><h2>B</h2><p>3</p><p>4</p>"
+    await render(body, tmp_path)
+    SectionHTML.laid_out = []
+    with pytest.raises(HTTPException) as exc:
+        await render(body, tmp_path, max_pages=3)
+    assert exc.value.status_code == 422
+    assert exc.value.detail["code"] == "page_limit_exceeded"
+    assert SectionHTML.laid_out == []
+
+
+def test_concurrent_layouts_of_a_section_use_separate_files(sections_dir, monkeypatch):
+    both_writing = threading.Barrier(2, timeout=5)
+
+    class SlowHTML(SectionHTML):
+        def write_pdf(self, target, **options):
+            super().write_pdf(target, **options)
+            # Both threads hold a written partial before either stores it
+            both_writing.wait()
+
+    monkeypatch.setattr(deps, "HTML", SlowHTML)
+    with ThreadPoolExecutor(2) as pool:
+        results = [
+            pool.submit(deps._cached_layout, "<p>same</p>", "", None, {}, None)
+            for _ in range(2)
+        ]
+        (first, pages), (second, _) = [result.result() for result in results]
+
+    assert first == second and pages == 1
+    assert len(PdfReader(first).pages) == 1
+    assert [path.name for path in sections_dir.iterdir()] == [first.name]
@@ -0,0 +1,150 @@
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi.testclient import TestClient
+from pypdf import PageObject, PdfReader, PdfWriter
+from pypdf.generic import DecodedStreamObject, NameObject
+
+import app.config as config
+import app.pdfops as pdfops
+from app.config import TenantSettings
+from app.main import app
+from app.models import Stamp
+from app.tenants import rate_limiter
+
+
+def _write_pdf(path, pages):
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=200, height=300)
+    with path.open("wb") as file:
+        writer.write(file)
+
+
+@pytest.fixture
+def rendered_stamps(monkeypatch, tmp_path):
+    monkeypatch.setattr(config.settings, "API_KEY", "secret")
+    monkeypatch.setattr(config.settings, "BASE_URL", "")
+    monkeypatch.setattr(config.settings, "DOWNLOADS_DIR", str(tmp_path))
+    monkeypatch.setattr(config.settings, "STAMPS_DIR", str(tmp_path / ".stamps"))
+    _write_pdf(tmp_path / "report.pdf", 2)
+    _write_pdf(tmp_path / "other.pdf", 1)
+    documents = []
+
+    def fake_render(document, output_path):
+        # One page whose content stream names the stamp text
+        documents.append(document)
+        text = re.search(r'class="stamp">(.*?)</div>', document).group(1)
+        writer = PdfWriter()
+        page = PageObject.create_blank_page(width=200, height=300)
+        stream = DecodedStreamObject()
+        stream.set_data(f"BT ({text}) Tj ET\n".encode())
+        page[NameObject("/Contents")] = writer._add_object(stream)
+        writer.add_page(page)
+        with open(output_path, "wb") as file:
+            writer.write(file)
+
+    monkeypatch.setattr(pdfops, "_render_stamp", fake_render)
+    return documents
+
+
+def _stamp(client, filename, stamps):
+    return client.post(
+        "/stamp",
+        json={"filename": filename, "stamps": stamps},
+        headers={"X-API-Key": "secret"},
+    )
+
+
+def test_stamps_are_composited_onto_every_page(rendered_stamps, tmp_path):
+    client = TestClient(app)
+    response = _stamp(
+        client,
+        "report.pdf",
+        [{"text": "DRAFT"}, {"text": "For <Jane>", "position": "header"}],
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["page_count"] == 2
+    reader = PdfReader(tmp_path / data["url"].rsplit("/", 1)[-1])
+    for page in reader.pages:
+        content = page.get_contents().get_data()
+        assert b"(DRAFT) Tj" in content
+        assert b"Jane" in content
+    # One layout per stamp, not per page; text is escaped
+    assert len(rendered_stamps) == 2
+    assert "For &lt;Jane&gt;" in rendered_stamps[1]
+
+
+def test_rendered_stamps_are_reused_across_documents(rendered_stamps):
+    client = TestClient(app)
+    assert _stamp(client, "report.pdf", [{"text": "DRAFT"}]).status_code == 200
+    assert _stamp(client, "other.pdf", [{"text": "DRAFT"}]).status_code == 200
+    assert _stamp(client, "other.pdf", [{"text": "FINAL"}]).status_code == 200
+
+    assert len(rendered_stamps) == 2
+
+
+def test_stamp_cache_is_bounded(rendered_stamps, monkeypatch, tmp_path):
+    monkeypatch.setattr(config.settings, "STAMP_CACHE_SIZE", 2)
+    for text in ["a", "b", "c"]:
+        pdfops.stamp_page(Stamp(text=text), 200, 300)
+    assert len(list((tmp_path / ".stamps").glob("*.pdf"))) == 2
+
+
+def test_concurrent_renders_of_a_stamp_use_separate_files(rendered_stamps, monkeypatch, tmp_path):
+    both_rendering = threading.Barrier(2, timeout=5)
+    render = pdfops._render_stamp
+
+    def slow_render(document, output_path):
+        render(document, output_path)
+        both_rendering.wait()
+
+    monkeypatch.setattr(pdfops, "_render_stamp", slow_render)
+    with ThreadPoolExecutor(2) as pool:
+        pages = list(pool.map(lambda _: pdfops.stamp_page(Stamp(text="DRAFT"), 200, 300), range(2)))
+
+    assert len(pages) == 2
+    assert [path.suffix for path in (tmp_path / ".stamps").iterdir()] == [".pdf"]
+
+
+def test_stamp_missing_source(rendered_stamps):
+    response = _stamp(TestClient(app), "missing.pdf", [{"text": "DRAFT"}])
+    assert response.status_code == 404
+    assert response.json()["code"] == "file_not_found"
+
+
+def test_stamp_charges_only_the_request_rate(rendered_stamps, monkeypatch):
+    monkeypatch.setattr(
+        config.settings,
+        "API_KEYS",
+        [TenantSettings(name="ops", key="ops-key", cost_per_second=0.001, cost_burst=1)],
+    )
+    rate_limiter.reset()
+    client = TestClient(app)
+    for _ in range(2):
+        response = client.post(
+            "/stamp",
+            json={"filename": "report.pdf", "stamps": [{"text": "DRAFT"}]},
+            headers={"X-API-Key": "ops-key"},
+        )
+        assert response.status_code == 200
+    assert rate_limiter._buckets["ops"][1].tokens == 1
+    rate_limiter.reset()
+
+
+@pytest.mark.parametrize(
+    "stamp",
+    [
+        {},
+        {"text": "a", "html": "<b>a</b>"},
+        {"html": "<script>alert(1)</script>"},
+        {"html": "<b>a</b>", "css_content": "b { background: url(x) }"},
+    ],
+)
+def test_stamp_validation(stamp):
+    with pytest.raises(ValueError):
+        Stamp(**stamp)
@@ -0,0 +1,115 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.config as config
+import app.dependencies as deps
+import app.index as index_module
+from app.main import app
+from app.metrics import metrics
+from app.models import CreatePDFRequest
+from app.stats import RenderStats, render_stats
+
+HEADERS = {"X-API-Key": "secret"}
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setattr(config.settings, "API_KEY", "secret")
+    monkeypatch.setattr(config.settings, "DOWNLOADS_DIR", str(tmp_path))
+    metrics.reset()
+    render_stats.reset()
+    yield TestClient(app)
+    render_stats.reset()
+
+
+def test_stats_report_renders_with_their_features(client):
+    body = '<table><tr><td>1</td></tr></table><pre><code class="language-python">x = 1</code></pre>'
+    payload = {"pdf_title": "Report", "body_content": body, "contains_code": True}
+    assert client.post("/", json=payload, headers=HEADERS).status_code == 200
+
+    stats = client.get("/admin/stats", headers=HEADERS).json()
+    assert stats["queue"]["backend"] == "memory"
+    assert stats["queue"]["depth"] == 0
+    assert stats["inflight"] == []
+    assert stats["workers"]["renders_running"] == 0
+    [render] = stats["slowest"]
+    assert render["status"] == "completed"
+    assert render["features"]["tables"] == 1
+    assert render["features"]["code_blocks"] == 1
+    assert render["features"]["contains_code"] is True
+    assert stats["downloads"]["files"] == 1
+    assert stats["caches"]["highlighting"] == {"hits": 0, "misses": 1, "hit_ratio": 0.0}
+
+    assert client.post("/", json=payload, headers=HEADERS).status_code == 200
+    stats = client.get("/admin/stats", headers=HEADERS).json()
+    assert stats["caches"]["highlighting"]["hit_ratio"] == 0.5
+    assert stats["caches"]["idempotency"]["hits"] == 0
+
+
+def test_downloads_totals_follow_the_index(client, monkeypatch, tmp_path):
+    monkeypatch.setattr(config.settings, "DOWNLOADS_QUOTA_BYTES", 1000)
+    for name, size in (("a.pdf", 100), ("b.pdf", 300)):
+        (tmp_path / name).write_bytes(b"x" * size)
+        index_module._index_file(tmp_path / name, name, 1, 1.0, None)
+    (tmp_path / "a.pdf").write_bytes(b"x" * 200)
+    index_module._index_file(tmp_path / "a.pdf", "a.pdf", 1, 1.0, None)
+
+    downloads = client.get("/admin/stats", headers=HEADERS).json()["downloads"]
+    assert downloads == {"files": 2, "bytes": 500, "quota_bytes": 1000, "quota_used": 0.5}
+
+    index_module.delete_documents(["b.pdf"])
+    downloads = client.get("/admin/stats", headers=HEADERS).json()["downloads"]
+    assert (downloads["files"], downloads["bytes"]) == (1, 200)
+
+
+def test_admin_key_is_required_when_configured(client, monkeypatch):
+    monkeypatch.setattr(config.settings, "ADMIN_API_KEY", "admin")
+    assert client.get("/admin/stats").status_code == 403
+    response = client.get("/admin/stats", headers=HEADERS)
+    assert response.status_code == 403
+    assert response.json()["code"] == "admin_key_required"
+    monkeypatch.setattr(config.settings, "API_KEY", None)
+    assert client.get("/admin/stats", headers={"X-API-Key": "admin"}).status_code == 200
+
+
+def test_failed_renders_are_recorded(client, monkeypatch):
+    class FailingHTML:
+        def __init__(self, string):
+            pass
+
+        def render(self, **options):
+            raise ValueError("fail")
+
+    monkeypatch.setattr(deps, "HTML", FailingHTML)
+    payload = {"pdf_title": "Broken", "body_content": "<p>x</p>"}
+    assert client.post("/", json=payload, headers=HEADERS).status_code == 500
+
+    [render] = client.get("/admin/stats", headers=HEADERS).json()["slowest"]
+    assert render["status"] == "failed"
+
+
+def test_render_stats_keep_the_slowest_in_the_window(monkeypatch):
+    stats = RenderStats(size=2, window=60)
+    request = CreatePDFRequest(pdf_title="T", body_content="<p>x</p>")
+    clock = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: clock[0])
+    stats.reset()
+
+    for job_id, seconds in (("a", 3), ("b", 1), ("c", 5)):
+        stats.start(job_id, None, request)
+        stats.progress(job_id, "layout", pages=2)
+        assert stats.inflight()[0].stage == "layout"
+        clock[0] += seconds
+        stats.finish(job_id, "completed")
+    assert [render.job_id for render in stats.slowest()] == ["c", "a"]
+
+    clock[0] += 61
+    stats.start("d", None, request)
+    clock[0] += 2
+    stats.finish("d", "completed")
+    assert [render.job_id for render in stats.slowest()] == ["c", "a"]
+
+    clock[0] += 200
+    assert stats.slowest() == []
@@ -0,0 +1,194 @@
+import base64
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from pydantic import ValidationError
+
+import app.config as config
+import app.dependencies as deps
+import app.templates as templates_module
+from app.main import app
+from app.models import CreatePDFRequest, TemplateRequest
+
+
+@pytest.fixture(autouse=True)
+def templates_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(config.settings, "API_KEY", "secret")
+    monkeypatch.setattr(config.settings, "TEMPLATES_DIR", str(tmp_path / "templates"))
+    templates_module._compiled_cache.clear()
+    yield tmp_path / "templates"
+    templates_module._compiled_cache.clear()
+
+
+def test_template_lifecycle():
+    client = TestClient(app)
+    headers = {"X-API-Key": "secret"}
+    payload = {
+        "css_content": "h2{color:red;}",
+        "footer_html": "<span>Confidential</span>",
+        "wrapper_html": "<main>{{ body }}</main>",
+    }
+
+    first = client.put("/templates/report", json=payload, headers=headers)
+    assert first.status_code == 200
+    assert first.json()["version"] == 1
+
+    second = client.put("/templates/report", json=payload, headers=headers)
+    assert second.json()["version"] == 2
+    assert second.json()["created_at"] == first.json()["created_at"]
+
+    fetched = client.get("/templates/report", headers=headers)
+    assert fetched.status_code == 200
+    assert fetched.json()["version"] == 2
+
+    assert client.delete("/templates/report", headers=headers).status_code == 204
+    missing = client.get("/templates/report", headers=headers)
+    assert missing.status_code == 404
+    assert missing.json()["code"] == "template_not_found"
+
+
+def test_template_requires_api_key():
+    client = TestClient(app)
+    response = client.put("/templates/report", json={}, headers={"X-API-Key": "bad"})
+    assert response.status_code == 403
+
+
+def test_create_pdf_unknown_template():
+    client = TestClient(app)
+    response = client.post(
+        "/",
+        json={
+            "pdf_title": "Example PDF",
+            "body_content": "<p>Hello</p>",
+            "template_id": "missing",
+        },
+        headers={"X-API-Key": "secret"},
+    )
+    assert response.status_code == 404
+    assert response.json()["code"] == "template_not_found"
+
+
+@pytest.mark.asyncio
+async def test_load_template_cached_until_version_changes(monkeypatch):
+    await templates_module.save_template("report", TemplateRequest(css_content="p{}"))
+    templates_module._compiled_cache.clear()
+
+    compiled_versions = []
+    real_compile = templates_module._compile
+
+    def counting_compile(template_id, record):
+        compiled_versions.append(record["version"])
+        return real_compile(template_id, record)
+
+    monkeypatch.setattr(templates_module, "_compile", counting_compile)
+
+    first = await templates_module.load_template("report")
+    second = await templates_module.load_template("report")
+    assert first is second
+    assert compiled_versions == [1]
+
+    await templates_module.save_template("report", TemplateRequest(css_content="p{x:y}"))
+    third = await templates_module.load_template("report")
+    assert third.version == 2
+    assert compiled_versions == [1, 2]
+
+
+def test_concurrent_saves_of_a_template_use_separate_files(monkeypatch, templates_dir):
+    both_written = threading.Barrier(2, timeout=5)
+    replace = os.replace
+
+    def synchronized_replace(source, target):
+        both_written.wait()
+        replace(source, target)
+
+    monkeypatch.setattr(os, "replace", synchronized_replace)
+    request = TemplateRequest(css_content="p{}")
+    with ThreadPoolExecutor(2) as pool:
+        records = list(pool.map(lambda _: templates_module._store("report", request), range(2)))
+
+    assert len(records) == 2
+    assert [path.name for path in templates_dir.iterdir()] == ["report.json"]
+
+
+@pytest.mark.asyncio
+async def test_load_template_missing():
+    with pytest.raises(HTTPException) as exc:
+        await templates_module.load_template("missing")
+    assert exc.value.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_generate_pdf_applies_template(monkeypatch, tmp_path):
+    captured = {}
+
+    class DummyHTML:
+        pages = [None]
+
+        def __init__(self, string):
+            captured["string"] = string
+
+        def render(self, **options):
+            captured["options"] = options
+            return self
+
+        def write_pdf(self, target, **options):
+            Path(target).write_bytes(b"PDF")
+
+    monkeypatch.setattr(deps, "HTML", DummyHTML)
+    font = base64.b64encode(b"font").decode()
+    await templates_module.save_template(
+        "report",
+        TemplateRequest(
+            css_content="h2{color:red;}",
+            header_html="<b>ACME</b>",
+            wrapper_html="<main>{{ body }}</main>",
+            fonts=[{"family": "Brand", "data": font}],
+        ),
+    )
+    template = await templates_module.load_template("report")
+
+    await deps.generate_pdf(
+        pdf_title="Title",
+        body_content="<p>Hello</p>",
+        css_content=None,
+        output_path=tmp_path / "out.pdf",
+        contains_code=False,
+        template=template,
+    )
+
+    assert "<main><p>Hello</p></main>" in captured["string"]
+    assert '<div class="pdf-template-header"><b>ACME</b></div>' in captured["string"]
+    # Default rules come from the precompiled stylesheet, not inline CSS
+    assert "font-family:'Arial'" not in captured["string"]
+    stylesheets = captured["options"]["stylesheets"]
+    assert stylesheets[0].string == deps.DEFAULT_CSS
+    assert "h2{color:red;}" in stylesheets[1].string
+    assert "@font-face" in stylesheets[1].string
+    assert captured["options"]["font_config"] is template.font_config
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        {"wrapper_html": "<main></main>"},
+        {"wrapper_html": "{{ body }}{{ body }}"},
+        {"header_html": "<script>x</script>"},
+        {"css_content": "body{background:url('x')}"},
+        {"fonts": [{"family": "Brand", "data": "not base64!"}]},
+    ],
+)
+def test_template_request_validation(payload):
+    with pytest.raises(ValidationError):
+        TemplateRequest(**payload)
+
+
+def test_create_pdf_request_template_id():
+    req = CreatePDFRequest(pdf_title="T", body_content="<p>x</p>", template_id=" Report ")
+    assert req.template_id == "report"
+    with pytest.raises(ValidationError):
+        CreatePDFRequest(pdf_title="T", body_content="<p>x</p>", template_id="../x")
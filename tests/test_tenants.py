@@ -0,0 +1,193 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+import app.config as config
+import app.jobs as jobs_module
+from app.config import TenantSettings
+from app.dependencies import api_key_identity, get_api_key
+from app.main import app
+from app.models import CreatePDFRequest
+from app.tenants import FairScheduler, estimate_cost, rate_limiter
+
+PAYLOAD = {"pdf_title": "Tenant", "body_content": "<p>x</p>"}
+
+
+@pytest.fixture
+def tenants(monkeypatch, tmp_path):
+    monkeypatch.setattr(config.settings, "API_KEY", None)
+    monkeypatch.setattr(
+        config.settings,
+        "API_KEYS",
+        [
+            TenantSettings(name="small", key="small-key"),
+            TenantSettings(
+                name="batch",
+                key="batch-key",
+                requests_per_second=0.001,
+                request_burst=2,
+            ),
+            TenantSettings(
+                name="heavy", key="heavy-key", cost_per_second=0.001, cost_burst=3
+            ),
+        ],
+    )
+    monkeypatch.setattr(config.settings, "DOWNLOADS_DIR", str(tmp_path))
+
+    async def fake_generate_pdf(output_path, **kwargs):
+        Path(output_path).write_bytes(b"PDF")
+        return 1
+
+    monkeypatch.setattr(jobs_module, "generate_pdf", fake_generate_pdf)
+    rate_limiter.reset()
+    yield
+    rate_limiter.reset()
+
+
+def test_tenant_keys_authenticate_with_their_identity(tenants):
+    assert get_api_key("small-key") == "small-key"
+    assert api_key_identity("batch-key") == "batch"
+    with pytest.raises(HTTPException) as exc:
+        get_api_key("unknown")
+    assert exc.value.status_code == 403
+
+
+def test_request_rate_limit_returns_retry_after(tenants):
+    client = TestClient(app)
+    headers = {"X-API-Key": "batch-key"}
+    assert client.post("/", json=PAYLOAD, headers=headers).status_code == 200
+    assert client.post("/", json=PAYLOAD, headers=headers).status_code == 200
+
+    response = client.post("/", json=PAYLOAD, headers=headers)
+    assert response.status_code == 429
+    assert response.json()["code"] == "request_rate_limited"
+    assert int(response.headers["Retry-After"]) >= 1
+    # Other tenants are unaffected
+    small = client.post("/", json=PAYLOAD, headers={"X-API-Key": "small-key"})
+    assert small.status_code == 200
+
+
+def test_render_cost_limit(tenants, monkeypatch):
+    monkeypatch.setattr(config.settings, "RENDER_COST_UNIT_BYTES", 10)
+    client = TestClient(app)
+    headers = {"X-API-Key": "heavy-key"}
+    large = {**PAYLOAD, "body_content": "<p>" + "x" * 100 + "</p>"}
+
+    assert client.post("/", json=large, headers=headers).status_code == 200
+    response = client.post("/", json=PAYLOAD, headers=headers)
+    assert response.status_code == 429
+    assert response.json()["code"] == "render_cost_limited"
+
+
+def test_estimate_cost_scales_with_size_and_code(monkeypatch):
+    monkeypatch.setattr(config.settings, "RENDER_COST_UNIT_BYTES", 100)
+    plain = CreatePDFRequest(pdf_title="x", body_content="a" * 100)
+    code = CreatePDFRequest(pdf_title="x", body_content="a" * 100, contains_code=True)
+    assert estimate_cost(plain) == pytest.approx(2.0)
+    assert estimate_cost(code) == pytest.approx(4.0)
+
+
+async def _run_jobs(scheduler, jobs, order):
+    release = asyncio.Event()
+
+    async def job(key, tenant, **kwargs):
+        async with scheduler.slot(key, tenant, **kwargs):
+            order.append(key)
+            await release.wait()
+
+    tasks = []
+    for key, tenant, kwargs in jobs:
+        tasks.append(asyncio.create_task(job(key, tenant, **kwargs)))
+        await asyncio.sleep(0)
+    while len(order) < len(jobs):
+        release.set()
+        await asyncio.sleep(0)
+        release.clear()
+        await asyncio.sleep(0)
+    release.set()
+    await asyncio.gather(*tasks)
+
+
+@pytest.mark.asyncio
+async def test_fair_scheduler_interleaves_small_tenant_with_batch():
+    scheduler = FairScheduler(capacity=1)
+    order = []
+    jobs = [(f"batch-{i}", "batch", {}) for i in range(5)] + [("small-0", "small", {})]
+
+    await _run_jobs(scheduler, jobs, order)
+
+    # The small tenant waits behind one batch job, not the whole batch
+    assert order.index("small-0") <= 2
+
+
+@pytest.mark.asyncio
+async def test_fair_scheduler_honours_weights_and_concurrency_caps():
+    scheduler = FairScheduler(capacity=2)
+    waiting_orders = []
+    scheduler.on_change = waiting_orders.append
+    order = []
+    jobs = [
+        ("a-0", "a", {"max_concurrency": 1}),
+        ("a-1", "a", {"max_concurrency": 1}),
+        ("b-0", "b", {"weight": 4}),
+        ("b-1", "b", {"weight": 4}),
+    ]
+
+    await _run_jobs(scheduler, jobs, order)
+
+    # a-1 cannot start while a-0 runs even though a slot is free
+    assert order[:2] == ["a-0", "b-0"]
+    assert order.index("b-1") < order.index("a-1")
+    assert waiting_orders
+
+
+def _create(client, api_key, **fields):
+    response = client.post("/", json={**PAYLOAD, **fields}, headers={"X-API-Key": api_key})
+    assert response.status_code == 200
+    return response.json()["url"].rsplit("/", 1)[-1]
+
+
+def test_tenants_only_see_and_download_their_own_documents(tenants, monkeypatch):
+    monkeypatch.setattr(config.settings, "BASE_URL", "")
+    client = TestClient(app)
+    filename = _create(client, "small-key")
+    small, heavy = {"X-API-Key": "small-key"}, {"X-API-Key": "heavy-key"}
+
+    assert client.get("/documents", headers=small).json()["total"] == 1
+    assert client.get("/documents", headers=heavy).json()["total"] == 0
+    forbidden = client.get("/documents", params={"api_key_id": "small"}, headers=heavy)
+    assert forbidden.status_code == 403
+    assert forbidden.json()["code"] == "tenant_forbidden"
+
+    assert client.get(f"/downloads/{filename}", headers=small).status_code == 200
+    assert client.get(f"/downloads/{filename}", headers=heavy).status_code == 404
+    assert client.get(f"/downloads/{filename}").status_code == 403
+    merged = client.post("/merge", json={"filenames": [filename]}, headers=heavy)
+    assert merged.status_code == 404
+
+    # The admin key sees every tenant
+    monkeypatch.setattr(config.settings, "ADMIN_API_KEY", "heavy-key")
+    listing = client.get("/documents", params={"api_key_id": "small"}, headers=heavy)
+    assert listing.json()["total"] == 1
+    assert client.get(f"/downloads/{filename}", headers=heavy).status_code == 200
+
+
+def test_tenants_have_separate_template_namespaces(tenants, monkeypatch, tmp_path):
+    monkeypatch.setattr(config.settings, "TEMPLATES_DIR", str(tmp_path / ".templates"))
+    client = TestClient(app)
+    small, heavy = {"X-API-Key": "small-key"}, {"X-API-Key": "heavy-key"}
+    template = {"css_content": "h2{color:red;}"}
+
+    assert client.put("/templates/report", json=template, headers=small).status_code == 200
+    assert client.get("/templates/report", headers=heavy).status_code == 404
+    assert client.delete("/templates/report", headers=heavy).status_code == 404
+    response = client.post("/", json={**PAYLOAD, "template_id": "report"}, headers=heavy)
+    assert response.json()["code"] == "template_not_found"
+
+    assert client.put("/templates/report", json=template, headers=heavy).json()["version"] == 1
+    assert client.delete("/templates/report", headers=heavy).status_code == 204
+    assert client.get("/templates/report", headers=small).json()["version"] == 1
+    _create(client, "small-key", template_id="report")
@@ -0,0 +1,122 @@
+import gzip
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.config as config
+from app.main import app
+from app.tracing import SpanContext, format_traceparent, parse_traceparent, tracer
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+PAYLOAD = {
+    "pdf_title": "Traced",
+    "contains_code": True,
+    "body_content": '<pre><code class="language-python">x = 1</code></pre>',
+}
+
+
+@pytest.fixture
+def trace_file(monkeypatch, tmp_path):
+    path = tmp_path / "spans.jsonl"
+    monkeypatch.setattr(config.settings, "API_KEY", "secret")
+    monkeypatch.setattr(config.settings, "DOWNLOADS_DIR", str(tmp_path / "downloads"))
+    monkeypatch.setattr(config.settings, "TRACE_EXPORTER", "file")
+    monkeypatch.setattr(config.settings, "TRACE_FILE_PATH", str(path))
+    yield path
+    tracer.shutdown()
+
+
+def _exported_spans(path):
+    spans = []
+    for line in path.read_text().splitlines():
+        for resource in json.loads(line)["resourceSpans"]:
+            for scope in resource["scopeSpans"]:
+                spans.extend(scope["spans"])
+    return spans
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        (f"00-{TRACE_ID}-{PARENT_ID}-01", SpanContext(TRACE_ID, PARENT_ID, True)),
+        (f"00-{TRACE_ID}-{PARENT_ID}-00", SpanContext(TRACE_ID, PARENT_ID, False)),
+        (f"00-{'0' * 32}-{PARENT_ID}-01", None),
+        (f"ff-{TRACE_ID}-{PARENT_ID}-01", None),
+        ("garbage", None),
+        (None, None),
+    ],
+)
+def test_parse_traceparent(header, expected):
+    assert parse_traceparent(header) == expected
+
+
+def test_format_traceparent_round_trips():
+    context = SpanContext(TRACE_ID, PARENT_ID, True)
+    assert parse_traceparent(format_traceparent(context)) == context
+
+
+def test_request_stages_are_traced_under_incoming_context(trace_file):
+    with TestClient(app) as client:
+        response = client.post(
+            "/",
+            content=gzip.compress(json.dumps(PAYLOAD).encode()),
+            headers={
+                "X-API-Key": "secret",
+                "Content-Type": "application/json",
+                "Content-Encoding": "gzip",
+                "traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01",
+            },
+        )
+        assert response.status_code == 200
+
+    spans = _exported_spans(trace_file)
+    names = {span["name"] for span in spans}
+    assert {
+        "POST /",
+        "auth.api_key",
+        "request.decode",
+        "request.validate",
+        "job.queue",
+        "job.execute",
+        "pdf.highlight",
+        "pdf.layout",
+        "pdf.write",
+        "pdf.store",
+        "response.serialize",
+    } <= names
+    assert {span["traceId"] for span in spans} == {TRACE_ID}
+    server = next(span for span in spans if span["name"] == "POST /")
+    assert server["parentSpanId"] == PARENT_ID
+    assert server["kind"] == 2
+    ids = {span["spanId"] for span in spans} | {PARENT_ID}
+    assert all(span.get("parentSpanId") in ids for span in spans)
+
+
+def test_server_spans_are_named_after_the_route(trace_file):
+    with TestClient(app) as client:
+        headers = {"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"}
+        client.get("/downloads/missing.pdf", headers=headers)
+        client.get("/no/such/route", headers=headers)
+
+    servers = [span for span in _exported_spans(trace_file) if span["kind"] == 2]
+    assert [span["name"] for span in servers] == ["GET /downloads/{filename:path}", "GET"]
+    route = {attr["key"]: attr["value"] for attr in servers[0]["attributes"]}["http.route"]
+    assert route == {"stringValue": "/downloads/{filename:path}"}
+
+
+def test_unsampled_requests_are_not_exported(trace_file, monkeypatch):
+    monkeypatch.setattr(config.settings, "TRACE_SAMPLE_RATIO", 0.0)
+    with TestClient(app) as client:
+        client.post("/", json=PAYLOAD, headers={"X-API-Key": "secret"})
+        client.post(
+            "/",
+            json=PAYLOAD,
+            headers={
+                "X-API-Key": "secret",
+                "traceparent": f"00-{TRACE_ID}-{PARENT_ID}-00",
+            },
+        )
+
+    assert not trace_file.exists()
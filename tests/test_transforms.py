@@ -0,0 +1,231 @@
+import base64
+import io
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+from PIL import Image
+
+import app.config as config
+import app.dependencies as deps
+import app.transforms as transforms
+from app.transforms import normalize_images, split_large_tables
+
+HEAD = "<thead><tr><th>SKU</th><th>Qty</th></tr></thead>"
+
+
+def _table(rows, attrs=' class="inventory" id="stock"', extra=""):
+    body = "".join(f"<tr><td>{i}</td><td>{i * 2}</td></tr>" for i in range(rows))
+    return f"<table{attrs}>{extra}{HEAD}<tbody>{body}</tbody></table>"
+
+
+def _fragments(html):
+    return re.findall(r"<table\b[^>]*>.*?</table>", html, re.DOTALL)
+
+
+def test_large_tables_are_split_with_repeated_header():
+    html = split_large_tables("<p>before</p>" + _table(250) + "<p>after</p>", 100)
+
+    fragments = _fragments(html)
+    assert len(fragments) == 3
+    assert all(fragment.count(HEAD) == 1 for fragment in fragments)
+    assert [fragment.count("<tr><td>") for fragment in fragments] == [100, 100, 50]
+    assert html.startswith("<p>before</p>") and html.endswith("<p>after</p>")
+    # Ids stay unique and fragments join up without forcing page breaks
+    assert html.count('id="stock"') == 1
+    assert "break-before" not in html
+    assert 'style="margin-bottom:0"' in fragments[0]
+    assert 'style="margin-top:0;margin-bottom:0"' in fragments[1]
+    assert 'style="margin-top:0"' in fragments[2]
+
+
+def test_existing_style_caption_and_footer_are_preserved():
+    table = _table(
+        5,
+        attrs=" style='width: 50%;'",
+        extra="<caption>Stock</caption>",
+    ).replace("</tbody>", "</tbody><tfoot><tr><td>Total</td></tr></tfoot>")
+    fragments = _fragments(split_large_tables(table, 2))
+
+    assert "style='width: 50%;margin-bottom:0'" in fragments[0]
+    assert "<caption>Stock</caption>" in fragments[0]
+    assert "<caption>" not in fragments[1]
+    assert "<tfoot>" in fragments[-1] and "<tfoot>" not in fragments[0]
+
+
+def test_nested_tables_are_not_split():
+    inner = _table(250, attrs="")
+    outer = (
+        "<table><tr><td>Totals</td></tr>"
+        f"<tr><td>{inner}</td></tr>" + "<tr><td>x</td></tr>" * 250 + "</table>"
+    )
+    html = outer + _table(250)
+
+    result = split_large_tables(html, 100)
+    assert result.startswith(outer)
+    assert len(_fragments(result[len(outer):])) == 3
+
+
+@pytest.mark.parametrize(
+    "html",
+    [
+        _table(50),
+        _table(500).replace("<td>1</td>", '<td rowspan="2">1</td>'),
+        "<p>no tables</p>",
+    ],
+)
+def test_small_and_unsplittable_tables_are_unchanged(html):
+    assert split_large_tables(html, 100) == html
+
+
+@pytest.mark.asyncio
+async def test_generate_pdf_splits_tables_when_enabled(monkeypatch, tmp_path):
+    captured = {}
+
+    class DummyHTML:
+        pages = [None]
+
+        def __init__(self, string):
+            captured["string"] = string
+
+        def render(self, **options):
+            return self
+
+        def write_pdf(self, target, **options):
+            Path(target).write_bytes(b"PDF")
+
+    monkeypatch.setattr(deps, "HTML", DummyHTML)
+    monkeypatch.setattr(config.settings, "TABLE_CHUNK_ROWS", 10)
+
+    await deps.generate_pdf(
+        pdf_title="Tables",
+        body_content=_table(25),
+        css_content=None,
+        output_path=tmp_path / "out.pdf",
+        contains_code=False,
+    )
+
+    assert len(_fragments(captured["string"])) == 3
+
+
+def _data_uri(width, height, image_format="JPEG", mode="RGB"):
+    buffer = io.BytesIO()
+    Image.new(mode, (width, height), "red").save(buffer, format=image_format)
+    mime = "jpeg" if image_format == "JPEG" else image_format.lower()
+    return f"data:image/{mime};base64,{base64.b64encode(buffer.getvalue()).decode()}"
+
+
+def _embedded_size(html):
+    data = re.search(r"base64,([^\"']+)", html).group(1)
+    return Image.open(io.BytesIO(base64.b64decode(data))).size
+
+
+@pytest.fixture
+def image_cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(config.settings, "IMAGES_DIR", str(tmp_path / "images"))
+    return tmp_path / "images"
+
+
+@pytest.mark.parametrize(
+    "attrs, expected_width",
+    [
+        ('width="192"', 200),  # 2 inches at 100 DPI
+        ('style="width: 3in"', 300),
+        ('style="border:0;width:50%"', 585),
+    ],
+)
+def test_images_are_downsampled_to_their_declared_width(image_cache, attrs, expected_width):
+    html = f'<img {attrs} src="{_data_uri(3000, 1500)}">'
+    result = normalize_images(html, 100)
+
+    assert _embedded_size(result) == (expected_width, expected_width // 2)
+    assert result.startswith(f"<img {attrs} src=\"data:image/jpeg;base64,")
+
+
+def test_transparent_images_stay_png(image_cache):
+    html = f'<img width="96" src="{_data_uri(1000, 1000, "PNG", "RGBA")}">'
+    result = normalize_images(html, 150)
+    assert "data:image/png;base64," in result
+    assert _embedded_size(result) == (150, 150)
+
+
+@pytest.mark.parametrize(
+    "html",
+    [
+        f'<img src="{_data_uri(3000, 1500)}">',
+        f'<img width="960" src="{_data_uri(500, 250)}">',
+        '<img width="96" src="https://example.com/photo.jpg">',
+        '<img width="96" src="data:image/png;base64,bm90IGFuIGltYWdl">',
+    ],
+)
+def test_images_that_need_no_downsampling_are_unchanged(image_cache, html):
+    assert normalize_images(html, 100) == html
+
+
+def test_downsampled_images_are_cached_by_source_and_size(image_cache, monkeypatch):
+    calls = []
+    original = transforms._downscale
+
+    def counting_downscale(data, max_pixels):
+        calls.append(max_pixels)
+        return original(data, max_pixels)
+
+    monkeypatch.setattr(transforms, "_downscale", counting_downscale)
+    uri = _data_uri(2000, 1000)
+    first = normalize_images(f'<img width="96" src="{uri}">', 100)
+    again = normalize_images(f"<p>other</p><img width='96' src='{uri}'>", 100)
+    normalize_images(f'<img width="192" src="{uri}">', 100)
+
+    assert calls == [100, 200]
+    assert _embedded_size(first) == _embedded_size(again) == (100, 50)
+    assert len(list(image_cache.iterdir())) == 2
+
+
+def test_concurrent_downsampling_of_an_image_uses_separate_files(image_cache, monkeypatch):
+    both_written = threading.Barrier(2, timeout=5)
+    replace = os.replace
+
+    def synchronized_replace(source, target):
+        # Both threads have written their file before either moves it
+        both_written.wait()
+        replace(source, target)
+
+    monkeypatch.setattr(os, "replace", synchronized_replace)
+    data = base64.b64decode(_data_uri(2000, 1000).split(",", 1)[1])
+    with ThreadPoolExecutor(2) as pool:
+        results = list(pool.map(lambda _: transforms.downscaled_image(data, 100), range(2)))
+
+    assert results[0] == results[1]
+    assert [path.suffix for path in image_cache.iterdir()] == [".jpg"]
+
+
+@pytest.mark.asyncio
+async def test_generate_pdf_uses_profile_dpi_for_images(monkeypatch, tmp_path, image_cache):
+    captured = {}
+
+    class DummyHTML:
+        pages = [None]
+
+        def __init__(self, string):
+            captured["string"] = string
+
+        def render(self, **options):
+            return self
+
+        def write_pdf(self, target, **options):
+            Path(target).write_bytes(b"PDF")
+
+    monkeypatch.setattr(deps, "HTML", DummyHTML)
+    await deps.generate_pdf(
+        pdf_title="Photo",
+        body_content=f'<img style="width:1in" src="{_data_uri(1000, 500)}">',
+        css_content=None,
+        output_path=tmp_path / "out.pdf",
+        contains_code=False,
+        optimization_profile="small",
+    )
+
+    assert _embedded_size(captured["string"]) == (150, 75)
@@ -0,0 +1,251 @@
+import json
+import threading
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+from pydantic import ValidationError
+
+import app.config as config
+import app.jobs as jobs_module
+import app.outbound as outbound
+from app.jobs import new_job
+from app.main import app
+from app.models import CreatePDFRequest, JobStatusResponse
+from app.tracing import parse_traceparent
+from app.webhooks import WebhookDispatcher, build_payload, sign
+
+TRACE_ID = "a" * 32
+
+
+@pytest.fixture
+def receiver(monkeypatch):
+    """Local HTTP server recording deliveries and replying with queued codes."""
+    # Callbacks to private addresses need an explicit allowlist entry
+    monkeypatch.setattr(config.settings, "WEBHOOK_ALLOWED_HOSTS", ["127.0.0.1"])
+    deliveries = []
+    codes = []
+    received = threading.Event()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            deliveries.append((dict(self.headers), body))
+            code = codes.pop(0) if codes else 200
+            self.send_response(code)
+            if 300 <= code < 400:
+                self.send_header("Location", "/moved")
+            self.end_headers()
+            received.set()
+
+        def do_GET(self):
+            deliveries.append((dict(self.headers), b""))
+            self.send_response(200)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = f"http://127.0.0.1:{server.server_port}/hook"
+    server.deliveries = deliveries
+    server.codes = codes
+    server.received = received
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def webhook_settings(monkeypatch):
+    monkeypatch.setattr(config.settings, "WEBHOOK_SECRET", "shh")
+    monkeypatch.setattr(config.settings, "WEBHOOK_BACKOFF_SECONDS", 0.01)
+    monkeypatch.setattr(config.settings, "WEBHOOK_MAX_ATTEMPTS", 3)
+
+
+def _finished(callback_url):
+    job = new_job(
+        CreatePDFRequest(
+            pdf_title="Hooked", body_content="<p>x</p>", callback_url=callback_url
+        ),
+        None,
+    )
+    result = JobStatusResponse(
+        job_id=job.job_id,
+        status="completed",
+        url="http://test/downloads/x.pdf",
+        page_count=4,
+        render_ms=250.0,
+        created_at=job.created_at,
+        started_at=job.created_at + timedelta(milliseconds=100),
+        updated_at=job.created_at + timedelta(milliseconds=400),
+    )
+    return job, result
+
+
+def test_callback_url_must_be_http():
+    with pytest.raises(ValidationError):
+        CreatePDFRequest(
+            pdf_title="x", body_content="<p>x</p>", callback_url="file:///etc/passwd"
+        )
+
+
+@pytest.mark.parametrize("url", [
+    "http://127.0.0.1/hook",
+    "http://[::1]/hook",
+    "http://10.0.0.5/hook",
+    "http://192.168.1.1/hook",
+    "http://169.254.169.254/latest/meta-data",
+    "http://[::ffff:127.0.0.1]/hook",
+    "http://localhost:8000/hook",
+])
+def test_callback_url_rejects_internal_addresses(url):
+    with pytest.raises(ValidationError):
+        CreatePDFRequest(pdf_title="x", body_content="<p>x</p>", callback_url=url)
+
+
+def test_allowlist_restricts_callback_hosts(monkeypatch):
+    monkeypatch.setattr(config.settings, "WEBHOOK_ALLOWED_HOSTS", ["hooks.internal"])
+    CreatePDFRequest(pdf_title="x", body_content="<p>x</p>", callback_url="http://hooks.internal/")
+    with pytest.raises(ValidationError):
+        CreatePDFRequest(pdf_title="x", body_content="<p>x</p>", callback_url="http://example.com/")
+
+
+def test_callback_hosts_resolving_to_private_addresses_are_rejected(monkeypatch, webhook_settings):
+    monkeypatch.setattr(config.settings, "API_KEY", "secret")
+    monkeypatch.setattr(
+        outbound.socket, "getaddrinfo",
+        lambda host, port, **kwargs: [(None, None, None, "", ("10.1.2.3", port))],
+    )
+    response = TestClient(app).post(
+        "/",
+        json={"pdf_title": "x", "body_content": "<p>x</p>", "callback_url": "http://evil.example/"},
+        headers={"X-API-Key": "secret"},
+    )
+    assert response.status_code == 422
+    assert response.json()["code"] == "invalid_callback_url"
+    with pytest.raises(outbound.UnsafeURLError):
+        outbound.resolve_url("http://evil.example/")
+
+
+@pytest.mark.asyncio
+async def test_redirects_are_not_followed(receiver, webhook_settings):
+    receiver.codes.extend([302])
+    job, result = _finished(receiver.url)
+
+    assert not await WebhookDispatcher().deliver(receiver.url, build_payload(job, result))
+    assert len(receiver.deliveries) == 1
+
+
+def test_build_payload_includes_timings():
+    job, result = _finished("http://example.com/hook")
+    payload = build_payload(job, result)
+    assert payload.event == "pdf.completed"
+    assert payload.results.startswith("PDF generation is complete")
+    assert payload.page_count == 4
+    assert payload.timings.queued_ms == pytest.approx(100)
+    assert payload.timings.render_ms == 250.0
+    assert payload.timings.total_ms == pytest.approx(400)
+
+
+@pytest.mark.asyncio
+async def test_delivery_is_signed_and_retried(receiver, webhook_settings):
+    receiver.codes.extend([503])
+    job, result = _finished(receiver.url)
+    dispatcher = WebhookDispatcher()
+
+    assert await dispatcher.deliver(receiver.url, build_payload(job, result))
+
+    assert len(receiver.deliveries) == 2
+    headers, body = receiver.deliveries[-1]
+    assert headers["X-Webhook-Signature"] == sign(
+        body, headers["X-Webhook-Timestamp"], "shh"
+    )
+    assert json.loads(body)["job_id"] == job.job_id
+
+
+@pytest.mark.asyncio
+async def test_unsigned_deliveries_are_never_sent(receiver, webhook_settings, monkeypatch):
+    monkeypatch.setattr(config.settings, "WEBHOOK_SECRET", None)
+    job, result = _finished(receiver.url)
+
+    assert not await WebhookDispatcher().deliver(receiver.url, build_payload(job, result))
+    assert receiver.deliveries == []
+
+
+def test_callback_url_requires_webhook_secret(monkeypatch, receiver):
+    monkeypatch.setattr(config.settings, "API_KEY", "secret")
+    monkeypatch.setattr(config.settings, "WEBHOOK_SECRET", None)
+    payload = {"pdf_title": "Hooked", "body_content": "<p>x</p>", "callback_url": receiver.url}
+    client = TestClient(app)
+
+    for path in ("/", "/jobs"):
+        response = client.post(path, json=payload, headers={"X-API-Key": "secret"})
+        assert response.status_code == 422
+        assert response.json()["code"] == "webhooks_disabled"
+    assert receiver.deliveries == []
+
+
+@pytest.mark.asyncio
+async def test_client_errors_are_not_retried(receiver, webhook_settings):
+    receiver.codes.extend([410])
+    job, result = _finished(receiver.url)
+
+    assert not await WebhookDispatcher().deliver(
+        receiver.url, build_payload(job, result)
+    )
+    assert len(receiver.deliveries) == 1
+
+
+@pytest.mark.asyncio
+async def test_full_queue_drops_without_blocking(monkeypatch):
+    monkeypatch.setattr(config.settings, "WEBHOOK_QUEUE_SIZE", 1)
+    monkeypatch.setattr(config.settings, "WEBHOOK_WORKERS", 0)
+    dispatcher = WebhookDispatcher()
+    await dispatcher.start()
+    job, result = _finished("http://example.com/hook")
+
+    assert dispatcher.submit("http://example.com/hook", build_payload(job, result))
+    assert not dispatcher.submit("http://example.com/hook", build_payload(job, result))
+    await dispatcher.stop(drain_timeout=0.01)
+
+
+def test_create_pdf_sends_completion_webhook(
+    monkeypatch, tmp_path, receiver, webhook_settings
+):
+    monkeypatch.setattr(config.settings, "API_KEY", "secret")
+    monkeypatch.setattr(config.settings, "DOWNLOADS_DIR", str(tmp_path))
+
+    async def fake_generate_pdf(output_path, **kwargs):
+        Path(output_path).write_bytes(b"PDF")
+        return 2
+
+    monkeypatch.setattr(jobs_module, "generate_pdf", fake_generate_pdf)
+
+    with TestClient(app) as client:
+        response = client.post(
+            "/",
+            json={
+                "pdf_title": "Hooked",
+                "body_content": "<p>x</p>",
+                "callback_url": receiver.url,
+            },
+            headers={"X-API-Key": "secret", "traceparent": f"00-{TRACE_ID}-{'b' * 16}-01"},
+        )
+        assert response.status_code == 200
+        assert receiver.received.wait(5)
+
+    headers, body = receiver.deliveries[0]
+    # The delivery continues the trace of the request that submitted the job
+    context = parse_traceparent(headers["Traceparent"])
+    assert context.trace_id == TRACE_ID
+    assert context.span_id != "b" * 16
+    payload = json.loads(body)
+    assert payload["event"] == "pdf.completed"
+    assert payload["url"] == response.json()["url"]
+    assert payload["page_count"] == 2
+    assert payload["timings"]["total_ms"] >= payload["timings"]["render_ms"]